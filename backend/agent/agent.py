@@ -1,8 +1,18 @@
 """
-Autogenesis AI Agent - Supports Groq API (primary) with Gemini fallback.
+Autogenesis AI Agent - Routes between Groq and Gemini by measured latency and health.
 """
 import os
+import time
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
+from .cache import response_cache, cache_key
+from .coalesce import single_flight
+from .ratelimit import limiters, estimate_tokens, is_rate_limit_error, parse_retry_after, RATE_LIMIT_RETRIES
+from .router import Router
+from .breaker import CircuitBreaker, OPEN, CLOSED
+from .cancellation import BuildCancelled, check_cancelled, call_timeout, current_build
 
 load_dotenv(override=True)
 
@@ -12,6 +22,11 @@ gemini_env = os.getenv("GEMINI_API_KEY") # renamed to avoid conflict
 GEMINI_API_KEY = gemini_env
 MOCK_MODE = os.getenv("MOCK_MODE", "false").lower() == "true"
 
+GROQ_MODEL = "llama-3.3-70b-versatile"
+GROQ_TEMPERATURE = 0.7
+GEMINI_MODEL = "gemini-2.0-flash"
+PROVIDER_TIMEOUT = float(os.getenv("PROVIDER_TIMEOUT", "60"))  # seconds per upstream call
+
 # Define log_error helper
 def log_agent_error(msg):
     try:
@@ -20,28 +35,39 @@ def log_agent_error(msg):
     except:
         pass
 
-# Determine which provider to use
+# Primary provider (Groq if configured); every provider with a key is routable
 USE_GROQ = GROQ_API_KEY is not None
 USE_GEMINI = GEMINI_API_KEY is not None and not USE_GROQ
+PROVIDERS = [name for name, key in (("groq", GROQ_API_KEY), ("gemini", GEMINI_API_KEY)) if key is not None]
 
-if USE_GROQ:
-    from groq import Groq
-    client = Groq(api_key=GROQ_API_KEY)
+if GROQ_API_KEY is not None:
+    from groq import Groq, AsyncGroq
+    # 429s are retried by our limiter (which learns from retry-after), not the SDK
+    client = Groq(api_key=GROQ_API_KEY, max_retries=0, timeout=PROVIDER_TIMEOUT)
+    async_client = AsyncGroq(api_key=GROQ_API_KEY, max_retries=0, timeout=PROVIDER_TIMEOUT)
     print("🚀 Using Groq API (llama-3.3-70b-versatile)")
-elif USE_GEMINI:
+if GEMINI_API_KEY is not None:
     import google.generativeai as genai
     genai.configure(api_key=GEMINI_API_KEY)
     print("🚀 Using Gemini API")
-else:
-    if not MOCK_MODE:
-        print("⚠️ No API key found! Set GROQ_API_KEY or GEMINI_API_KEY in .env, or enable MOCK_MODE=true")
+if not PROVIDERS and not MOCK_MODE:
+    print("⚠️ No API key found! Set GROQ_API_KEY or GEMINI_API_KEY in .env, or enable MOCK_MODE=true")
+
+router = Router(PROVIDERS, models={"groq": GROQ_MODEL, "gemini": GEMINI_MODEL})
+breakers = {name: CircuitBreaker(name) for name in ("groq", "gemini")}
+# Runs the second leg of hedged requests
+_hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
 
 # Track rate limit state
 _rate_limited = False
 
 def is_rate_limited():
-    """Check if currently rate limited."""
-    return _rate_limited
+    """Check if currently rate limited (last call fell back, or a provider circuit isn't closed)."""
+    return _rate_limited or any(breakers[name].state != CLOSED for name in PROVIDERS)
+
+def get_circuit_states() -> dict:
+    """Circuit breaker state per provider."""
+    return {name: breakers[name].stats() for name in PROVIDERS}
 
 def mock_response(idea: str, mode: str, error_msg: str = ""):
     """Language-aware mock responses with unique content per project."""
@@ -184,114 +210,240 @@ if __name__ == "__main__":
     
     return {"response": idea}
 
-def groq_request(idea: str, mode: str):
-    """Use Groq API (llama-3.3-70b-versatile)."""
-    try:
-        if mode == "plan":
-            prompt = f"""You are an AI software architect. Create a structured project plan for this idea: {idea}
+def _groq_prompt(idea: str, mode: str) -> str:
+    """Build the Groq prompt for a mode."""
+    if mode == "plan":
+        return f"""You are an AI software architect. Create a structured project plan for this idea: {idea}
 
 Return ONLY valid JSON with this structure:
 {{"phases": [{{"name": "Phase 1: ...", "tasks": ["task1", "task2"]}}]}}"""
 
-        elif mode == "optimize":
-            prompt = f"""You are an expert Prompt Engineer. Rewrite this idea into a detailed, professional software development prompt.
+    elif mode == "optimize":
+        return f"""You are an expert Prompt Engineer. Rewrite this idea into a detailed, professional software development prompt.
 Focus on: Modern UI (glassmorphism/dark mode), clean architecture, and best practices.
 Keep it strictly as a prompt for an AI coder.
 
 Idea: {idea}
 
 Return ONLY the optimized prompt text."""
-        elif mode == "code":
-            prompt = f"""You are an expert developer. Generate clean, working code for: {idea}
+    elif mode == "code":
+        return f"""You are an expert developer. Generate clean, working code for: {idea}
 
 Return ONLY the code, no markdown or explanations."""
-        elif mode == "review":
-            prompt = f"""You are an expert code reviewer. Review this code and return JSON:
+    elif mode == "review":
+        return f"""You are an expert code reviewer. Review this code and return JSON:
 {{"issues": ["issue1"], "summary": "Brief summary"}}
 
 Code to review:
 {idea}"""
-        else:
-            prompt = f"Help with: {idea}"
-
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-            max_tokens=2048
-        )
-        
-        content = response.choices[0].message.content
-        
-        # Try to parse as JSON for plan/review modes
-        if mode in ["plan", "review"]:
-            import json
-            try:
-                # Find JSON in response
-                start = content.find('{')
-                end = content.rfind('}') + 1
-                if start >= 0 and end > start:
-                    return json.loads(content[start:end])
-            except:
-                pass
-        
-        if mode == "code":
-            # Clean markdown if present
-            if "```" in content:
-                lines = content.split("\n")
-                code_lines = []
-                in_code = False
-                for line in lines:
-                    if line.startswith("```"):
-                        in_code = not in_code
-                        continue
-                    if in_code:
-                        code_lines.append(line)
-                return {"code": "\n".join(code_lines) if code_lines else content}
-            return {"code": content}
-        
-        return {"response": content}
-        
-    except Exception as e:
-        print(f"Groq API error: {e}")
-        log_agent_error(f"Groq Error: {e}")
-        result = mock_response(idea, mode, error_msg=str(e))
-        result["_mock_fallback"] = True  # Flag for rate limit tracking
+    return f"Help with: {idea}"
+
+def _parse_groq_content(content: str, mode: str) -> dict:
+    """Turn a raw Groq completion into the agent's result dict."""
+    # Try to parse as JSON for plan/review modes
+    if mode in ["plan", "review"]:
+        import json
+        try:
+            # Find JSON in response
+            start = content.find('{')
+            end = content.rfind('}') + 1
+            if start >= 0 and end > start:
+                return json.loads(content[start:end])
+        except:
+            pass
+    
+    if mode == "code":
+        # Clean markdown if present
+        if "```" in content:
+            lines = content.split("\n")
+            code_lines = []
+            in_code = False
+            for line in lines:
+                if line.startswith("```"):
+                    in_code = not in_code
+                    continue
+                if in_code:
+                    code_lines.append(line)
+            return {"code": "\n".join(code_lines) if code_lines else content}
+        return {"code": content}
+    
+    return {"response": content}
+
+def _groq_fallback(idea: str, mode: str, e: Exception) -> dict:
+    print(f"Groq API error: {e}")
+    log_agent_error(f"Groq Error: {e}")
+    result = mock_response(idea, mode, error_msg=str(e))
+    result["_mock_fallback"] = True  # Flag for rate limit tracking
+    return result
+
+def _groq_usage(response):
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None)
+
+def _rate_limit_retry(limiter, e: Exception, attempt: int) -> bool:
+    """On a 429, hold the limiter for the retry-after window and say whether to re-send."""
+    if not is_rate_limit_error(e) or attempt >= RATE_LIMIT_RETRIES:
+        return False
+    limiter.penalize(parse_retry_after(e) or 2 ** attempt)
+    return True
+
+def _groq_stream(prompt: str, on_delta):
+    """Streaming Groq completion; forwards each text delta and returns (content, usage)."""
+    on_delta(None)  # a new attempt: anything a failed earlier one streamed is void
+    stream = client.chat.completions.create(
+        model=GROQ_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=GROQ_TEMPERATURE,
+        max_tokens=2048,
+        stream=True,
+        timeout=call_timeout(PROVIDER_TIMEOUT)
+    )
+    parts = []
+    usage = None
+    for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            parts.append(delta)
+            on_delta(delta)
+        x_groq = getattr(chunk, "x_groq", None)
+        if getattr(x_groq, "usage", None) is not None:
+            usage = x_groq.usage.total_tokens
+    return "".join(parts), usage
+
+def groq_request(idea: str, mode: str, on_delta=None):
+    """Use Groq API (llama-3.3-70b-versatile). Streams deltas to on_delta when given."""
+    prompt = _groq_prompt(idea, mode)
+    limiter = limiters["groq"]
+    estimated = estimate_tokens(prompt)
+    
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        limiter.acquire(estimated)
+        try:
+            if on_delta:
+                content, usage = _groq_stream(prompt, on_delta)
+                limiter.record_usage(estimated, usage)
+                return _parse_groq_content(content, mode)
+            
+            response = client.chat.completions.create(
+                model=GROQ_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=GROQ_TEMPERATURE,
+                max_tokens=2048,
+                timeout=call_timeout(PROVIDER_TIMEOUT)
+            )
+            limiter.record_usage(estimated, _groq_usage(response))
+            return _parse_groq_content(response.choices[0].message.content, mode)
+            
+        except Exception as e:
+            if _rate_limit_retry(limiter, e, attempt):
+                continue
+            return _groq_fallback(idea, mode, e)
+
+async def groq_request_async(idea: str, mode: str):
+    """Async Groq request - same contract as groq_request."""
+    prompt = _groq_prompt(idea, mode)
+    limiter = limiters["groq"]
+    estimated = estimate_tokens(prompt)
+    
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        await limiter.acquire_async(estimated)
+        try:
+            response = await async_client.chat.completions.create(
+                model=GROQ_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=GROQ_TEMPERATURE,
+                max_tokens=2048,
+                timeout=call_timeout(PROVIDER_TIMEOUT)
+            )
+            limiter.record_usage(estimated, _groq_usage(response))
+            return _parse_groq_content(response.choices[0].message.content, mode)
+            
+        except Exception as e:
+            if _rate_limit_retry(limiter, e, attempt):
+                continue
+            return _groq_fallback(idea, mode, e)
+
+def _gemini_prompt(idea: str, mode: str) -> str:
+    """Build the Gemini prompt for a mode."""
+    if mode == "plan":
+        return f"You are an AI software architect. Create a structured project plan (JSON) for: {idea}. Return ONLY valid JSON with 'phases' list."
+    elif mode == "optimize":
+        return f"Rewrite this into a detailed developer prompt for an AI: {idea}. Focus on modern UI and best practices. Return ONLY the rewritten prompt."
+    elif mode == "code":
+        return f"You are an expert developer. Generate code for: {idea}. Return ONLY the code."
+    elif mode == "review":
+        return f"Review this code and return JSON with 'issues' and 'summary': {idea}"
+    return f"Help with: {idea}"
+
+def _gemini_fallback(idea: str, mode: str, e: Exception) -> dict:
+    if "429" in str(e):
+        print(f"Gemini quota exceeded, using mock: {e}")
+        result = mock_response(idea, mode, error_msg="Gemini 429: Rate Limited")
+        result["_mock_fallback"] = True
         return result
+    log_agent_error(f"Gemini Error: {e}")
+    return {"error": str(e)}
 
-def gemini_request(idea: str, mode: str):
-    """Use Gemini API with fallback to mock on 429."""
-    try:
-        model = genai.GenerativeModel("gemini-2.0-flash")
-        
-        if mode == "plan":
-            prompt = f"You are an AI software architect. Create a structured project plan (JSON) for: {idea}. Return ONLY valid JSON with 'phases' list."
-        elif mode == "optimize":
-            prompt = f"Rewrite this into a detailed developer prompt for an AI: {idea}. Focus on modern UI and best practices. Return ONLY the rewritten prompt."
-        elif mode == "code":
-            prompt = f"You are an expert developer. Generate code for: {idea}. Return ONLY the code."
-        elif mode == "review":
-            prompt = f"Review this code and return JSON with 'issues' and 'summary': {idea}"
-        else:
-            prompt = f"Help with: {idea}"
+def _gemini_usage(response):
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "total_token_count", None)
 
-        response = model.generate_content(prompt)
-        return {"response": response.text}
-        
-    except Exception as e:
-        if "429" in str(e):
-            print(f"Gemini quota exceeded, using mock: {e}")
-            return mock_response(idea, mode, error_msg="Gemini 429: Rate Limited")
-        log_agent_error(f"Gemini Error: {e}")
-        return {"error": str(e)}
-
-def run_agent(idea: str, mode: str = "plan"):
-    """
-    Main agent function - routes to appropriate AI provider.
-    Returns response with rate_limited flag when applicable.
-    """
-    global _rate_limited
+def gemini_request(idea: str, mode: str, on_delta=None):
+    """Use Gemini API with fallback to mock on 429. Streams deltas to on_delta when given."""
+    prompt = _gemini_prompt(idea, mode)
+    limiter = limiters["gemini"]
+    estimated = estimate_tokens(prompt)
+    
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        limiter.acquire(estimated)
+        try:
+            model = genai.GenerativeModel(GEMINI_MODEL)
+            if on_delta:
+                parts = []
+                on_delta(None)  # a new attempt: anything a failed earlier one streamed is void
+                response = model.generate_content(prompt, stream=True, request_options={"timeout": call_timeout(PROVIDER_TIMEOUT)})
+                for chunk in response:
+                    if chunk.text:
+                        parts.append(chunk.text)
+                        on_delta(chunk.text)
+                limiter.record_usage(estimated, _gemini_usage(response))
+                return {"response": "".join(parts)}
+            
+            response = model.generate_content(prompt, request_options={"timeout": call_timeout(PROVIDER_TIMEOUT)})
+            limiter.record_usage(estimated, _gemini_usage(response))
+            return {"response": response.text}
+            
+        except Exception as e:
+            if _rate_limit_retry(limiter, e, attempt):
+                continue
+            return _gemini_fallback(idea, mode, e)
+
+async def gemini_request_async(idea: str, mode: str):
+    """Async Gemini request - same contract as gemini_request."""
+    prompt = _gemini_prompt(idea, mode)
+    limiter = limiters["gemini"]
+    estimated = estimate_tokens(prompt)
     
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        await limiter.acquire_async(estimated)
+        try:
+            model = genai.GenerativeModel(GEMINI_MODEL)
+            response = await model.generate_content_async(prompt, request_options={"timeout": call_timeout(PROVIDER_TIMEOUT)})
+            limiter.record_usage(estimated, _gemini_usage(response))
+            return {"response": response.text}
+            
+        except Exception as e:
+            if _rate_limit_retry(limiter, e, attempt):
+                continue
+            return _gemini_fallback(idea, mode, e)
+
+async def mock_response_async(idea: str, mode: str, error_msg: str = ""):
+    """Async mock - yields to the event loop like a real provider call would."""
+    await asyncio.sleep(0)
+    return mock_response(idea, mode, error_msg)
+
+def _preloaded_response(idea: str, mode: str):
+    """Return the preloaded demo answer for this prompt, or None."""
     # CHECK FOR PRELOADED DEMOS (Hackathon Mode)
     from .preloaded import get_preloaded_project
     preloaded = get_preloaded_project(idea)
@@ -318,21 +470,243 @@ def run_agent(idea: str, mode: str = "plan"):
             
             if code_content:
                  return {"code": code_content}
+    return None
+
+PROVIDER_CALLS = {"groq": groq_request, "gemini": gemini_request}
+PROVIDER_CALLS_ASYNC = {"groq": groq_request_async, "gemini": gemini_request_async}
+
+def _response_key(provider: str, idea: str, mode: str):
+    """Cache key for one provider's answer to this prompt."""
+    if provider == "groq":
+        return cache_key("groq", GROQ_MODEL, mode, idea, GROQ_TEMPERATURE)
+    return cache_key("gemini", GEMINI_MODEL, mode, idea, None)
+
+def _cached_response(providers: list, idea: str, mode: str):
+    # Any provider's cached answer will do; check them in routing order
+    for provider in providers:
+        cached = response_cache.get(_response_key(provider, idea, mode))
+        if cached is not None:
+            return cached
+    return None
+
+def _is_ok(result: dict) -> bool:
+    return not result.get("_mock_fallback") and "error" not in result
+
+def _circuit_open_result(provider: str, idea: str, mode: str) -> dict:
+    # Fail fast instead of waiting out another network timeout
+    result = mock_response(idea, mode, error_msg=f"{provider} unavailable (circuit open)")
+    result["_mock_fallback"] = True
+    return result
+
+def _record_outcome(provider: str, mode: str, start: float, result: dict):
+    ok = _is_ok(result)
+    router.record(provider, mode, time.monotonic() - start, ok)
+    if ok:
+        breakers[provider].record_success()
+    else:
+        breakers[provider].record_failure()
+
+def _timed_call(provider: str, idea: str, mode: str, on_delta=None) -> dict:
+    if not breakers[provider].allow():
+        return _circuit_open_result(provider, idea, mode)
+    start = time.monotonic()
+    try:
+        result = PROVIDER_CALLS[provider](idea, mode, on_delta=on_delta)
+    except BaseException:
+        # Cancelled mid-call: no verdict on the provider, but a half-open probe slot must come back
+        breakers[provider].release_probe()
+        raise
+    _record_outcome(provider, mode, start, result)
+    return result
+
+async def _timed_call_async(provider: str, idea: str, mode: str) -> dict:
+    if not breakers[provider].allow():
+        return _circuit_open_result(provider, idea, mode)
+    start = time.monotonic()
+    try:
+        result = await PROVIDER_CALLS_ASYNC[provider](idea, mode)
+    except BaseException:
+        # e.g. the losing hedge leg being cancelled
+        breakers[provider].release_probe()
+        raise
+    _record_outcome(provider, mode, start, result)
+    return result
+
+def _route(mode: str) -> list:
+    """Router order, with providers whose circuit is open moved to the back."""
+    return sorted(router.route(mode), key=lambda p: breakers[p].state == OPEN)
+
+def _hedged_call(providers: list, idea: str, mode: str, delay: float):
+    """Send to the best provider; if it hasn't answered by its p95, race a second one."""
+    first = _hedge_pool.submit(contextvars.copy_context().run, _timed_call, providers[0], idea, mode)
+    done, _ = wait([first], timeout=delay)
+    if done and _is_ok(first.result()):
+        return providers[0], first.result()
+    
+    router.count("failovers" if done else "hedged")
+    second = _hedge_pool.submit(contextvars.copy_context().run, _timed_call, providers[1], idea, mode)
+    legs = {first: providers[0], second: providers[1]}
+    pending = set(legs)
+    result = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            provider, result = legs[future], future.result()
+            if _is_ok(result):
+                if future is second:
+                    router.count("hedge_wins")
+                # The losing leg finishes in the background and still feeds the stats
+                return provider, result
+    return provider, result
+
+async def _hedged_call_async(providers: list, idea: str, mode: str, delay: float):
+    """Async hedging; the losing request is cancelled."""
+    first = asyncio.ensure_future(_timed_call_async(providers[0], idea, mode))
+    done, _ = await asyncio.wait([first], timeout=delay)
+    if done and _is_ok(first.result()):
+        return providers[0], first.result()
+    
+    router.count("failovers" if done else "hedged")
+    second = asyncio.ensure_future(_timed_call_async(providers[1], idea, mode))
+    legs = {first: providers[0], second: providers[1]}
+    pending = set(legs)
+    result = None
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            provider, result = legs[task], task.result()
+            if _is_ok(result):
+                if task is second:
+                    router.count("hedge_wins")
+                for loser in pending:
+                    loser.cancel()
+                return provider, result
+    return provider, result
+
+def _routed_call(providers: list, idea: str, mode: str, on_delta=None):
+    """Call providers best-first, failing over on errors. Returns (provider, result)."""
+    # Streamed output can't be raced: both legs would write into the same stream
+    delay = None if on_delta else router.hedge_delay(providers[0], mode)
+    if delay is not None:
+        return _hedged_call(providers, idea, mode, delay)
+    
+    for i, provider in enumerate(providers):
+        result = _timed_call(provider, idea, mode, on_delta)
+        if _is_ok(result) or i == len(providers) - 1:
+            return provider, result
+        router.count("failovers")
+
+async def _routed_call_async(providers: list, idea: str, mode: str):
+    """Async _routed_call."""
+    delay = router.hedge_delay(providers[0], mode)
+    if delay is not None:
+        return await _hedged_call_async(providers, idea, mode, delay)
     
-    if MOCK_MODE:
+    for i, provider in enumerate(providers):
+        result = await _timed_call_async(provider, idea, mode)
+        if _is_ok(result) or i == len(providers) - 1:
+            return provider, result
+        router.count("failovers")
+
+def _finish_provider_result(provider: str, result: dict, idea: str, mode: str) -> dict:
+    """Update rate limit state and cache real (non-fallback, non-error) responses."""
+    global _rate_limited
+    # Check if it fell back to mock (rate limited)
+    if result.pop("_mock_fallback", False):
+        _rate_limited = True
+    else:
         _rate_limited = False
-        return mock_response(idea, mode)
+        if "error" not in result:
+            response_cache.set(_response_key(provider, idea, mode), result)
+    return result
+
+def _result_text(result: dict) -> str:
+    return result.get("code") or result.get("response") or ""
+
+def run_agent(idea: str, mode: str = "plan", on_delta=None):
+    """
+    Main agent function - routes to the fastest healthy AI provider.
+    Returns response with rate_limited flag when applicable.
+    With on_delta, completion text is also streamed to on_delta(text) as it
+    arrives (all at once for preloaded, mock, cached and coalesced answers).
+    on_delta(None) means the text sent so far is void: a 429 retry or a failover
+    restarts the stream, and what follows replaces it.
+    Raises BuildCancelled once the current build is cancelled or out of time;
+    provider calls are capped at the build's remaining deadline.
+    """
+    global _rate_limited
+    check_cancelled()
     
-    if USE_GROQ:
-        result = groq_request(idea, mode)
-        # Check if it fell back to mock (rate limited)
-        if result.get("_mock_fallback"):
-            _rate_limited = True
-            del result["_mock_fallback"]
-        else:
-            _rate_limited = False
+    streamed = []
+    def forward(text):
+        # Raising here ends the provider stream, so a cancelled build stops consuming tokens
+        check_cancelled()
+        if text is None:
+            if streamed:
+                streamed.clear()
+                on_delta(None)
+            return
+        streamed.append(text)
+        on_delta(text)
+    
+    def finish(result):
+        if on_delta and not streamed and isinstance(result, dict):
+            text = _result_text(result)
+            if text:
+                on_delta(text)
         return result
-    elif USE_GEMINI:
-        return gemini_request(idea, mode)
-    else:
-        return mock_response(idea, mode)
+    
+    preloaded = _preloaded_response(idea, mode)
+    if preloaded is not None:
+        return finish(preloaded)
+    
+    if MOCK_MODE or not PROVIDERS:
+        _rate_limited = False
+        return finish(mock_response(idea, mode))
+    
+    providers = _route(mode)
+    cached = _cached_response(providers, idea, mode)
+    if cached is not None:
+        return finish(cached)
+    
+    # Identical concurrent requests (e.g. template traffic) share one upstream call
+    def call():
+        provider, result = _routed_call(providers, idea, mode, forward if on_delta else None)
+        return _finish_provider_result(provider, result, idea, mode)
+    
+    while True:
+        try:
+            return finish(single_flight.do(cache_key("*", "*", mode, idea, None), call))
+        except BuildCancelled:
+            # A call shared with another build may die of that build's cancellation; only give up for ours
+            build = current_build()
+            if build is None or build.cancelled:
+                raise
+
+async def run_agent_async(idea: str, mode: str = "plan"):
+    """
+    Async run_agent - awaits the provider instead of blocking the event loop.
+    Same routing and return contract as run_agent, including the current
+    build's cancellation and deadline (the contextvar follows into tasks).
+    """
+    global _rate_limited
+    check_cancelled()
+    
+    preloaded = _preloaded_response(idea, mode)
+    if preloaded is not None:
+        return preloaded
+    
+    if MOCK_MODE or not PROVIDERS:
+        _rate_limited = False
+        return await mock_response_async(idea, mode)
+    
+    providers = _route(mode)
+    cached = _cached_response(providers, idea, mode)
+    if cached is not None:
+        return cached
+    
+    async def call():
+        provider, result = await _routed_call_async(providers, idea, mode)
+        return _finish_provider_result(provider, result, idea, mode)
+    
+    return await single_flight.do_async(cache_key("*", "*", mode, idea, None), call)
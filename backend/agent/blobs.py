@@ -0,0 +1,91 @@
+"""
+Blob Store - Content-addressed, zlib-compressed file contents.
+storage/blobs/ab/abcdef... holds each distinct file body once, so memory
+records only need a path -> hash map and identical files are stored once.
+"""
+import hashlib
+import os
+import threading
+import time
+import zlib
+from pathlib import Path
+
+from .storage import atomic_write_bytes
+
+BLOB_DIR = Path("storage/blobs")
+BLOB_COMPRESSION = int(os.getenv("BLOB_COMPRESSION", "6"))  # zlib level 0-9
+BLOB_GC_GRACE = float(os.getenv("BLOB_GC_GRACE", "3600"))     # seconds an unreferenced blob survives GC
+
+def blob_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+class BlobStore:
+    """Write-once blobs keyed by the SHA-256 of their content."""
+
+    def __init__(self, directory: Path = BLOB_DIR, level: int = BLOB_COMPRESSION):
+        self.directory = Path(directory)
+        self.level = level
+        self.counters = {"writes": 0, "dedup_hits": 0, "bytes_in": 0, "bytes_stored": 0}
+        self._lock = threading.Lock()
+
+    def _path(self, digest: str) -> Path:
+        return self.directory / digest[:2] / digest
+
+    def put(self, content: str) -> str:
+        """Store content (if new) and return its hash."""
+        digest = blob_hash(content)
+        path = self._path(digest)
+        if path.exists():
+            try:
+                # Fresh mtime keeps GC from collecting it before our record is saved
+                os.utime(path)
+            except OSError:
+                pass
+            else:
+                with self._lock:
+                    self.counters["dedup_hits"] += 1
+                return digest
+
+        data = zlib.compress(content.encode("utf-8"), self.level)
+        # Same content always has the same name, so a concurrent writer racing us is harmless.
+        # fsynced so a memory record never points at a blob lost in a crash.
+        atomic_write_bytes(path, data)
+        with self._lock:
+            self.counters["writes"] += 1
+            self.counters["bytes_in"] += len(content.encode("utf-8"))
+            self.counters["bytes_stored"] += len(data)
+        return digest
+
+    def get(self, digest: str):
+        """Content for a hash, or None if the blob is missing or unreadable."""
+        try:
+            return zlib.decompress(self._path(digest).read_bytes()).decode("utf-8")
+        except (OSError, zlib.error, UnicodeDecodeError):
+            return None
+
+    def gc(self, referenced: set, grace_seconds: float = BLOB_GC_GRACE) -> dict:
+        """
+        Delete blobs no record references. Recently written/touched blobs are
+        spared, since a build may be about to save a record pointing at them.
+        """
+        cutoff = time.time() - grace_seconds
+        removed, freed = 0, 0
+        for path in self.directory.glob("*/*"):
+            if path.name in referenced:
+                continue
+            try:
+                stat = path.stat()
+                if stat.st_mtime > cutoff:
+                    continue
+                path.unlink()
+            except OSError:
+                continue
+            removed += 1
+            freed += stat.st_size
+        return {"removed": removed, "bytes_freed": freed}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters)
+
+blob_store = BlobStore()
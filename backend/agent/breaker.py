@@ -0,0 +1,89 @@
+"""
+Circuit Breaker - Stops calling a provider that keeps failing.
+closed -> (N consecutive failures) -> open -> (recovery timeout) -> half-open
+half-open lets a few probe calls through: success closes it, failure re-opens it.
+"""
+import os
+import threading
+import time
+
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))                  # consecutive failures to open
+BREAKER_RECOVERY = float(os.getenv("BREAKER_RECOVERY", "30"))               # seconds open before probing
+BREAKER_HALF_OPEN_CALLS = int(os.getenv("BREAKER_HALF_OPEN_CALLS", "1"))   # concurrent probes allowed
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """Per-provider circuit breaker."""
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURES,
+                 recovery_timeout: float = BREAKER_RECOVERY, half_open_max_calls: int = BREAKER_HALF_OPEN_CALLS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+        self.counters = {"opened": 0, "rejected": 0, "successes": 0, "failures": 0}
+
+    def _advance(self, now: float):
+        if self._state == OPEN and now - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._advance(time.monotonic())
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go through now. Half-open admits a limited number of probes."""
+        with self._lock:
+            self._advance(time.monotonic())
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return True
+            self.counters["rejected"] += 1
+            return False
+
+    def release_probe(self):
+        """Give back a probe slot taken by allow() for a call that ended without an outcome (e.g. cancelled)."""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record_success(self):
+        with self._lock:
+            self.counters["successes"] += 1
+            self._failures = 0
+            self._state = CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.counters["failures"] += 1
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.counters["opened"] += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        """State and counters for /status."""
+        with self._lock:
+            now = time.monotonic()
+            self._advance(now)
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "retry_in_seconds": round(max(0.0, self.recovery_timeout - (now - self._opened_at)), 1) if self._state == OPEN else 0,
+                **self.counters,
+            }
@@ -0,0 +1,177 @@
+"""
+LLM Response Cache - Content-addressed cache for provider responses.
+Keeps an in-memory LRU tier in front of an on-disk tier under storage/.
+"""
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+CACHE_DIR = Path("storage/llm_cache")
+CACHE_ENABLED = os.getenv("LLM_CACHE", "true").lower() == "true"
+CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "86400"))            # seconds
+CACHE_MEMORY_ITEMS = int(os.getenv("LLM_CACHE_ITEMS", "256"))   # LRU entries
+CACHE_DISK_MB = int(os.getenv("LLM_CACHE_DISK_MB", "100"))      # disk tier size cap
+
+def cache_key(provider: str, model: str, mode: str, prompt: str, temperature) -> str:
+    """Content hash of everything that determines a provider response."""
+    raw = json.dumps([provider, model, mode, prompt, temperature], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """Two-tier (memory LRU + disk) response cache with TTL and size caps."""
+
+    def __init__(self, directory: Path = CACHE_DIR, ttl: int = CACHE_TTL,
+                 max_items: int = CACHE_MEMORY_ITEMS, max_disk_bytes: int = CACHE_DISK_MB * 1024 * 1024,
+                 enabled: bool = CACHE_ENABLED):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_items = max_items
+        self.max_disk_bytes = max_disk_bytes
+        self.enabled = enabled
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = None  # computed lazily on first write
+        self.counters = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "memory_evictions": 0, "disk_evictions": 0}
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str):
+        """Return a copy of the cached response, or None."""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry["created"] <= self.ttl:
+                self._memory.move_to_end(key)
+                self.counters["hits"] += 1
+                self.counters["memory_hits"] += 1
+                return copy.deepcopy(entry["value"])
+            if entry:
+                del self._memory[key]
+
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            entry = None
+
+        with self._lock:
+            if entry and now - entry.get("created", 0) <= self.ttl:
+                self._remember(key, entry)
+                self.counters["hits"] += 1
+                self.counters["disk_hits"] += 1
+                return copy.deepcopy(entry["value"])
+            self.counters["misses"] += 1
+
+        if entry:
+            self._remove_file(path)
+        return None
+
+    def set(self, key: str, value: dict):
+        """Store a response in both tiers."""
+        if not self.enabled:
+            return
+
+        entry = {"created": time.time(), "value": copy.deepcopy(value)}
+        data = json.dumps(entry, ensure_ascii=False)
+        path = self._path(key)
+
+        with self._lock:
+            self._remember(key, entry)
+            self.counters["writes"] += 1
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(data, encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError:
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(p.stat().st_size for p in self.directory.glob("*/*.json"))
+            else:
+                self._disk_bytes += len(data.encode("utf-8"))
+            over = self._disk_bytes > self.max_disk_bytes
+        if over:
+            self._evict_disk()
+
+    def _remember(self, key: str, entry: dict):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+            self.counters["memory_evictions"] += 1
+
+    def _remove_file(self, path: Path):
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes -= size
+
+    def _evict_disk(self):
+        """Drop the oldest disk entries until the tier is back under ~90% of its cap."""
+        files = []
+        for p in self.directory.glob("*/*.json"):
+            try:
+                stat = p.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, p))
+        files.sort()
+
+        total = sum(size for _, size, _ in files)
+        target = self.max_disk_bytes * 0.9
+        evicted = 0
+        for _, size, p in files:
+            if total <= target:
+                break
+            try:
+                p.unlink()
+                total -= size
+                evicted += 1
+            except OSError:
+                pass
+
+        with self._lock:
+            self._disk_bytes = total
+            self.counters["disk_evictions"] += evicted
+
+    def clear(self):
+        """Empty both tiers."""
+        with self._lock:
+            self._memory.clear()
+            self._disk_bytes = 0
+        for p in self.directory.glob("*/*.json"):
+            try:
+                p.unlink()
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        """Hit/miss counters and tier sizes for /status."""
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                "enabled": self.enabled,
+                **self.counters,
+                "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+                "ttl_seconds": self.ttl,
+            }
+
+response_cache = ResponseCache()
@@ -0,0 +1,81 @@
+"""
+Build Cancellation - Cooperative cancellation and deadlines for one build.
+The running build's BuildContext lives in a contextvar that is copied into
+the worker threads the build fans out to, so run_agent and the streaming
+loops can check it and stop paying for LLM calls nobody will read.
+"""
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+BUILD_DEADLINE = float(os.getenv("BUILD_DEADLINE", "900"))  # seconds per build, 0 disables
+
+class BuildCancelled(BaseException):
+    """
+    The build was cancelled. A BaseException (like asyncio.CancelledError) so the
+    provider fallbacks' `except Exception` don't turn it into a mock answer.
+    """
+
+class DeadlineExceeded(BuildCancelled):
+    """The build ran past its deadline."""
+
+class BuildContext:
+    """Cancellation flag and deadline shared by everything one build runs."""
+
+    def __init__(self, job_id: str = None, deadline: float = BUILD_DEADLINE):
+        self.job_id = job_id
+        self.deadline = time.monotonic() + deadline if deadline > 0 else None
+        self.reason = None
+        self._cancelled = threading.Event()
+
+    def cancel(self, reason: str = "Build cancelled"):
+        if not self._cancelled.is_set():
+            self.reason = reason
+            self._cancelled.set()
+
+    def remaining(self):
+        """Seconds until the deadline, or None without one."""
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set() or (self.deadline is not None and self.remaining() <= 0)
+
+    def check(self):
+        """Raise if the build should stop."""
+        if self._cancelled.is_set():
+            raise BuildCancelled(self.reason)
+        if self.deadline is not None and self.remaining() <= 0:
+            raise DeadlineExceeded("Build deadline exceeded")
+
+_current = contextvars.ContextVar("build_context", default=None)
+
+def current_build():
+    """The BuildContext of the build running here, or None."""
+    return _current.get()
+
+def check_cancelled():
+    """Raise BuildCancelled if the current build was cancelled or is past its deadline."""
+    context = _current.get()
+    if context is not None:
+        context.check()
+
+def call_timeout(default: float) -> float:
+    """default, shortened to what is left of the current build's deadline."""
+    context = _current.get()
+    remaining = context.remaining() if context is not None else None
+    return default if remaining is None else max(0.1, min(default, remaining))
+
+@contextmanager
+def build_context(context: BuildContext):
+    """Make context the current build for this thread (and threads started via copy_context)."""
+    token = _current.set(context)
+    try:
+        yield context
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            pass  # generator finalized from another context
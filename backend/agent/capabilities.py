@@ -1,12 +1,13 @@
 """
 Advanced Agent Capabilities - Auto-fix, CI/CD, Tests, Deploy
 """
-from .agent import run_agent
+from .agent import run_agent, run_agent_async
 import os
 
-def generate_cicd_pipeline(project_type: str, files: list) -> dict:
-    """Generate CI/CD pipeline configuration based on project type."""
-    prompt = f"""Generate a GitHub Actions CI/CD pipeline for this project.
+CICD_PATH = ".github/workflows/main.yml"
+
+def _cicd_prompt(project_type: str, files: list) -> str:
+    return f"""Generate a GitHub Actions CI/CD pipeline for this project.
 
 Project type: {project_type}
 Files: {files}
@@ -21,7 +22,15 @@ Create a complete .github/workflows/main.yml file that:
 
 Return ONLY the YAML content, no markdown."""
 
-    result = run_agent(prompt, mode="code")
+def generate_cicd_pipeline(project_type: str, files: list) -> dict:
+    """Generate CI/CD pipeline configuration based on project type."""
+    return _cicd_result(run_agent(_cicd_prompt(project_type, files), mode="code"))
+
+async def generate_cicd_pipeline_async(project_type: str, files: list) -> dict:
+    """Async generate_cicd_pipeline."""
+    return _cicd_result(await run_agent_async(_cicd_prompt(project_type, files), mode="code"))
+
+def _cicd_result(result: dict) -> dict:
     yaml_content = result.get("code") or result.get("response", "")
     
     # Clean markdown
@@ -30,14 +39,13 @@ Return ONLY the YAML content, no markdown."""
         yaml_content = "\n".join(l for l in lines if not l.strip().startswith("```"))
     
     return {
-        "path": ".github/workflows/main.yml",
+        "path": CICD_PATH,
         "content": yaml_content.strip(),
         "type": "cicd"
     }
 
-def generate_unit_tests(code: str, filename: str) -> dict:
-    """Generate unit tests for the given code."""
-    prompt = f"""Generate comprehensive unit tests for this code.
+def _tests_prompt(code: str, filename: str) -> str:
+    return f"""Generate comprehensive unit tests for this code.
 
 FILE: {filename}
 CODE:
@@ -51,27 +59,35 @@ Create proper unit tests that:
 
 Return ONLY the test code, no markdown."""
 
-    result = run_agent(prompt, mode="code")
+def generate_unit_tests(code: str, filename: str) -> dict:
+    """Generate unit tests for the given code."""
+    return _tests_result(run_agent(_tests_prompt(code, filename), mode="code"), filename)
+
+async def generate_unit_tests_async(code: str, filename: str) -> dict:
+    """Async generate_unit_tests."""
+    return _tests_result(await run_agent_async(_tests_prompt(code, filename), mode="code"), filename)
+
+def _tests_result(result: dict, filename: str) -> dict:
     test_content = result.get("code") or result.get("response", "")
     
     if "```" in test_content:
         lines = test_content.split("\n")
         test_content = "\n".join(l for l in lines if not l.strip().startswith("```"))
     
-    # Generate test filename
-    base = os.path.splitext(filename)[0]
-    ext = os.path.splitext(filename)[1]
-    test_filename = f"test_{base}{ext}"
-    
     return {
-        "path": test_filename,
+        "path": get_test_filename(filename),
         "content": test_content.strip(),
         "type": "test"
     }
 
-def auto_fix_code(code: str, error_message: str = "") -> dict:
-    """Fix ALL errors in code and improve quality."""
-    prompt = f"""You are an expert code fixer. Fix ALL issues in this code and improve its quality.
+def get_test_filename(filename: str) -> str:
+    """Test file path generated for a source file."""
+    base = os.path.splitext(filename)[0]
+    ext = os.path.splitext(filename)[1]
+    return f"test_{base}{ext}"
+
+def _fix_prompt(code: str, error_message: str) -> str:
+    return f"""You are an expert code fixer. Fix ALL issues in this code and improve its quality.
 
 CURRENT CODE:
 {code}
@@ -91,7 +107,15 @@ YOUR TASK:
 IMPORTANT: Return ONLY the complete fixed code. No explanations, no markdown, just pure code.
 The code must be complete and ready to run."""
 
-    result = run_agent(prompt, mode="code")
+def auto_fix_code(code: str, error_message: str = "") -> dict:
+    """Fix ALL errors in code and improve quality."""
+    return _fix_result(run_agent(_fix_prompt(code, error_message), mode="code"))
+
+async def auto_fix_code_async(code: str, error_message: str = "") -> dict:
+    """Async auto_fix_code."""
+    return _fix_result(await run_agent_async(_fix_prompt(code, error_message), mode="code"))
+
+def _fix_result(result: dict) -> dict:
     fixed_code = result.get("code") or result.get("response", "")
     
     # Clean markdown artifacts
@@ -115,9 +139,8 @@ The code must be complete and ready to run."""
         "type": "fix"
     }
 
-def generate_dockerfile(project_type: str, files: list) -> dict:
-    """Generate Dockerfile for deployment."""
-    prompt = f"""Generate a production-ready Dockerfile.
+def _dockerfile_prompt(project_type: str, files: list) -> str:
+    return f"""Generate a production-ready Dockerfile.
 
 Project type: {project_type}
 Files: {files}
@@ -131,7 +154,15 @@ Create a Dockerfile that:
 
 Return ONLY the Dockerfile content, no markdown."""
 
-    result = run_agent(prompt, mode="code")
+def generate_dockerfile(project_type: str, files: list) -> dict:
+    """Generate Dockerfile for deployment."""
+    return _dockerfile_result(run_agent(_dockerfile_prompt(project_type, files), mode="code"))
+
+async def generate_dockerfile_async(project_type: str, files: list) -> dict:
+    """Async generate_dockerfile."""
+    return _dockerfile_result(await run_agent_async(_dockerfile_prompt(project_type, files), mode="code"))
+
+def _dockerfile_result(result: dict) -> dict:
     dockerfile = result.get("code") or result.get("response", "")
     
     if "```" in dockerfile:
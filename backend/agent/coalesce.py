@@ -0,0 +1,81 @@
+"""
+Request Coalescing - Single-flight for identical in-flight LLM calls.
+Concurrent callers with the same key share one upstream call and its result.
+"""
+import asyncio
+import copy
+import threading
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Deduplicates concurrent calls by key, for both threads and asyncio tasks."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = {}
+        self.counters = {"upstream_calls": 0, "coalesced": 0}
+
+    def do(self, key: str, fn):
+        """Run fn() once per key at a time; concurrent callers wait and share the result."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.counters["upstream_calls"] += 1
+            else:
+                self.counters["coalesced"] += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        # Every caller gets its own copy; results are mutated downstream
+        return copy.deepcopy(call.result)
+
+    async def do_async(self, key: str, coro_fn):
+        """Async do(): concurrent awaiters of the same key share one task."""
+        loop = asyncio.get_running_loop()
+        task_key = (id(loop), key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            if task is None:
+                task = self._tasks[task_key] = loop.create_task(coro_fn())
+                task.add_done_callback(lambda _: self._forget_task(task_key))
+                self.counters["upstream_calls"] += 1
+            else:
+                self.counters["coalesced"] += 1
+
+        # shield: one caller being cancelled must not cancel the shared call
+        result = await asyncio.shield(task)
+        return copy.deepcopy(result)
+
+    def _forget_task(self, task_key):
+        with self._lock:
+            self._tasks.pop(task_key, None)
+
+    def stats(self) -> dict:
+        """Counters for /status."""
+        with self._lock:
+            return {
+                **self.counters,
+                "in_flight": len(self._calls) + len(self._tasks),
+            }
+
+single_flight = SingleFlight()
@@ -1,7 +1,7 @@
 """
 Code Generator Module - High quality, language-aware code generation.
 """
-from .agent import run_agent
+from .agent import run_agent, run_agent_async
 import os
 
 # File extension to language mapping
@@ -26,14 +26,9 @@ def get_language_info(filename: str) -> dict:
     ext = os.path.splitext(filename)[1].lower()
     return LANG_MAP.get(ext, {"name": "Python", "comment": "#"})
 
-def generate_file(idea: str, filename: str = "main.py") -> str:
-    """
-    Generates high-quality, language-appropriate code.
-    """
-    lang = get_language_info(filename)
-    lang_name = lang["name"]
-    
-    prompt = f"""You are an expert {lang_name} developer. Generate production-ready code.
+def _file_prompt(idea: str, filename: str, lang_name: str) -> str:
+    """Build the code generation prompt for one file."""
+    return f"""You are an expert {lang_name} developer. Generate production-ready code.
 
 PROJECT IDEA: {idea}
 
@@ -56,8 +51,24 @@ CRITICAL RULES:
 
 Return ONLY the {lang_name} code. No markdown, no explanations, no code fences."""
 
-    result = run_agent(prompt, mode="code")
-    
+def generate_file(idea: str, filename: str = "main.py", on_delta=None) -> str:
+    """
+    Generates high-quality, language-appropriate code.
+    on_delta(text) receives the raw completion as it streams in; on_delta(None)
+    means a retry or failover restarted it and the text so far should be dropped.
+    """
+    lang_name = get_language_info(filename)["name"]
+    result = run_agent(_file_prompt(idea, filename, lang_name), mode="code", on_delta=on_delta)
+    return _extract_code(result, lang_name)
+
+async def generate_file_async(idea: str, filename: str = "main.py") -> str:
+    """Async generate_file."""
+    lang_name = get_language_info(filename)["name"]
+    result = await run_agent_async(_file_prompt(idea, filename, lang_name), mode="code")
+    return _extract_code(result, lang_name)
+
+def _extract_code(result: dict, lang_name: str) -> str:
+    """Pull the code out of an agent result and clean it."""
     code = ""
     if "code" in result:
         code = result["code"]
@@ -211,16 +222,32 @@ button:hover {
     }
     return templates.get(language, "# Auto-generated file\n")
 
-def fix_code(code: str, issues: list, idea: str = "", filename: str = "main.py") -> str:
-    """Fix code issues while respecting the file's language."""
-    if not issues:
+def summarize_code(code: str, filename: str, max_chars: int = 3000) -> str:
+    """
+    Context for files that depend on this one: the full code when it is small,
+    otherwise just its signatures (functions, classes, exports, selectors, ids).
+    """
+    if len(code) <= max_chars:
         return code
     
-    lang = get_language_info(filename)
-    lang_name = lang["name"]
+    import re
+    lang_name = get_language_info(filename)["name"]
+    if lang_name == "Python":
+        pattern = r'^\s*(def |class |async def |import |from \S+ import )'
+    elif lang_name == "CSS":
+        pattern = r'^[^\s{}][^{}]*\{'
+    elif lang_name == "HTML":
+        pattern = r'(id=|class=|<script|<link|<form)'
+    else:
+        pattern = r'^\s*(export |function |async function |class |import |const \w+ = (\(|async|function))'
     
+    signatures = [line.rstrip(" {") for line in code.split("\n") if re.search(pattern, line)]
+    return "\n".join(signatures)[:max_chars]
+
+def _fix_prompt(code: str, issues: list, filename: str, lang_name: str) -> str:
+    """Build the prompt for fixing a file."""
     issues_text = "\n".join(f"- {issue}" for issue in issues)
-    prompt = f"""You are an expert {lang_name} developer. Fix the following code.
+    return f"""You are an expert {lang_name} developer. Fix the following code.
 
 FILE: {filename}
 LANGUAGE: {lang_name}
@@ -232,9 +259,27 @@ CURRENT CODE:
 {code}
 
 CRITICAL: Return ONLY valid {lang_name} code. No markdown, no explanations."""
+
+def fix_code(code: str, issues: list, idea: str = "", filename: str = "main.py") -> str:
+    """Fix code issues while respecting the file's language."""
+    if not issues:
+        return code
     
-    result = run_agent(prompt, mode="code")
+    lang_name = get_language_info(filename)["name"]
+    result = run_agent(_fix_prompt(code, issues, filename, lang_name), mode="code")
+    return _extract_fixed_code(result, code, lang_name)
+
+async def fix_code_async(code: str, issues: list, idea: str = "", filename: str = "main.py") -> str:
+    """Async fix_code."""
+    if not issues:
+        return code
     
+    lang_name = get_language_info(filename)["name"]
+    result = await run_agent_async(_fix_prompt(code, issues, filename, lang_name), mode="code")
+    return _extract_fixed_code(result, code, lang_name)
+
+def _extract_fixed_code(result: dict, code: str, lang_name: str) -> str:
+    """Cleaned fixed code, or the original code if the agent returned nothing."""
     if "code" in result:
         return clean_code(result["code"], lang_name)
     elif "response" in result:
@@ -0,0 +1,24 @@
+import pytest
+
+
+@pytest.fixture
+def isolated_storage(tmp_path, monkeypatch):
+    """
+    Point everything a build writes at tmp_path: workspaces go to tmp_path/output,
+    memory, blobs, the search index and the XP ledger to tmp_path/storage.
+    """
+    from agent import intelligence, memory, workspace
+    from agent.blobs import BlobStore
+    from agent.intelligence import IntelligenceLedger
+    from agent.memory_store import JsonlMemoryStore
+    from agent.search import InvertedIndex
+
+    storage = tmp_path / "storage"
+    monkeypatch.setattr(workspace, "WORKSPACE_ROOT", tmp_path / "output")
+    monkeypatch.setattr(memory, "blob_store", BlobStore(storage / "blobs"))
+    monkeypatch.setattr(memory, "_store", JsonlMemoryStore(storage / "memory.jsonl", storage / "memory.json"))
+    monkeypatch.setattr(memory, "_index", None)
+    monkeypatch.setattr("agent.memory.InvertedIndex", lambda: InvertedIndex(storage / "memory_index.jsonl"))
+    monkeypatch.setattr(intelligence, "ledger", IntelligenceLedger(
+        storage / "intelligence_events.jsonl", storage / "intelligence_snapshot.json", storage / "intelligence.json"))
+    return tmp_path
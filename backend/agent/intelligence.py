@@ -1,10 +1,24 @@
 """
 Intelligence System - Tracks Autogenesis growth and learning.
+Every XP award is an event appended to storage/intelligence_events.jsonl;
+stats are a replay of that log. Each process keeps the replayed state in
+memory, follows the log's tail for other workers' events and writes a
+snapshot (state + log offset) behind, so startup reads snapshot + tail.
 """
+import atexit
+import copy
 import json
+import os
+import threading
+from datetime import date, datetime, timedelta
 from pathlib import Path
 
-STATS_FILE = Path("storage/intelligence.json")
+from .storage import append_jsonl, atomic_write_text, file_lock, iter_jsonl, read_json
+
+STATS_FILE = Path("storage/intelligence.json")  # legacy aggregate, migrated into the ledger
+EVENTS_FILE = Path("storage/intelligence_events.jsonl")
+SNAPSHOT_FILE = Path("storage/intelligence_snapshot.json")
+SNAPSHOT_EVERY = int(os.getenv("INTELLIGENCE_SNAPSHOT_EVERY", "50"))  # events between snapshots
 
 # Growth stages
 STAGES = [
@@ -16,28 +30,187 @@ STAGES = [
     {"min": 95, "name": "Sage", "emoji": "🏆", "desc": "Legendary AI"},
 ]
 
+DEFAULT_STATS = {
+    "total_projects": 0,
+    "total_files": 0,
+    "total_issues_found": 0,
+    "total_issues_fixed": 0,
+    "languages_used": [],
+    "xp": 0,
+    "level": 0
+}
+
+COUNTERS = ("total_projects", "total_files", "total_issues_found", "total_issues_fixed", "xp")
+
+def _merge(stats: dict, delta: dict) -> dict:
+    """stats + delta: counters add up, languages are a union. Order-independent."""
+    merged = {**copy.deepcopy(DEFAULT_STATS), **copy.deepcopy(stats)}
+    for key in COUNTERS:
+        merged[key] += delta.get(key, 0)
+    for lang in delta.get("languages_used", []):
+        if lang not in merged["languages_used"]:
+            merged["languages_used"].append(lang)
+    merged["level"] = calculate_level(merged["xp"])
+    return merged
+
+def _empty_state() -> dict:
+    return {"stats": copy.deepcopy(DEFAULT_STATS), "xp_by_day": {}, "events": 0}
+
+def _apply_event(state: dict, event: dict):
+    """Fold one ledger event into the replayed state."""
+    if event.get("type") == "baseline":
+        # Totals carried over from the pre-ledger intelligence.json
+        state["stats"] = _merge(state["stats"], event.get("stats", {}))
+    elif event.get("type") == "project_xp":
+        state["stats"] = _merge(state["stats"], {
+            "total_projects": 1,
+            "total_files": event.get("files", 0),
+            "total_issues_found": event.get("issues", 0),
+            "xp": event.get("xp", 0),
+            "languages_used": event.get("languages", []),
+        })
+        day = event.get("timestamp", "")[:10]
+        state["xp_by_day"][day] = state["xp_by_day"].get(day, 0) + event.get("xp", 0)
+    state["events"] += 1
+
+class IntelligenceLedger:
+    """Append-only XP event log with snapshots; the replayed state is kept in memory."""
+
+    def __init__(self, events_path: Path = EVENTS_FILE, snapshot_path: Path = SNAPSHOT_FILE,
+                 legacy_path: Path = STATS_FILE, snapshot_every: int = SNAPSHOT_EVERY):
+        self.events_path = Path(events_path)
+        self.snapshot_path = Path(snapshot_path)
+        self.legacy_path = Path(legacy_path)
+        self.snapshot_every = snapshot_every
+        self._lock = threading.Lock()
+        self._state = None
+        self._read_to = 0
+        self._inode = None
+        self._snapshot_offset = 0
+        self._snapshot_events = 0
+        self.counters = {"replayed_events": 0, "snapshots": 0}
+
+    def _migrate_legacy(self):
+        if not self.legacy_path.exists() or self.events_path.exists():
+            return
+        with file_lock(self.events_path):
+            if not self.legacy_path.exists() or self.events_path.exists():
+                return
+            legacy = read_json(self.legacy_path, {})
+            append_jsonl(self.events_path, {"type": "baseline", "timestamp": datetime.now().isoformat(timespec="seconds"),
+                                            "stats": {k: legacy.get(k, DEFAULT_STATS[k]) for k in (*COUNTERS, "languages_used")}},
+                         lock=False)
+            self.legacy_path.replace(self.legacy_path.with_suffix(".json.migrated"))
+
+    def _load(self, stat):
+        """Start from the snapshot if it matches the current log, else from the beginning."""
+        self._state, self._read_to = _empty_state(), 0
+        self._snapshot_offset = self._snapshot_events = 0
+        self._inode = stat.st_ino if stat else None
+        snapshot = read_json(self.snapshot_path, None)
+        if not snapshot or stat is None:
+            return
+        offset = snapshot.get("offset", 0)
+        if offset > stat.st_size:
+            return  # log was reset or truncated since the snapshot
+        if offset:
+            with open(self.events_path, "rb") as f:
+                f.seek(offset - 1)
+                if f.read(1) != b"\n":
+                    return
+        self._state = {"stats": snapshot["stats"], "xp_by_day": snapshot.get("xp_by_day", {}), "events": snapshot.get("events", 0)}
+        self._read_to = self._snapshot_offset = offset
+        self._snapshot_events = self._state["events"]
+
+    def _refresh(self, migrate: bool = True):
+        """Apply events appended since last time (by any process)."""
+        if migrate:
+            self._migrate_legacy()
+        try:
+            stat = self.events_path.stat()
+        except OSError:
+            stat = None
+        size = stat.st_size if stat else 0
+        if self._state is None or (stat and stat.st_ino != self._inode) or size < self._read_to:
+            self._load(stat)
+        if stat is None or stat.st_size == self._read_to:
+            return
+        for _, end, event in iter_jsonl(self.events_path, self._read_to):
+            self._read_to = end
+            if event is not None:
+                _apply_event(self._state, event)
+                self.counters["replayed_events"] += 1
+
+    def get(self) -> dict:
+        with self._lock:
+            self._refresh()
+            return copy.deepcopy(self._state["stats"])
+
+    def xp_by_day(self) -> dict:
+        with self._lock:
+            self._refresh()
+            return dict(self._state["xp_by_day"])
+
+    def record(self, event: dict):
+        """Append an event (fsynced) and fold it, plus anything new from other workers, into the state."""
+        self.record_with(lambda stats: (event, None))
+
+    def record_with(self, build):
+        """
+        Append the event build(stats) returns as (event, result) and return result.
+        stats is replayed under the log's file lock, so an event derived from it (e.g. a
+        first-use bonus) can't be based on totals another worker is appending to meanwhile.
+        """
+        self._migrate_legacy()  # takes the same file lock
+        with file_lock(self.events_path), self._lock:
+            self._refresh(migrate=False)
+            event, result = build(copy.deepcopy(self._state["stats"]))
+            append_jsonl(self.events_path, {"timestamp": datetime.now().isoformat(timespec="seconds"), **event}, lock=False)
+            self._refresh(migrate=False)
+            due = self._state["events"] - self._snapshot_events >= self.snapshot_every
+        if due:
+            self.snapshot()
+        return result
+
+    def snapshot(self):
+        """Write the replayed state and its log offset, unless a newer snapshot exists."""
+        with self._lock:
+            self._refresh()
+            if self._read_to == 0 or self._read_to == self._snapshot_offset:
+                return
+            state, offset = copy.deepcopy(self._state), self._read_to
+        with file_lock(self.snapshot_path):
+            current = read_json(self.snapshot_path, None)
+            if current and current.get("offset", 0) >= offset:
+                return
+            atomic_write_text(self.snapshot_path, json.dumps({"offset": offset, **state}, indent=2))
+        with self._lock:
+            self._snapshot_offset, self._snapshot_events = offset, state["events"]
+            self.counters["snapshots"] += 1
+
+    def discard(self):
+        """Forget the in-memory state (after the files were deleted)."""
+        with self._lock:
+            self._state = None
+            self._read_to = 0
+
+ledger = IntelligenceLedger()
+atexit.register(ledger.snapshot)
+
 def get_stats() -> dict:
     """Load or initialize stats."""
-    if STATS_FILE.exists():
-        try:
-            return json.loads(STATS_FILE.read_text())
-        except:
-            pass
-    
-    return {
-        "total_projects": 0,
-        "total_files": 0,
-        "total_issues_found": 0,
-        "total_issues_fixed": 0,
-        "languages_used": [],
-        "xp": 0,
-        "level": 0
-    }
+    return ledger.get()
 
-def save_stats(stats: dict):
-    """Save stats to file."""
-    STATS_FILE.parent.mkdir(exist_ok=True)
-    STATS_FILE.write_text(json.dumps(stats, indent=2))
+def flush_stats():
+    """Write a ledger snapshot now (called on API shutdown)."""
+    ledger.snapshot()
+
+def get_xp_by_day(days: int = 30) -> list:
+    """XP earned per day for the last `days` days, oldest first."""
+    totals = ledger.xp_by_day()
+    today = date.today()
+    return [{"date": d, "xp": totals.get(d, 0)}
+            for d in ((today - timedelta(days=i)).isoformat() for i in range(days - 1, -1, -1))]
 
 def calculate_level(xp: int) -> int:
     """Calculate level percentage (0-100) from XP."""
@@ -54,13 +227,29 @@ def get_stage(level: int) -> dict:
             current_stage = stage
     return current_stage
 
-def add_project_xp(files_generated: int, issues_found: int, languages: list) -> dict:
+def add_project_xp(files_generated: int, issues_found: int, languages: list, project_id: str = None) -> dict:
     """
     Add XP for completing a project.
     Returns updated stats.
     """
-    stats = get_stats()
-    
+    # An appended event, so concurrent builds in other workers can't lose XP; the XP is
+    # worked out under the log lock so two builds can't both earn a language's first-use bonus
+    return ledger.record_with(lambda stats: _project_xp_event(stats, files_generated, issues_found, languages, project_id))
+
+def _project_xp_event(stats: dict, files_generated: int, issues_found: int, languages: list, project_id: str = None):
+    delta, result = _apply_project_xp(stats, files_generated, issues_found, languages)
+    return {
+        "type": "project_xp",
+        "project_id": project_id,
+        "files": files_generated,
+        "issues": issues_found,
+        "languages": list(languages),
+        "xp": delta["xp"],
+    }, result
+
+def _apply_project_xp(stats: dict, files_generated: int, issues_found: int, languages: list):
+    new_languages = []
+
     # Base XP for completing a project
     xp_gained = 10
     
@@ -77,18 +266,19 @@ def add_project_xp(files_generated: int, issues_found: int, languages: list) ->
     for lang in languages:
         if lang not in stats["languages_used"]:
             xp_gained += 10  # New language bonus
-            stats["languages_used"].append(lang)
+            new_languages.append(lang)
     
     # Update stats
-    stats["total_projects"] += 1
-    stats["total_files"] += files_generated
-    stats["total_issues_found"] += issues_found
-    stats["xp"] += xp_gained
-    stats["level"] = calculate_level(stats["xp"])
-    
-    save_stats(stats)
+    delta = {
+        "total_projects": 1,
+        "total_files": files_generated,
+        "total_issues_found": issues_found,
+        "xp": xp_gained,
+        "languages_used": new_languages,
+    }
+    stats = _merge(stats, delta)
     
-    return {
+    return delta, {
         "xp_gained": xp_gained,
         "total_xp": stats["xp"],
         "level": stats["level"],
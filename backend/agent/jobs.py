@@ -0,0 +1,465 @@
+"""
+Jobs - Background build queue.
+POST /jobs returns a job id right away; a fixed pool of worker threads pulls
+builds from a bounded queue and records every progress event, so clients
+poll GET /jobs/{id} or replay GET /jobs/{id}/events instead of holding a
+connection open for the whole pipeline. Each job keeps its newest
+JOB_EVENT_BUFFER events in a ring buffer; event ids ("<job_id>:<seq>") only
+ever increase, so a reconnecting client resumes from its Last-Event-ID.
+
+Two backends: "memory" (this process only) and "sqlite", a local stand-in
+for a shared store that lets several API processes share one queue.
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+from .cancellation import BuildCancelled, BuildContext, DeadlineExceeded, build_context
+from .workspace import new_job_id
+
+JOB_BACKEND = os.getenv("JOB_BACKEND", "memory")  # "memory" or "sqlite"
+JOB_DB = Path(os.getenv("JOB_DB", "storage/jobs.db"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))  # builds running at once
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "16"))  # queued builds before submit is refused
+JOB_KEEP = int(os.getenv("JOB_KEEP", "200"))  # finished jobs kept for polling
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.25"))
+JOB_EVENT_BUFFER = int(os.getenv("JOB_EVENT_BUFFER", "2000"))  # events kept per job for replay
+JOB_HEARTBEAT = float(os.getenv("JOB_HEARTBEAT", "15"))  # seconds between SSE keep-alive comments
+# A /run-stream build with no client attached for this long is cancelled
+JOB_DISCONNECT_GRACE = float(os.getenv("JOB_DISCONNECT_GRACE", "30"))
+
+FINISHED = ("succeeded", "failed", "cancelled")
+
+class JobQueueFull(Exception):
+    """The queue already holds JOB_QUEUE_SIZE builds."""
+
+def event_id(job_id: str, seq: int) -> str:
+    return f"{job_id}:{seq}"
+
+def parse_event_id(value: str):
+    """(job_id or None, next seq) from a Last-Event-ID of "<job_id>:<seq>" or "<seq>"."""
+    job_id, _, seq = (value or "").strip().rpartition(":")
+    try:
+        return job_id or None, int(seq) + 1
+    except ValueError:
+        return None, 0
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+def _new_job(idea: str, improve: bool) -> dict:
+    return {
+        "id": new_job_id(),
+        "status": "queued",
+        "idea": idea,
+        "improve": improve,
+        "created_at": _now(),
+        "started_at": None,
+        "finished_at": None,
+        "error": None,
+        "result": None,
+        "last_event": None,
+        "events": 0,
+        "cancel_requested": False,
+    }
+
+def _cancel(job: dict) -> bool:
+    """Mark a job for cancellation; True if it was still queued (and is now finished)."""
+    if job["status"] == "queued":
+        job.update(status="cancelled", error="Cancelled before it started", finished_at=_now())
+        return True
+    if job["status"] == "running":
+        job["cancel_requested"] = True
+    return False
+
+class MemoryJobBackend:
+    """Jobs, events and the queue in this process's memory."""
+
+    name = "memory"
+    shared = False
+
+    def __init__(self, max_queued: int = JOB_QUEUE_SIZE, keep: int = JOB_KEEP, buffer: int = JOB_EVENT_BUFFER):
+        self.keep = keep
+        self.buffer = buffer
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = {}
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def submit(self, idea: str, improve: bool = False) -> dict:
+        job = _new_job(idea, improve)
+        with self._lock:
+            self._jobs[job["id"]] = job
+            self._events[job["id"]] = deque(maxlen=self.buffer)
+        try:
+            self._queue.put_nowait(job["id"])
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job["id"]], self._events[job["id"]]
+            raise JobQueueFull()
+        self._prune()
+        return dict(job)
+
+    def claim(self, timeout: float):
+        """Next queued job, marked running, or None after timeout."""
+        try:
+            job_id = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] != "queued":
+                return None  # cancelled while queued
+            job.update(status="running", started_at=_now())
+            return dict(job)
+
+    def append_event(self, job_id: str, event: str) -> int:
+        with self._lock:
+            job = self._jobs[job_id]
+            seq = job["events"]
+            self._events[job_id].append((seq, event))
+            job.update(last_event=event, events=seq + 1)
+            return seq
+
+    def finish(self, job_id: str, status: str, result: dict = None, error: str = None):
+        with self._lock:
+            self._jobs[job_id].update(status=status, result=result, error=error, finished_at=_now())
+
+    def cancel(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            _cancel(job)
+            return dict(job)
+
+    def get(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def events(self, job_id: str, offset: int = 0) -> list:
+        """(seq, event) pairs from offset on, as far as the ring buffer still has them."""
+        with self._lock:
+            return [(seq, event) for seq, event in self._events.get(job_id, ()) if seq >= offset]
+
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    def _prune(self):
+        with self._lock:
+            finished = [j for j in self._jobs.values() if j["status"] in FINISHED]
+            for job in finished[:max(0, len(finished) - self.keep)]:
+                del self._jobs[job["id"]], self._events[job["id"]]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL,
+    job TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, seq);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+class SqliteJobBackend:
+    """Jobs, events and the queue in a SQLite file any local API process can claim from."""
+
+    name = "sqlite"
+    shared = True  # other processes may run the jobs, so cancel requests are polled
+
+    def __init__(self, path: Path = JOB_DB, max_queued: int = JOB_QUEUE_SIZE, keep: int = JOB_KEEP,
+                 buffer: int = JOB_EVENT_BUFFER):
+        self.path = Path(path)
+        self.max_queued = max_queued
+        self.keep = keep
+        self.buffer = buffer
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _ensure(self):
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with closing(self._connect()) as conn:
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.executescript(SCHEMA)
+            self._ready = True
+
+    def _save(self, conn, job: dict):
+        conn.execute("UPDATE jobs SET status = ?, job = ? WHERE id = ?",
+                     (job["status"], json.dumps(job, ensure_ascii=False), job["id"]))
+
+    def _load(self, conn, job_id: str):
+        row = conn.execute("SELECT job FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row["job"]) if row else None
+
+    def submit(self, idea: str, improve: bool = False) -> dict:
+        self._ensure()
+        job = _new_job(idea, improve)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0] >= self.max_queued:
+                raise JobQueueFull()
+            conn.execute("INSERT INTO jobs (id, status, job) VALUES (?, ?, ?)",
+                         (job["id"], job["status"], json.dumps(job, ensure_ascii=False)))
+            self._prune(conn)
+        return job
+
+    def claim(self, timeout: float):
+        self._ensure()
+        next_job = "SELECT id FROM jobs WHERE status = 'queued' ORDER BY seq LIMIT 1"
+        with closing(self._connect()) as conn, conn:
+            # Only take the write lock when there is something to claim
+            row = conn.execute(next_job).fetchone()
+            if row is not None:
+                # BEGIN IMMEDIATE so two processes can't claim the same job
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(next_job).fetchone()
+            if row is not None:
+                job = self._load(conn, row["id"])
+                job.update(status="running", started_at=_now())
+                self._save(conn, job)
+                return job
+        time.sleep(timeout)
+        return None
+
+    def append_event(self, job_id: str, event: str) -> int:
+        with closing(self._connect()) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            job = self._load(conn, job_id)
+            seq = job["events"]
+            conn.execute("INSERT INTO job_events (job_id, seq, event) VALUES (?, ?, ?)", (job_id, seq, event))
+            conn.execute("DELETE FROM job_events WHERE job_id = ? AND seq <= ?", (job_id, seq - self.buffer))
+            job.update(last_event=event, events=seq + 1)
+            self._save(conn, job)
+        return seq
+
+    def finish(self, job_id: str, status: str, result: dict = None, error: str = None):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            job = self._load(conn, job_id)
+            job.update(status=status, result=result, error=error, finished_at=_now())
+            self._save(conn, job)
+
+    def cancel(self, job_id: str):
+        self._ensure()
+        with closing(self._connect()) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            job = self._load(conn, job_id)
+            if job is not None:
+                _cancel(job)
+                self._save(conn, job)
+        return job
+
+    def get(self, job_id: str):
+        self._ensure()
+        with closing(self._connect()) as conn:
+            return self._load(conn, job_id)
+
+    def events(self, job_id: str, offset: int = 0) -> list:
+        self._ensure()
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT seq, event FROM job_events WHERE job_id = ? AND seq >= ? ORDER BY seq",
+                                (job_id, offset)).fetchall()
+        return [(row["seq"], row["event"]) for row in rows]
+
+    def queued(self) -> int:
+        self._ensure()
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    def _prune(self, conn):
+        old = [row["id"] for row in conn.execute(
+            "SELECT id FROM jobs WHERE status IN ('succeeded', 'failed', 'cancelled') ORDER BY seq DESC LIMIT -1 OFFSET ?",
+            (self.keep,))]
+        conn.executemany("DELETE FROM job_events WHERE job_id = ?", [(i,) for i in old])
+        conn.executemany("DELETE FROM jobs WHERE id = ?", [(i,) for i in old])
+
+def create_backend(backend: str = JOB_BACKEND):
+    """Build the configured job backend."""
+    if backend == "sqlite":
+        return SqliteJobBackend()
+    return MemoryJobBackend()
+
+def job_view(job: dict) -> dict:
+    """A job as GET /jobs/{id} shows it: the last event becomes a small progress summary."""
+    job = dict(job)
+    last = job.pop("last_event", None)
+    last = json.loads(last) if last else None
+    job["progress"] = {k: last.get(k) for k in ("step", "message", "percent")} if last else None
+    return job
+
+def _run_build(job: dict):
+    from .orchestrator import run_pipeline_streaming
+    return run_pipeline_streaming(job["idea"], improve_mode=job["improve"], job_id=job["id"])
+
+class JobManager:
+    """Worker pool draining a job backend. Workers start on the first submit."""
+
+    def __init__(self, backend=None, workers: int = JOB_WORKERS, runner=_run_build):
+        self.backend = backend or create_backend()
+        self.workers = max(1, workers)
+        self.runner = runner
+        self._threads = []
+        self._watcher = None
+        self._running = {}  # job id -> BuildContext, for jobs running in this process
+        self._attached = {}  # job id -> streaming clients attached here
+        self._lock = threading.Lock()
+        self.counters = {"submitted": 0, "rejected": 0, "succeeded": 0, "failed": 0, "cancelled": 0}
+
+    def start(self):
+        with self._lock:
+            if self._watcher is None and self.backend.shared:
+                self._watcher = threading.Thread(target=self._watch_cancels, name="job-cancel-watcher", daemon=True)
+                self._watcher.start()
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, idea: str, improve: bool = False) -> dict:
+        """Queue a build; raises JobQueueFull when the queue is at capacity."""
+        try:
+            job = self.backend.submit(idea, improve)
+        except JobQueueFull:
+            self._count("rejected")
+            raise
+        self._count("submitted")
+        self.start()
+        return job
+
+    def get(self, job_id: str):
+        return self.backend.get(job_id)
+
+    def cancel(self, job_id: str, reason: str = "Cancelled by client"):
+        """Cancel a queued or running job; returns the job, or None if unknown."""
+        job = self.backend.cancel(job_id)
+        with self._lock:
+            context = self._running.get(job_id)
+        if context is not None:
+            context.cancel(reason)
+        return job
+
+    def attach(self, job_id: str):
+        """A streaming client started following job_id."""
+        with self._lock:
+            self._attached[job_id] = self._attached.get(job_id, 0) + 1
+
+    def detach(self, job_id: str) -> int:
+        """A streaming client went away; returns how many are still attached."""
+        with self._lock:
+            left = self._attached.get(job_id, 1) - 1
+            if left > 0:
+                self._attached[job_id] = left
+            else:
+                self._attached.pop(job_id, None)
+            return max(left, 0)
+
+    def cancel_if_abandoned(self, job_id: str) -> bool:
+        """Cancel job_id if no client has reattached and it hasn't finished."""
+        with self._lock:
+            if self._attached.get(job_id):
+                return False
+        job = self.backend.get(job_id)
+        if job is None or job["status"] in FINISHED:
+            return False
+        self.cancel(job_id, "Client disconnected")
+        return True
+
+    def _watch_cancels(self):
+        """Pick up DELETE /jobs/{id} sent to another process for jobs running here."""
+        while True:
+            time.sleep(JOB_POLL_INTERVAL)
+            with self._lock:
+                running = list(self._running.items())
+            for job_id, context in running:
+                try:
+                    job = self.backend.get(job_id)
+                except Exception as e:
+                    print(f"⚠️ Cancel check failed for job {job_id}: {e}")
+                    continue
+                if job and job.get("cancel_requested"):
+                    context.cancel("Cancelled by client")
+
+    def events(self, job_id: str, offset: int = 0) -> list:
+        return self.backend.events(job_id, offset)
+
+    def _work(self):
+        while True:
+            job = self.backend.claim(JOB_POLL_INTERVAL)
+            if job is not None:
+                self.run(job)
+
+    def run(self, job: dict):
+        """Run one claimed job to completion, recording its events and outcome."""
+        last = None
+        context = BuildContext(job["id"])
+        with self._lock:
+            self._running[job["id"]] = context
+        # A cancel between claim() and registering the context only set the flag; honour it now
+        current = self.backend.get(job["id"])
+        if current is not None and current.get("cancel_requested"):
+            context.cancel("Cancelled by client")
+        try:
+            with build_context(context):
+                for update in self.runner(job):
+                    self.backend.append_event(job["id"], update)
+                    last = update
+            result = json.loads(last)["data"] if last else None
+            self.backend.finish(job["id"], "succeeded", result=result)
+            self._count("succeeded")
+        except BuildCancelled as e:
+            # Out of time is a failure; an explicit cancel is not
+            status, step = ("failed", "error") if isinstance(e, DeadlineExceeded) else ("cancelled", "cancelled")
+            print(f"⚠️ Job {job['id']} stopped: {e}")
+            self.backend.append_event(job["id"], json.dumps({
+                "step": step, "message": str(e), "percent": 100, "data": {"job_id": job["id"]}}))
+            self.backend.finish(job["id"], status, error=str(e))
+            self._count(status)
+        except Exception as e:
+            print(f"⚠️ Job {job['id']} failed: {e}")
+            # Streaming clients only see events, so the failure is one too
+            self.backend.append_event(job["id"], json.dumps({
+                "step": "error", "message": f"Build failed: {e}", "percent": 100, "data": {"job_id": job["id"]}}))
+            self.backend.finish(job["id"], "failed", error=str(e))
+            self._count("failed")
+        finally:
+            with self._lock:
+                self._running.pop(job["id"], None)
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counters[key] += 1
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend.name,
+            "workers": self.workers,
+            "queued": self.backend.queued(),
+            "running": len(self._running),
+            **self.counters,
+        }
+
+job_manager = JobManager()
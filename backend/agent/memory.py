@@ -1,58 +1,111 @@
-import json
-from pathlib import Path
+"""
+Project Memory - Stores every finished build and looks up past projects.
+Storage is pluggable (see memory_store.py): an append-only JSONL log by
+default, or SQLite with indexed metadata when MEMORY_BACKEND=sqlite.
+"""
+import os
+import sys
 
-MEMORY_FILE = Path("storage/memory.json")
+from .blobs import blob_store
+from .memory_store import create_store, search_text
+from .search import InvertedIndex
+
+# Seconds between background compactions in the API (0 disables)
+MEMORY_COMPACT_INTERVAL = float(os.getenv("MEMORY_COMPACT_INTERVAL", "21600"))
+
+_store = None
+_index = None
+
+def get_store():
+    """The configured memory store (created on first use)."""
+    global _store
+    if _store is None:
+        _store = create_store()
+    return _store
+
+def get_index():
+    """The idea search index, rebuilt from the store if it is missing or behind."""
+    global _index
+    if _index is None:
+        index = InvertedIndex()
+        if index.count() != get_store().count():
+            index.rebuild(get_store().documents())
+        _index = index
+    return _index
+
+def reset_store():
+    """Drop the cached store and index, e.g. after their files were deleted."""
+    global _store, _index
+    _store = None
+    _index = None
+
+def build_final_code(all_code: dict) -> str:
+    """All files concatenated with a header per file."""
+    return "\n\n".join([f"// === {k} ===\n{v}" for k, v in all_code.items()])
+
+def load_project_code(project: dict) -> dict:
+    """
+    path -> content for a stored project, read from the blob store.
+    Records saved before the blob store still carry all_code inline.
+    """
+    if "code_refs" not in project:
+        return dict(project.get("all_code") or {})
+    return {path: blob_store.get(digest) or "" for path, digest in project["code_refs"].items()}
+
+def _with_code(project: dict) -> dict:
+    all_code = load_project_code(project)
+    return {**project, "all_code": all_code, "final_code": build_final_code(all_code)}
 
 def save_memory(data):
     """
-    Saves data to memory.json.
+    Saves one build record. Returns its id.
+    File contents go to the blob store; the record keeps path -> hash.
     """
-    MEMORY_FILE.parent.mkdir(exist_ok=True)
-    
-    current_memory = []
-    if MEMORY_FILE.exists():
-        try:
-             current_memory = json.loads(MEMORY_FILE.read_text())
-        except:
-             pass
-    
-    current_memory.append(data)
-    MEMORY_FILE.write_text(json.dumps(current_memory, indent=2))
+    record = {k: v for k, v in data.items() if k not in ("all_code", "final_code")}
+    record["code_refs"] = {path: blob_store.put(code or "") for path, code in (data.get("all_code") or {}).items()}
+    project_id = get_store().append(record)
+    try:
+        get_index().add(project_id, search_text(data))
+    except Exception as e:
+        # The index is derived data; it gets rebuilt on the next start
+        print(f"⚠️ Could not index project {project_id}: {e}")
+    return project_id
+
+def read_memory(include_code: bool = False):
+    """
+    Reads all memory. Code is only loaded from the blob store when asked for.
+    """
+    records = get_store().iter_records()
+    return [_with_code(r) for r in records] if include_code else list(records)
+
+def get_project(project_id: int):
+    """
+    Full stored record for one project with all_code/final_code rebuilt, or None.
+    """
+    project = get_store().get(project_id)
+    return _with_code(project) if project else None
 
-def read_memory():
+def compact_memory() -> dict:
     """
-    Reads all memory.
+    Applies the retention policy (see memory_store), garbage-collects blobs
+    no record points at and rebuilds the search index if records went away.
     """
-    if MEMORY_FILE.exists():
-        try:
-            return json.loads(MEMORY_FILE.read_text())
-        except:
-            return []
-    return []
+    store = get_store()
+    stats = store.compact()
+    referenced = {digest for record in store.iter_records() for digest in (record.get("code_refs") or {}).values()}
+    stats["blobs"] = blob_store.gc(referenced)
+    if stats["deduplicated"] or stats["dropped"]:
+        get_index().rebuild(store.documents())
+    return stats
 
 def get_similar_projects(idea: str, limit: int = 3):
     """
     Find past projects similar to the current idea.
-    Uses simple keyword matching for now.
+    Uses the inverted index; only the top matches are loaded in full.
     """
-    memory = read_memory()
-    if not memory:
-        return []
-    
-    # Simple relevance scoring based on word overlap
-    idea_words = set(idea.lower().split())
-    scored = []
-    
-    for project in memory:
-        past_idea = project.get("idea", "")
-        past_words = set(past_idea.lower().split())
-        overlap = len(idea_words & past_words)
-        if overlap > 0:
-            scored.append((overlap, project))
-    
-    # Sort by overlap score descending
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [p for _, p in scored[:limit]]
+    store = get_store()
+    matches = get_index().search(idea, limit)
+    return [p for p in (store.get(pid) for pid, _ in matches) if p]
 
 def get_learning_context(idea: str):
     """
@@ -70,48 +123,39 @@ def get_learning_context(idea: str):
     
     return context
 
-def get_memory_history():
+HISTORY_FIELDS = ("id", "idea", "xp_gained", "languages", "file_count", "files", "quality_score", "timestamp")
+
+def query_memory(limit: int = 20, cursor: int = None, language: str = None, since: str = None,
+                 until: str = None, min_score: int = None, fields: list = None):
+    """
+    One page of Memory View rows, newest first, from the store's index.
+    cursor is the next_cursor of the previous page; fields picks which
+    columns to return. Returns (rows, next_cursor).
+    """
+    unknown = set(fields or []) - set(HISTORY_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    rows, next_cursor = get_store().history(limit=limit, cursor=cursor, language=language,
+                                            since=since, until=until, min_score=min_score)
+    if fields:
+        rows = [{k: row[k] for k in fields} for row in rows]
+    return rows, next_cursor
+
+def get_memory_history(limit: int = 20):
     """
     Get formatted project history for Memory View.
-    Returns list of projects with key metrics.
+    Returns the most recent projects with key metrics.
     """
-    from datetime import datetime
-    memory = read_memory()
-    
-    history = []
-    for i, project in enumerate(memory):
-        # Extract info
-        idea = project.get("idea", "Unknown project")
-        xp = project.get("xp_gained", 0)
-        files = project.get("code_files", [])
-        
-        # Get languages from plan
-        plan = project.get("plan", {})
-        tech = plan.get("tech_stack", [])
-        if not tech:
-            # Infer from files
-            for f in files:
-                if f.endswith(".py"):
-                    tech.append("Python")
-                elif f.endswith(".html"):
-                    tech.append("HTML")
-                elif f.endswith(".css"):
-                    tech.append("CSS")
-                elif f.endswith(".js"):
-                    tech.append("JavaScript")
-            tech = list(set(tech))
-        
-        history.append({
-            "id": i + 1,
-            "idea": idea[:60] + ("..." if len(idea) > 60 else ""),
-            "xp_gained": xp,
-            "languages": tech[:3],  # Max 3 languages
-            "file_count": len(files),
-            "files": files[:5],  # Max 5 files shown
-            "quality_score": project.get("review", {}).get("score", 8),
-            "timestamp": project.get("timestamp", datetime.now().isoformat()[:10])
-        })
-    
-    # Most recent first
-    history.reverse()
-    return history[:20]  # Last 20 projects
+    return query_memory(limit=limit)[0]
+
+if __name__ == "__main__":
+    # python -m agent.memory compact|migrate  (run from backend/)
+    command = sys.argv[1] if len(sys.argv) > 1 else "compact"
+    store = get_store()
+    if command == "migrate":
+        print(f"Migrated {store.migrate_legacy()} records to {store.path}")
+    elif command == "compact":
+        print(compact_memory())
+    else:
+        print("Usage: python -m agent.memory [compact|migrate]")
+        sys.exit(1)
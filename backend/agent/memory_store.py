@@ -0,0 +1,564 @@
+"""
+Memory Store - Pluggable storage backends for project memory.
+MEMORY_BACKEND=jsonl (default) keeps the append-only log; MEMORY_BACKEND=sqlite
+keeps metadata in indexed tables and code in a separate table read on demand.
+Both support compaction with a retention policy: full code is kept for the
+last MEMORY_KEEP_FULL builds or MEMORY_KEEP_DAYS days, older records are cut
+down to metadata and identical records are deduplicated.
+"""
+import copy
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from bisect import bisect_left
+from contextlib import closing
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from .storage import atomic_write_bytes, atomic_write_text, file_lock, iter_jsonl, last_line, repair_tail
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "jsonl").lower()
+MEMORY_FILE = Path("storage/memory.jsonl")
+MEMORY_DB = Path("storage/memory.db")
+LEGACY_MEMORY_FILE = Path("storage/memory.json")  # pre-JSONL format (one JSON array)
+
+MEMORY_KEEP_FULL = int(os.getenv("MEMORY_KEEP_FULL", "200"))  # newest builds that keep their code
+MEMORY_KEEP_DAYS = int(os.getenv("MEMORY_KEEP_DAYS", "30"))   # ...plus anything newer than this
+# Compression for cold JSONL segments: gzip, zstd (needs zstandard) or none (keep everything in one log)
+MEMORY_COLD_COMPRESSION = os.getenv("MEMORY_COLD_COMPRESSION", "gzip").lower()
+
+CODE_FIELDS = ("all_code", "final_code", "code_refs")
+SEGMENT_SUFFIXES = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst", "none": ".jsonl"}
+
+def _languages(project: dict) -> list:
+    tech = list(project.get("plan", {}).get("tech_stack", []) or [])
+    if not tech:
+        # Infer from files
+        for f in project.get("code_files", []):
+            if f.endswith(".py"):
+                tech.append("Python")
+            elif f.endswith(".html"):
+                tech.append("HTML")
+            elif f.endswith(".css"):
+                tech.append("CSS")
+            elif f.endswith(".js"):
+                tech.append("JavaScript")
+        tech = sorted(set(tech))
+    return tech
+
+def summarize_project(project: dict) -> dict:
+    """Memory View row for one stored project."""
+    idea = project.get("idea", "Unknown project")
+    files = project.get("code_files", [])
+    return {
+        "id": project.get("id"),
+        "idea": idea[:60] + ("..." if len(idea) > 60 else ""),
+        "xp_gained": project.get("xp_gained", 0),
+        "languages": _languages(project)[:3],  # Max 3 languages
+        "file_count": len(files),
+        "files": files[:5],  # Max 5 files shown
+        "quality_score": project.get("review", {}).get("score", 8),
+        "timestamp": project.get("timestamp", datetime.now().isoformat()[:10]),
+    }
+
+def search_text(project: dict) -> str:
+    """Text the similarity index sees: the idea plus the plan's description."""
+    plan = project.get("plan") or {}
+    description = plan.get("description", "") if isinstance(plan, dict) else ""
+    return f"{project.get('idea', '')} {description}".strip()
+
+def _date_bounds(since: str = None, until: str = None):
+    """Inclusive YYYY-MM-DD filters as (lower bound, exclusive upper bound) on ISO timestamps."""
+    upper = (date.fromisoformat(until[:10]) + timedelta(days=1)).isoformat() if until else None
+    return (since[:10] if since else None), upper
+
+# What a build produced; ids, timestamps and the running XP/intelligence totals differ on every build
+CONTENT_FIELDS = ("idea", "plan", "code_files", *CODE_FIELDS)
+
+def _fingerprint(record: dict) -> str:
+    """Hash of a record's content, ignoring what differs between otherwise identical builds."""
+    content = {k: record[k] for k in CONTENT_FIELDS if k in record}
+    return hashlib.sha256(json.dumps(content, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def apply_retention(records: list, keep_full: int = MEMORY_KEEP_FULL, keep_days: int = MEMORY_KEEP_DAYS):
+    """
+    Retention policy over records in id order: drop identical duplicates
+    (keeping the newest) and strip code from records outside the window.
+    Returns (records, stats).
+    """
+    cutoff = (datetime.now() - timedelta(days=keep_days)).isoformat()
+    seen, kept = set(), []
+    stats = {"deduplicated": 0, "code_pruned": 0}
+    for record in reversed(records):
+        # Pruned records no longer carry their code, so they can't be told apart safely
+        fingerprint = None if record.get("code_pruned") else _fingerprint(record)
+        if fingerprint is not None and fingerprint in seen:
+            stats["deduplicated"] += 1
+            continue
+        seen.add(fingerprint)
+        recent = len(kept) < keep_full or record.get("timestamp", "") >= cutoff
+        if not recent and any(k in record for k in CODE_FIELDS):
+            record = {**{k: v for k, v in record.items() if k not in CODE_FIELDS}, "code_pruned": True}
+            stats["code_pruned"] += 1
+        kept.append(record)
+    kept.reverse()
+    return kept, stats
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor().compress(data)
+    if codec == "gzip":
+        return gzip.compress(data)
+    return data
+
+def _decompress(path: Path) -> bytes:
+    data = path.read_bytes()
+    if path.name.endswith(".zst"):
+        return zstandard.ZstdDecompressor().decompress(data)
+    if path.name.endswith(".gz"):
+        return gzip.decompress(data)
+    return data
+
+def _new_record(data: dict, project_id: int) -> dict:
+    return {
+        "id": project_id,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        **{k: v for k, v in data.items() if k != "id"},
+    }
+
+def _read_legacy(path: Path) -> list:
+    try:
+        legacy = json.loads(path.read_text())
+    except:
+        return []
+    if not isinstance(legacy, list):
+        return []
+    return [{"id": i + 1, **{k: v for k, v in p.items() if k != "id"}}
+            for i, p in enumerate(legacy) if isinstance(p, dict)]
+
+class JsonlMemoryStore:
+    """
+    Append-only JSONL log. A per-process summary index follows the file tail.
+    Compaction moves old, metadata-only records into immutable compressed
+    segments under memory_cold/, read once per process.
+    """
+
+    name = "jsonl"
+
+    def __init__(self, path: Path = MEMORY_FILE, legacy_path: Path = LEGACY_MEMORY_FILE, cold_dir: Path = None):
+        self.path = Path(path)
+        self.legacy_path = Path(legacy_path)
+        self.cold_dir = Path(cold_dir) if cold_dir else self.path.parent / "memory_cold"
+        self._lock = threading.Lock()
+        self._index = {}      # id -> byte offset of its line (hot log)
+        self._cold = {}       # id -> segment file (cold records)
+        self._segment_cache = (None, {})
+        self._summaries = []  # summaries in log order
+        self._ids = []        # ids in log order (ascending), for cursor lookups
+        self._languages = []  # lowercased language set per summary, for filtering
+        self._read_to = 0
+        self._inode = None
+
+    def migrate_legacy(self) -> int:
+        """Convert the legacy JSON array into the log. Returns records migrated."""
+        if not self.legacy_path.exists() or self.path.exists():
+            return 0
+        with file_lock(self.path):
+            # Another process may have migrated while we waited
+            if not self.legacy_path.exists() or self.path.exists():
+                return 0
+            records = _read_legacy(self.legacy_path)
+            self._write_all(records)
+            # Keep the original around instead of deleting it
+            self.legacy_path.replace(self.legacy_path.with_suffix(".json.migrated"))
+        return len(records)
+
+    def _write_all(self, records):
+        """Swap in a complete log atomically. Caller holds the file lock."""
+        atomic_write_text(self.path, "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+
+    def append(self, data: dict) -> int:
+        """Append one record, fsync it and return its id."""
+        self.migrate_legacy()
+        # The lock covers reading the last id too, so concurrent workers never reuse one
+        with file_lock(self.path), open(self.path, "a+b") as f:
+            repair_tail(f)
+            last_id = 0
+            try:
+                last_id = json.loads(last_line(f)).get("id", 0)
+            except:
+                pass
+            record = _new_record(data, last_id + 1)
+            f.seek(0, os.SEEK_END)
+            f.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        return record["id"]
+
+    def _refresh(self):
+        """Bring the summary index up to date with whatever was appended since last time."""
+        self.migrate_legacy()
+        try:
+            stat = self.path.stat()
+        except OSError:
+            stat = None
+        if stat is None or stat.st_ino != self._inode or stat.st_size < self._read_to:
+            # New, replaced (compaction) or truncated file: start over
+            self._index, self._summaries, self._ids, self._languages = {}, [], [], []
+            self._cold, self._segment_cache = {}, (None, {})
+            self._read_to = 0
+            self._inode = stat.st_ino if stat else None
+            for segment in self._segments():
+                for record in self._read_segment(segment).values():
+                    self._cold[record.get("id")] = segment
+                    self._add_summary(record)
+        if stat is None or stat.st_size == self._read_to:
+            return
+        for offset, end, record in iter_jsonl(self.path, self._read_to):
+            self._read_to = end
+            # Skip lines already moved to a segment by a compaction that crashed before rewriting the log
+            if record is None or record.get("id") in self._cold:
+                continue
+            self._index[record.get("id")] = offset
+            self._add_summary(record)
+
+    def _add_summary(self, record: dict):
+        self._summaries.append(summarize_project(record))
+        self._ids.append(record.get("id"))
+        self._languages.append({lang.lower() for lang in _languages(record)})
+
+    def _segments(self) -> list:
+        """Cold segment files, oldest first (names start with zero-padded first id)."""
+        if not self.cold_dir.exists():
+            return []
+        return sorted(p for p in self.cold_dir.iterdir() if p.name.endswith(tuple(SEGMENT_SUFFIXES.values())))
+
+    def _read_segment(self, segment: Path) -> dict:
+        """id -> record for one cold segment; the last one read is cached."""
+        cached_path, cached = self._segment_cache
+        if cached_path == segment:
+            return cached
+        records = {}
+        for line in _decompress(segment).splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict):
+                records[record.get("id")] = record
+        self._segment_cache = (segment, records)
+        return records
+
+    def iter_records(self):
+        self.migrate_legacy()
+        cold = set()
+        for segment in self._segments():
+            for record in self._read_segment(segment).values():
+                cold.add(record.get("id"))
+                yield record
+        if not self.path.exists():
+            return
+        for _, _, record in iter_jsonl(self.path):
+            if record is not None and record.get("id") not in cold:
+                yield record
+
+    def get(self, project_id: int):
+        with self._lock:
+            self._refresh()
+            offset = self._index.get(project_id)
+            if project_id in self._cold:
+                record = self._read_segment(self._cold[project_id]).get(project_id)
+                return copy.deepcopy(record) if record else None
+        if offset is None:
+            return None
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            try:
+                record = json.loads(f.readline())
+            except ValueError:
+                return None
+        # The log may have been compacted since the offset was taken
+        return record if isinstance(record, dict) and record.get("id") == project_id else None
+
+    def documents(self):
+        """(id, search text) for every project, used to (re)build the search index."""
+        for record in self.iter_records():
+            yield record.get("id"), search_text(record)
+
+    def history(self, limit: int = 20, cursor: int = None, language: str = None,
+                since: str = None, until: str = None, min_score: int = None):
+        """One page of summaries newest first, older than cursor. Returns (rows, next_cursor)."""
+        lower, upper = _date_bounds(since, until)
+        language = language.lower() if language else None
+        rows = []
+        with self._lock:
+            self._refresh()
+            pos = bisect_left(self._ids, cursor) if cursor is not None else len(self._ids)
+            # Walk backwards from the cursor; filters are checked against the in-memory index
+            for i in range(pos - 1, -1, -1):
+                summary = self._summaries[i]
+                if language and language not in self._languages[i]:
+                    continue
+                if lower and summary["timestamp"] < lower or upper and summary["timestamp"] >= upper:
+                    continue
+                if min_score is not None and (summary["quality_score"] or 0) < min_score:
+                    continue
+                rows.append(dict(summary))
+                if len(rows) > limit:
+                    break
+        more = len(rows) > limit
+        rows = rows[:limit]
+        return rows, (rows[-1]["id"] if more else None)
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._summaries)
+
+    def compact(self, keep_full: int = MEMORY_KEEP_FULL, keep_days: int = MEMORY_KEEP_DAYS,
+                compression: str = MEMORY_COLD_COMPRESSION) -> dict:
+        """
+        Apply the retention policy to the hot log, move the old metadata-only
+        prefix into a new cold segment and drop torn/corrupt lines.
+        """
+        self.migrate_legacy()
+        if not self.path.exists():
+            return {"kept": 0, "dropped": 0, "deduplicated": 0, "code_pruned": 0, "moved_to_cold": 0}
+        if compression == "zstd" and zstandard is None:
+            compression = "gzip"
+        with file_lock(self.path):
+            with open(self.path, "rb") as f:
+                total = sum(1 for line in f if line.strip())
+            cold = {record.get("id") for segment in self._segments() for record in self._read_segment(segment).values()}
+            hot = [r for _, _, r in iter_jsonl(self.path) if r is not None and r.get("id") not in cold]
+            dropped = total - len(hot)
+            hot, stats = apply_retention(hot, keep_full, keep_days)
+
+            # The newest record always stays hot: append() takes the next id from the log's last line
+            moved = 0
+            if compression in ("gzip", "zstd"):
+                while moved < len(hot) - 1 and not any(k in hot[moved] for k in CODE_FIELDS):
+                    moved += 1
+            if moved:
+                first, last = hot[0]["id"], hot[moved - 1]["id"]
+                data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in hot[:moved]).encode("utf-8")
+                atomic_write_bytes(self.cold_dir / f"{first:010d}-{last:010d}{SEGMENT_SUFFIXES[compression]}",
+                                   _compress(data, compression))
+            self._write_all(hot[moved:])
+        return {"kept": len(hot), "dropped": dropped, **stats, "moved_to_cold": moved}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY,
+    idea TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    xp_gained INTEGER NOT NULL DEFAULT 0,
+    quality_score INTEGER,
+    file_count INTEGER NOT NULL DEFAULT 0,
+    files TEXT NOT NULL DEFAULT '[]',
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_projects_timestamp ON projects(timestamp);
+CREATE INDEX IF NOT EXISTS idx_projects_score ON projects(quality_score);
+CREATE INDEX IF NOT EXISTS idx_projects_xp ON projects(xp_gained);
+CREATE TABLE IF NOT EXISTS project_languages (
+    project_id INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    language TEXT NOT NULL COLLATE NOCASE,
+    PRIMARY KEY (language, project_id)
+);
+CREATE TABLE IF NOT EXISTS project_code (
+    project_id INTEGER PRIMARY KEY REFERENCES projects(id) ON DELETE CASCADE,
+    code TEXT NOT NULL
+);
+"""
+
+class SqliteMemoryStore:
+    """SQLite store: indexed metadata tables, code kept apart and loaded only by get()."""
+
+    name = "sqlite"
+
+    def __init__(self, path: Path = MEMORY_DB, import_from: JsonlMemoryStore = None):
+        self.path = Path(path)
+        self._import_from = import_from
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def _ensure(self):
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            self.path.parent.mkdir(exist_ok=True)
+            with closing(self._connect()) as conn:
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.executescript(SCHEMA)
+                empty = conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0] == 0
+            self._ready = True
+        if empty and self._import_from is not None:
+            # First start on SQLite: carry over the existing JSONL history
+            self.import_records(self._import_from.iter_records())
+
+    def _insert(self, conn, record: dict):
+        meta = {k: v for k, v in record.items() if k not in CODE_FIELDS}
+        summary = summarize_project(record)
+        conn.execute(
+            "INSERT OR REPLACE INTO projects (id, idea, timestamp, xp_gained, quality_score, file_count, files, record)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (record["id"], record.get("idea", ""), summary["timestamp"], summary["xp_gained"],
+             summary["quality_score"], summary["file_count"], json.dumps(record.get("code_files", [])),
+             json.dumps(meta, ensure_ascii=False)),
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO project_languages (project_id, language) VALUES (?, ?)",
+            [(record["id"], lang) for lang in _languages(record)],
+        )
+        code = {k: record[k] for k in CODE_FIELDS if k in record}
+        conn.execute("INSERT OR REPLACE INTO project_code (project_id, code) VALUES (?, ?)",
+                     (record["id"], json.dumps(code, ensure_ascii=False)))
+
+    def migrate_legacy(self) -> int:
+        """Import the JSONL history (and anything it migrated). Safe to repeat."""
+        if self._import_from is None:
+            return 0
+        self._import_from.migrate_legacy()
+        return self.import_records(self._import_from.iter_records())
+
+    def import_records(self, records) -> int:
+        self._ensure()
+        count = 0
+        with closing(self._connect()) as conn, conn:
+            for record in records:
+                if "id" in record:
+                    self._insert(conn, record)
+                    count += 1
+        return count
+
+    def append(self, data: dict) -> int:
+        self._ensure()
+        with closing(self._connect()) as conn, conn:
+            # BEGIN IMMEDIATE so concurrent writers can't pick the same id
+            conn.execute("BEGIN IMMEDIATE")
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM projects").fetchone()[0]
+            record = _new_record(data, last_id + 1)
+            self._insert(conn, record)
+        return record["id"]
+
+    def _full(self, conn, row) -> dict:
+        record = json.loads(row["record"])
+        code = conn.execute("SELECT code FROM project_code WHERE project_id = ?", (row["id"],)).fetchone()
+        if code:
+            record.update(json.loads(code["code"]))
+        return record
+
+    def iter_records(self):
+        self._ensure()
+        with closing(self._connect()) as conn:
+            for row in conn.execute("SELECT id, record FROM projects ORDER BY id").fetchall():
+                yield self._full(conn, row)
+
+    def get(self, project_id: int):
+        self._ensure()
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT id, record FROM projects WHERE id = ?", (project_id,)).fetchone()
+            return self._full(conn, row) if row else None
+
+    def documents(self):
+        self._ensure()
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT id, record FROM projects ORDER BY id").fetchall()
+        for row in rows:
+            yield row["id"], search_text(json.loads(row["record"]))
+
+    def history(self, limit: int = 20, cursor: int = None, language: str = None,
+                since: str = None, until: str = None, min_score: int = None):
+        """One page of summaries newest first, older than cursor. Returns (rows, next_cursor)."""
+        lower, upper = _date_bounds(since, until)
+        where, params = [], []
+        if cursor is not None:
+            where.append("id < ?")
+            params.append(cursor)
+        if language:
+            where.append("id IN (SELECT project_id FROM project_languages WHERE language = ?)")
+            params.append(language)
+        if lower:
+            where.append("timestamp >= ?")
+            params.append(lower)
+        if upper:
+            where.append("timestamp < ?")
+            params.append(upper)
+        if min_score is not None:
+            where.append("quality_score >= ?")
+            params.append(min_score)
+        sql = ("SELECT id, idea, timestamp, xp_gained, quality_score, file_count, files FROM projects"
+               + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY id DESC LIMIT ?")
+        self._ensure()
+        with closing(self._connect()) as conn:
+            rows = conn.execute(sql, (*params, limit + 1)).fetchall()
+            more = len(rows) > limit
+            rows = rows[:limit]
+            ids = [row["id"] for row in rows]
+            languages = {}
+            if ids:
+                marks = ",".join("?" * len(ids))
+                for lang in conn.execute(
+                        f"SELECT project_id, language FROM project_languages WHERE project_id IN ({marks})"
+                        " ORDER BY language", ids):
+                    languages.setdefault(lang["project_id"], []).append(lang["language"])
+        return [{
+            "id": row["id"],
+            "idea": row["idea"][:60] + ("..." if len(row["idea"]) > 60 else ""),
+            "xp_gained": row["xp_gained"],
+            "languages": languages.get(row["id"], [])[:3],
+            "file_count": row["file_count"],
+            "files": json.loads(row["files"])[:5],
+            "quality_score": row["quality_score"],
+            "timestamp": row["timestamp"],
+        } for row in rows], (rows[-1]["id"] if more else None)
+
+    def count(self) -> int:
+        self._ensure()
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0]
+
+    def compact(self, keep_full: int = MEMORY_KEEP_FULL, keep_days: int = MEMORY_KEEP_DAYS, compression: str = None) -> dict:
+        """Apply the retention policy in place, then VACUUM. (Cold-segment compression is JSONL-only.)"""
+        self._ensure()
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                rows = conn.execute(
+                    "SELECT p.id, p.record, c.code FROM projects p LEFT JOIN project_code c ON c.project_id = p.id"
+                    " ORDER BY p.id").fetchall()
+                records = [{**json.loads(row["record"]), **json.loads(row["code"] or "{}")} for row in rows]
+                kept, stats = apply_retention(records, keep_full, keep_days)
+                kept_ids = {r["id"] for r in kept}
+                conn.executemany("DELETE FROM projects WHERE id = ?",
+                                 [(r["id"],) for r in records if r["id"] not in kept_ids])
+                had_code = {r["id"] for r in records if any(k in r for k in CODE_FIELDS)}
+                pruned = [r for r in kept if r.get("code_pruned") and r["id"] in had_code]
+                conn.executemany("DELETE FROM project_code WHERE project_id = ?", [(r["id"],) for r in pruned])
+                conn.executemany("UPDATE projects SET record = ? WHERE id = ?",
+                                 [(json.dumps(r, ensure_ascii=False), r["id"]) for r in pruned])
+            conn.execute("VACUUM")
+        return {"kept": len(kept), "dropped": 0, **stats, "moved_to_cold": 0}
+
+def create_store(backend: str = MEMORY_BACKEND):
+    """Build the configured memory store."""
+    if backend == "sqlite":
+        return SqliteMemoryStore(import_from=JsonlMemoryStore())
+    return JsonlMemoryStore()
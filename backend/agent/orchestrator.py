@@ -3,14 +3,22 @@ Advanced Orchestrator with All Features.
 Generates: Code, Tests, CI/CD, Deploy configs
 """
 from .planner import generate_plan
-from .coder import generate_file
+from .coder import generate_file, summarize_code
 from .reviewer import review_code
-from .memory import save_memory, get_learning_context
+from .memory import save_memory, get_learning_context, build_final_code
 from .intelligence import add_project_xp, get_intelligence
-from .capabilities import generate_cicd_pipeline, generate_unit_tests, generate_dockerfile
+from .capabilities import generate_cicd_pipeline, generate_unit_tests, generate_dockerfile, get_test_filename, CICD_PATH
+from .scheduler import run_dag
+from .workspace import new_job_id, open_workspace, close_workspace
+from .cancellation import BuildContext, build_context, check_cancelled, current_build
 import os
 import json
-import shutil
+import queue
+
+# Max concurrent generate_file calls per build
+CODEGEN_WORKERS = int(os.getenv("CODEGEN_WORKERS", "4"))
+# How often streamed code is flushed to the client as code_delta events
+STREAM_FLUSH_INTERVAL = float(os.getenv("STREAM_FLUSH_INTERVAL", "0.1"))
 
 # Improvement prompts for "Build Again But Better"
 IMPROVEMENT_INSTRUCTIONS = """
@@ -22,9 +30,33 @@ IMPROVEMENT MODE - Generate ENHANCED code with:
 5. PRODUCTION READY: Add logging, type hints, docstrings
 """
 
-def run_pipeline_streaming(idea: str, auto_deploy: bool = False, improve_mode: bool = False):
-    """Generator that yields progress updates."""
+def run_pipeline_streaming(idea: str, auto_deploy: bool = False, improve_mode: bool = False,
+                           job_id: str = None, output_dir: str = None):
+    """
+    Generator that yields progress updates.
+    Files go to the job's own workspace (output/<job_id>/) unless output_dir is given.
+    Runs under the caller's BuildContext (or a fresh one with the default deadline)
+    and raises BuildCancelled, skipping the remaining phases, once that is cancelled.
+    """
+    job_id = job_id or new_job_id()
+    with build_context(current_build() or BuildContext(job_id)):
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+            yield from _build(idea, improve_mode, job_id, output_dir)
+            return
+        output_dir = str(open_workspace(job_id))
+        completed = False
+        try:
+            yield from _build(idea, improve_mode, job_id, output_dir)
+            completed = True
+        finally:
+            close_workspace(job_id, completed)
+
+def _build(idea: str, improve_mode: bool, job_id: str, output_dir: str):
+    """The build phases, writing into output_dir."""
     def progress(step: str, message: str, percent: int, data: dict = None):
+        # Every update is a checkpoint: a cancelled build stops before its next phase
+        check_cancelled()
         return json.dumps({
             "step": step,
             "message": message,
@@ -34,13 +66,7 @@ def run_pipeline_streaming(idea: str, auto_deploy: bool = False, improve_mode: b
     
     mode_label = "IMPROVED" if improve_mode else "standard"
     intel_start = get_intelligence()
-    yield progress("start", f"Starting {mode_label} build... (Level {intel_start['level']}%)", 3, {"intelligence": intel_start})
-    
-    # Clear output folder
-    output_dir = "output"
-    if os.path.exists(output_dir):
-        shutil.rmtree(output_dir)
-    os.makedirs(output_dir, exist_ok=True)
+    yield progress("start", f"Starting {mode_label} build... (Level {intel_start['level']}%)", 3, {"intelligence": intel_start, "job_id": job_id})
     
     # Phase 1: Learning
     yield progress("learning", "Checking context...", 5)
@@ -57,20 +83,19 @@ def run_pipeline_streaming(idea: str, auto_deploy: bool = False, improve_mode: b
     tech_stack = plan.get("tech_stack", ["Python"])
     yield progress("planning", f"{len(files_to_generate)} files planned", 15, {"plan": plan})
     
-    # Phase 3: Generate source files
+    # Phase 3: Generate source files (dependency order, independent files concurrently)
     generated_files = {}
     languages_used = set()
     total_files = len(files_to_generate)
     
+    jobs = {}
+    file_deps = {}
     for i, file_info in enumerate(files_to_generate):
         file_path = file_info.get("path", f"file_{i}.py")
         file_desc = file_info.get("description", "")
         file_lang = file_info.get("language", "Python")
         languages_used.add(file_lang)
         
-        file_percent = 20 + int((i / total_files) * 30)
-        yield progress("coding", f"Writing {file_path}..." + (" (enhanced)" if improve_mode else ""), file_percent)
-        
         other_files = [f["path"] for f in files_to_generate if f["path"] != file_path]
         full_prompt = f"PROJECT: {idea}\nFILE: {file_path}\nPURPOSE: {file_desc}\nLANGUAGE: {file_lang}\nOTHER FILES: {other_files}"
         
@@ -78,52 +103,107 @@ def run_pipeline_streaming(idea: str, auto_deploy: bool = False, improve_mode: b
         if improve_mode:
             full_prompt = IMPROVEMENT_INSTRUCTIONS + "\n\n" + full_prompt
         
-        code = generate_file(full_prompt, file_path)
-        generated_files[file_path] = code
+        jobs[file_path] = full_prompt
+        file_deps[file_path] = file_info.get("depends_on", [])
+    
+    # Workers push streamed code here; the generator thread turns it into code_delta events
+    deltas = queue.Queue()
+    
+    def write_source(file_path, dep_code):
+        prompt = jobs[file_path]
+        if dep_code:
+            context = "\n".join(f"--- {dep} ---\n{summarize_code(code, dep)}" for dep, code in dep_code.items())
+            prompt += f"\nDEPENDENCIES (already generated, stay consistent with them):\n{context}"
+        return generate_file(prompt, file_path, on_delta=lambda text: deltas.put((file_path, text)))
+    
+    def flush_deltas(percent):
+        pending, reset = {}, set()
+        while True:
+            try:
+                file_path, text = deltas.get_nowait()
+            except queue.Empty:
+                break
+            if text is None:
+                # The stream restarted (retry/failover): the client drops what it has for this file
+                pending[file_path] = ""
+                reset.add(file_path)
+                continue
+            pending[file_path] = pending.get(file_path, "") + text
+        for file_path, text in pending.items():
+            data = {"file": file_path, "delta": text}
+            if file_path in reset:
+                data["reset"] = True
+            yield progress("code_delta", f"Writing {file_path}...", percent, data)
+    
+    yield progress("coding", f"Writing {total_files} files..." + (" (enhanced)" if improve_mode else ""), 20)
+    
+    finished = {}
+    for item in run_dag(jobs, file_deps, write_source, max_workers=CODEGEN_WORKERS, poll_interval=STREAM_FLUSH_INTERVAL):
+        check_cancelled()
+        yield from flush_deltas(20 + int((len(finished) / total_files) * 30))
+        if item is None:
+            continue
+        
+        file_path, code = item
+        finished[file_path] = code
         
+        # Only the generator thread touches the filesystem
         output_path = os.path.join(output_dir, file_path)
         os.makedirs(os.path.dirname(output_path) if os.path.dirname(output_path) else output_dir, exist_ok=True)
         with open(output_path, "w", encoding="utf-8") as f:
             f.write(code)
+        
+        file_percent = 20 + int((len(finished) / total_files) * 30)
+        # Final cleaned code replaces whatever was streamed for this file
+        yield progress("coding", f"Wrote {file_path} ({len(finished)}/{total_files})", file_percent, {"file": file_path, "code": code})
+    
+    # Keep plan order so the first planned file stays the "main" file
+    for file_path in jobs:
+        generated_files[file_path] = finished[file_path]
     
     yield progress("coding", f"Generated {len(generated_files)} source files", 50)
     
-    # Phase 4: Generate Unit Tests
-    yield progress("testing", "Generating unit tests...", 55)
+    # Phases 4-7: Tests, CI/CD, Dockerfile and Review are independent, so run them together.
+    # CI/CD and Dockerfile see the file list the sequential order would have produced when
+    # every stage succeeds; if tests or CI/CD come back empty, the list only names a file that
+    # isn't written, which is cheaper than calling the provider again.
+    yield progress("testing", "Generating tests, CI/CD, Dockerfile and review...", 55)
     main_file = list(generated_files.keys())[0]
     main_code = generated_files[main_file]
-    test_result = generate_unit_tests(main_code, main_file)
-    if test_result["content"]:
-        generated_files[test_result["path"]] = test_result["content"]
-        with open(os.path.join(output_dir, test_result["path"]), "w", encoding="utf-8") as f:
-            f.write(test_result["content"])
-    yield progress("testing", f"Tests generated: {test_result['path']}", 60)
-    
-    # Phase 5: Generate CI/CD Pipeline
-    yield progress("cicd", "Creating CI/CD pipeline...", 65)
     project_type = "python" if any("Python" in lang for lang in languages_used) else "javascript"
-    cicd_result = generate_cicd_pipeline(project_type, list(generated_files.keys()))
-    if cicd_result["content"]:
-        cicd_path = cicd_result["path"]
-        generated_files[cicd_path] = cicd_result["content"]
-        full_cicd_path = os.path.join(output_dir, cicd_path)
-        os.makedirs(os.path.dirname(full_cicd_path), exist_ok=True)
-        with open(full_cicd_path, "w", encoding="utf-8") as f:
-            f.write(cicd_result["content"])
-    yield progress("cicd", "CI/CD pipeline ready", 70)
-    
-    # Phase 6: Generate Dockerfile
-    yield progress("deploy", "Creating Dockerfile...", 75)
-    docker_result = generate_dockerfile(project_type, list(generated_files.keys()))
-    if docker_result["content"]:
-        generated_files["Dockerfile"] = docker_result["content"]
-        with open(os.path.join(output_dir, "Dockerfile"), "w", encoding="utf-8") as f:
-            f.write(docker_result["content"])
-    yield progress("deploy", "Dockerfile ready", 80)
-    
-    # Phase 7: Review
-    yield progress("reviewing", "Reviewing code...", 85)
-    review = review_code(main_code)
+    source_files = list(generated_files.keys())
+    # The model may already have planned a test or workflow file under the same path
+    cicd_files = list(dict.fromkeys(source_files + [get_test_filename(main_file)]))
+    docker_files = list(dict.fromkeys(cicd_files + [CICD_PATH]))
+    
+    stages = {
+        "testing": lambda: generate_unit_tests(main_code, main_file),
+        "cicd": lambda: generate_cicd_pipeline(project_type, cicd_files),
+        "deploy": lambda: generate_dockerfile(project_type, docker_files),
+        "reviewing": lambda: review_code(main_code),
+    }
+    stage_messages = {
+        "testing": lambda r: f"Tests generated: {r['path']}",
+        "cicd": lambda r: "CI/CD pipeline ready",
+        "deploy": lambda r: "Dockerfile ready",
+        "reviewing": lambda r: "Review complete",
+    }
+    
+    extras = {}
+    for step, stage_result in run_dag(stages, {}, lambda step, _: stages[step](), max_workers=len(stages)):
+        extras[step] = stage_result
+        yield progress(step, stage_messages[step](stage_result), 55 + len(extras) * 7)
+    
+    test_result, cicd_result, docker_result, review = extras["testing"], extras["cicd"], extras["deploy"], extras["reviewing"]
+    
+    for stage_result in (test_result, cicd_result, docker_result):
+        if stage_result["content"]:
+            generated_files[stage_result["path"]] = stage_result["content"]
+            output_path = os.path.join(output_dir, stage_result["path"])
+            os.makedirs(os.path.dirname(output_path) if os.path.dirname(output_path) else output_dir, exist_ok=True)
+            with open(output_path, "w", encoding="utf-8") as f:
+                f.write(stage_result["content"])
+    
     issues_count = len(review.get("issues", []))
     
     # Phase 8: Update Intelligence
@@ -131,7 +211,8 @@ def run_pipeline_streaming(idea: str, auto_deploy: bool = False, improve_mode: b
     xp_result = add_project_xp(
         files_generated=len(generated_files),
         issues_found=issues_count,
-        languages=list(languages_used)
+        languages=list(languages_used),
+        project_id=job_id
     )
     
     intel_end = get_intelligence()
@@ -139,11 +220,12 @@ def run_pipeline_streaming(idea: str, auto_deploy: bool = False, improve_mode: b
     
     # Build result
     result = {
+        "job_id": job_id,
         "idea": idea,
         "plan": plan,
         "code_files": list(generated_files.keys()),
         "all_code": generated_files,
-        "final_code": "\n\n".join([f"// === {k} ===\n{v}" for k, v in generated_files.items()]),
+        "final_code": build_final_code(generated_files),
         "review": review,
         "iterations": [{"iteration": 1, "issues_found": issues_count, "summary": review.get("summary", "")}],
         "total_iterations": 1,
@@ -161,10 +243,11 @@ def run_pipeline_streaming(idea: str, auto_deploy: bool = False, improve_mode: b
     
     yield progress("complete", f"Done! {len(generated_files)} files", 100, result)
 
-def run_pipeline(idea: str, auto_deploy: bool = False, improve_mode: bool = False):
+def run_pipeline(idea: str, auto_deploy: bool = False, improve_mode: bool = False,
+                 job_id: str = None, output_dir: str = None):
     """Non-streaming version."""
     result = None
-    for update in run_pipeline_streaming(idea, auto_deploy, improve_mode):
+    for update in run_pipeline_streaming(idea, auto_deploy, improve_mode, job_id, output_dir):
         data = json.loads(update)
         if data["step"] == "complete":
             result = data["data"]
@@ -1,14 +1,26 @@
 """
 Planner Module - Smart project structure planning.
 """
-from .agent import run_agent
+from .agent import run_agent, run_agent_async
 import json
+import os
+import re
 
-def generate_plan(idea: str):
-    """
-    Generates a smart project plan with appropriate files for the technology.
-    """
-    prompt = f"""You are an expert software architect. Plan a project for:
+# Extension -> family; files only import/link within their family (HTML links all)
+FILE_FAMILIES = {
+    ".py": "python",
+    ".js": "script", ".jsx": "script", ".ts": "script", ".tsx": "script", ".mjs": "script",
+    ".css": "style", ".scss": "style",
+    ".html": "markup", ".htm": "markup",
+}
+
+# Entry points import the other modules of their family (of two entry points, the lower rank
+# imports the higher); other modules only depend on the modules their description names
+ENTRY_RANKS = {"index": 0, "main": 1, "server": 2, "app": 3}
+
+def _plan_prompt(idea: str) -> str:
+    """Build the planning prompt."""
+    return f"""You are an expert software architect. Plan a project for:
 
 IDEA: {idea}
 
@@ -25,8 +37,8 @@ Return ONLY valid JSON:
         {{"name": "Phase 1: Setup", "tasks": ["task1", "task2"]}}
     ],
     "files": [
-        {{"path": "main.py", "description": "Main entry point", "language": "Python"}},
-        {{"path": "templates/index.html", "description": "Homepage", "language": "HTML"}}
+        {{"path": "main.py", "description": "Main entry point", "language": "Python", "depends_on": ["utils.py"]}},
+        {{"path": "utils.py", "description": "Helpers", "language": "Python", "depends_on": []}}
     ]
 }}
 
@@ -36,15 +48,29 @@ FILE GUIDELINES:
 - For CLI tools: include main.py, utils.py
 - Always include appropriate file extensions
 - Match file language to extension (.py=Python, .html=HTML, .js=JavaScript)
+- "depends_on" lists the planned files a file imports, links or references
 
 Keep it focused: 2-5 files for simple ideas, 5-10 for complex ones.
 Return ONLY the JSON."""
-    
-    result = run_agent(prompt, mode="plan")
-    
+
+def generate_plan(idea: str):
+    """
+    Generates a smart project plan with appropriate files for the technology.
+    """
+    result = run_agent(_plan_prompt(idea), mode="plan")
+    return _parse_plan(result, idea)
+
+async def generate_plan_async(idea: str):
+    """Async generate_plan."""
+    result = await run_agent_async(_plan_prompt(idea), mode="plan")
+    return _parse_plan(result, idea)
+
+def _parse_plan(result, idea: str) -> dict:
+    """Turn the agent's plan response into a plan dict, falling back by keywords."""
     # Parse result
     if isinstance(result, dict):
         if "phases" in result and "files" in result:
+            result["files"] = infer_dependencies(result["files"])
             return result
         
         if "response" in result:
@@ -56,6 +82,7 @@ Return ONLY the JSON."""
                     parsed = json.loads(text[start:end])
                     if "files" not in parsed:
                         parsed["files"] = detect_files(idea)
+                    parsed["files"] = infer_dependencies(parsed["files"])
                     return parsed
             except:
                 pass
@@ -103,5 +130,66 @@ def create_smart_fallback(idea: str) -> dict:
             {"name": "Phase 2: Implementation", "tasks": ["Implement core features", "Add styling"]},
             {"name": "Phase 3: Testing", "tasks": ["Test functionality", "Fix bugs"]}
         ],
-        "files": files
+        "files": infer_dependencies(files)
     }
+
+def _stem(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0].lower()
+
+def _entry_rank(path: str):
+    return ENTRY_RANKS.get(_stem(path))
+
+def _mentions(description: str, path: str) -> bool:
+    """Whether a file description names path (e.g. "Routes using the models" names models.py)."""
+    return re.search(rf"\b{re.escape(_stem(path))}\b", (description or "").lower()) is not None
+
+def infer_dependencies(files: list) -> list:
+    """
+    Fill in `depends_on` for every planned file.
+    Keeps valid dependencies the planner gave us (an empty list included), infers
+    them when missing (HTML links CSS/JS, entry points import their modules, a module
+    imports the modules its description names) and drops cycles. Sibling modules
+    with no such reference stay independent, so they can be generated in parallel.
+    """
+    paths = [f.get("path") for f in files if f.get("path")]
+    
+    for f in files:
+        path = f.get("path")
+        declared = f.get("depends_on")
+        if isinstance(declared, list):
+            f["depends_on"] = [d for d in dict.fromkeys(declared) if d in paths and d != path]
+            continue
+        
+        family = FILE_FAMILIES.get(os.path.splitext(path or "")[1].lower())
+        if family == "markup":
+            inferred = [p for p in paths if FILE_FAMILIES.get(os.path.splitext(p)[1].lower()) in ("style", "script")]
+        elif family in ("python", "script"):
+            rank = _entry_rank(path)
+            siblings = [p for p in paths if p != path and FILE_FAMILIES.get(os.path.splitext(p)[1].lower()) == family]
+            if rank is not None:
+                inferred = [p for p in siblings if _entry_rank(p) is None or _entry_rank(p) > rank]
+            else:
+                inferred = [p for p in siblings if _entry_rank(p) is None and _mentions(f.get("description"), p)]
+        else:
+            inferred = []
+        f["depends_on"] = inferred
+    
+    # Drop edges that close a cycle (keeps the first-listed direction)
+    deps = {f.get("path"): f["depends_on"] for f in files}
+    visiting, done = set(), set()
+    
+    def visit(path):
+        visiting.add(path)
+        for dep in list(deps.get(path, [])):
+            if dep in visiting:
+                deps[path].remove(dep)
+            elif dep not in done:
+                visit(dep)
+        visiting.discard(path)
+        done.add(path)
+    
+    for path in paths:
+        if path not in done:
+            visit(path)
+    
+    return files
@@ -0,0 +1,213 @@
+"""
+Client-side Rate Limiting - Token buckets for provider RPM/TPM limits.
+Calls wait for capacity (and honour retry-after hints) instead of failing,
+but never past the current build's deadline or after it was cancelled.
+"""
+import asyncio
+import os
+import re
+import threading
+import time
+
+from .cancellation import check_cancelled, current_build
+
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "60"))  # seconds a call may queue
+RATE_LIMIT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", "3"))       # re-sends after a 429
+RATE_LIMIT_POLL = 0.25                                               # seconds between cancellation checks while queued
+
+# Provider defaults follow the free tiers; override per deployment
+PROVIDER_LIMITS = {
+    "groq": {"rpm": int(os.getenv("GROQ_RPM", "30")), "tpm": int(os.getenv("GROQ_TPM", "12000"))},
+    "gemini": {"rpm": int(os.getenv("GEMINI_RPM", "15")), "tpm": int(os.getenv("GEMINI_TPM", "1000000"))},
+}
+
+def estimate_tokens(prompt: str, expected_output: int = 512) -> int:
+    """Rough token count for a request (~4 chars per token) plus expected output."""
+    return len(prompt) // 4 + expected_output
+
+def is_rate_limit_error(e: Exception) -> bool:
+    """True for 429 / quota errors from either provider SDK."""
+    if getattr(e, "status_code", None) == 429:
+        return True
+    text = str(e).lower()
+    return "429" in text or "rate limit" in text or "resource exhausted" in text or "quota" in text
+
+def _parse_duration(value: str):
+    """Parse '7.5', '7.5s', '1m30.5s' or '250ms' into seconds."""
+    value = value.strip().lower()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    match = re.fullmatch(r'(?:(\d+(?:\.\d+)?)m(?!s))?(?:(\d+(?:\.\d+)?)(s|ms))?', value)
+    if not match or not any(match.groups()):
+        return None
+    minutes = float(match.group(1) or 0)
+    amount = float(match.group(2) or 0)
+    return minutes * 60 + (amount / 1000 if match.group(3) == "ms" else amount)
+
+def parse_retry_after(e: Exception):
+    """Extract a retry-after hint (seconds) from a provider error, or None."""
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for header in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        if headers.get(header):
+            seconds = _parse_duration(headers[header])
+            if seconds is not None:
+                return seconds
+
+    text = str(e)
+    # Groq: "Please try again in 7.66s" / "in 1m2.5s"; Gemini: "retry_delay { seconds: 30 }"
+    match = re.search(r'try again in ((?:\d+(?:\.\d+)?m)?\d+(?:\.\d+)?m?s)', text)
+    if match:
+        return _parse_duration(match.group(1))
+    match = re.search(r'retry_delay\s*\{\s*seconds:\s*(\d+)', text)
+    if match:
+        return float(match.group(1))
+    return None
+
+class ProviderLimiter:
+    """Requests-per-minute and tokens-per-minute buckets for one provider."""
+
+    def __init__(self, name: str, rpm: int, tpm: int, max_wait: float = RATE_LIMIT_MAX_WAIT):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_wait = max_wait
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.queue_depth = 0
+        self.counters = {"requests": 0, "queued": 0, "retry_after_hits": 0, "total_wait_seconds": 0.0, "max_wait_seconds": 0.0}
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def _reserve(self, tokens: int) -> float:
+        """Take capacity and return 0, or return how long to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # A single oversized request only needs a full bucket, not more than one
+            tokens = min(tokens, self.tpm)
+            wait = max(
+                self._blocked_until - now,
+                (1 - self._requests) * 60 / self.rpm,
+                (tokens - self._tokens) * 60 / self.tpm,
+            )
+            if wait <= 0:
+                self._requests -= 1
+                self._tokens -= tokens
+                self.counters["requests"] += 1
+                return 0.0
+            return wait
+
+    def _begin_wait(self):
+        with self._lock:
+            self.queue_depth += 1
+            self.counters["queued"] += 1
+
+    def _end_wait(self, waited: float):
+        with self._lock:
+            self.queue_depth -= 1
+            self.counters["total_wait_seconds"] += waited
+            self.counters["max_wait_seconds"] = max(self.counters["max_wait_seconds"], waited)
+
+    def _next_sleep(self, wait: float, start: float) -> float:
+        """
+        How long to sleep before re-checking, 0 to stop queueing. Raises BuildCancelled
+        if the current build was cancelled or is past its deadline.
+        """
+        check_cancelled()
+        remaining = self.max_wait - (time.monotonic() - start)
+        build = current_build()
+        if build is not None and build.deadline is not None:
+            remaining = min(remaining, build.remaining())
+        if remaining <= 0:
+            # Give up queueing; the provider will tell us if we are still over
+            return 0.0
+        return min(wait, remaining, RATE_LIMIT_POLL)
+
+    def acquire(self, tokens: int) -> float:
+        """
+        Block until the request fits the buckets (or max_wait passes). Returns seconds waited.
+        Raises BuildCancelled if the current build is cancelled or runs out of time meanwhile.
+        """
+        wait = self._reserve(tokens)
+        if not wait:
+            return 0.0
+
+        start = time.monotonic()
+        self._begin_wait()
+        try:
+            while wait:
+                delay = self._next_sleep(wait, start)
+                if not delay:
+                    break
+                time.sleep(delay)
+                wait = self._reserve(tokens)
+        finally:
+            waited = time.monotonic() - start
+            self._end_wait(waited)
+        return waited
+
+    async def acquire_async(self, tokens: int) -> float:
+        """acquire() for asyncio callers; sleeps without blocking the loop."""
+        wait = self._reserve(tokens)
+        if not wait:
+            return 0.0
+
+        start = time.monotonic()
+        self._begin_wait()
+        try:
+            while wait:
+                delay = self._next_sleep(wait, start)
+                if not delay:
+                    break
+                await asyncio.sleep(delay)
+                wait = self._reserve(tokens)
+        finally:
+            waited = time.monotonic() - start
+            self._end_wait(waited)
+        return waited
+
+    def record_usage(self, estimated: int, actual: int):
+        """Correct the token bucket once the provider reports real usage."""
+        if actual is None:
+            return
+        with self._lock:
+            self._tokens += estimated - actual
+
+    def penalize(self, seconds: float):
+        """Hold all calls until the provider's retry-after window has passed."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self.counters["retry_after_hits"] += 1
+
+    def stats(self) -> dict:
+        """Queue depth, wait times and bucket levels for /status."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            queued = self.counters["queued"]
+            return {
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "queue_depth": self.queue_depth,
+                "requests_available": round(self._requests, 2),
+                "tokens_available": int(self._tokens),
+                "blocked_for_seconds": round(max(0.0, self._blocked_until - now), 2),
+                **{k: round(v, 3) if isinstance(v, float) else v for k, v in self.counters.items()},
+                "avg_wait_seconds": round(self.counters["total_wait_seconds"] / queued, 3) if queued else 0.0,
+            }
+
+limiters = {name: ProviderLimiter(name, **limits) for name, limits in PROVIDER_LIMITS.items()}
+
+def get_rate_limit_stats() -> dict:
+    """Stats for every provider limiter."""
+    return {name: limiter.stats() for name, limiter in limiters.items()}
@@ -2,14 +2,12 @@
 Enhanced Code Reviewer with Error Detection.
 Returns structured error info with line numbers and explanations.
 """
-from .agent import run_agent
+from .agent import run_agent, run_agent_async
 import re
 
-def review_code(code: str) -> dict:
-    """
-    Reviews code and returns detailed error analysis.
-    """
-    prompt = f"""Analyze this code for errors and issues.
+def _review_prompt(code: str) -> str:
+    """Build the review prompt."""
+    return f"""Analyze this code for errors and issues.
 
 CODE:
 {code}
@@ -34,8 +32,18 @@ Return a JSON object with this EXACT structure:
 If no errors, return has_errors: false with empty errors array.
 Return ONLY valid JSON, no markdown."""
 
-    result = run_agent(prompt, mode="review")
-    
+def review_code(code: str) -> dict:
+    """
+    Reviews code and returns detailed error analysis.
+    """
+    return _parse_review(run_agent(_review_prompt(code), mode="review"), code)
+
+async def review_code_async(code: str) -> dict:
+    """Async review_code."""
+    return _parse_review(await run_agent_async(_review_prompt(code), mode="review"), code)
+
+def _parse_review(result: dict, code: str) -> dict:
+    """Parse the agent's review, falling back to basic static analysis."""
     # Try to parse structured response
     if "errors" in result:
         return result
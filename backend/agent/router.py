@@ -0,0 +1,142 @@
+"""
+Provider Router - Latency-aware routing between LLM providers.
+Keeps rolling latency/error stats per provider and mode and orders
+providers fastest-healthy-first. Also decides when to hedge a request.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+
+ROUTER_WINDOW = int(os.getenv("ROUTER_WINDOW", "50"))                     # samples kept per provider+mode
+ROUTER_MIN_SAMPLES = int(os.getenv("ROUTER_MIN_SAMPLES", "5"))            # before stats are trusted
+ROUTER_MAX_ERROR_RATE = float(os.getenv("ROUTER_MAX_ERROR_RATE", "0.5"))  # above this a provider is unhealthy
+ROUTER_EXPLORE = float(os.getenv("ROUTER_EXPLORE", "0.05"))               # share of calls sent to a non-best provider
+ROUTER_SAMPLE_TTL = float(os.getenv("ROUTER_SAMPLE_TTL", "300"))          # seconds a sample counts, 0 keeps them forever
+HEDGED_MODES = set(m.strip() for m in os.getenv("HEDGED_MODES", "optimize").split(",") if m.strip())
+
+def _percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+class ProviderStats:
+    """
+    Rolling window of latencies and outcomes for one provider + mode.
+    Samples older than ROUTER_SAMPLE_TTL drop out, so a provider that was
+    unhealthy (and so rarely called) goes cold again and gets re-measured.
+    """
+
+    def __init__(self, window: int = ROUTER_WINDOW):
+        self.latencies = deque(maxlen=window)  # (timestamp, seconds)
+        self.outcomes = deque(maxlen=window)   # (timestamp, ok)
+
+    def record(self, latency: float, ok: bool):
+        now = time.monotonic()
+        self.outcomes.append((now, ok))
+        if ok:
+            self.latencies.append((now, latency))
+
+    def expire(self):
+        if ROUTER_SAMPLE_TTL <= 0:
+            return
+        cutoff = time.monotonic() - ROUTER_SAMPLE_TTL
+        for window in (self.outcomes, self.latencies):
+            while window and window[0][0] < cutoff:
+                window.popleft()
+
+    @property
+    def samples(self) -> int:
+        self.expire()
+        return len(self.outcomes)
+
+    @property
+    def error_rate(self) -> float:
+        self.expire()
+        return 1 - sum(ok for _, ok in self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def p50(self):
+        self.expire()
+        return _percentile([s for _, s in self.latencies], 50) if self.latencies else None
+
+    def p95(self):
+        self.expire()
+        return _percentile([s for _, s in self.latencies], 95) if self.latencies else None
+
+class Router:
+    """Orders providers per mode by health and p50 latency."""
+
+    def __init__(self, providers: list, models: dict = None):
+        self.providers = list(providers)
+        self.models = models or {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self.counters = {"routed": 0, "explored": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0}
+
+    def _get(self, provider: str, mode: str) -> ProviderStats:
+        key = (provider, mode)
+        if key not in self._stats:
+            self._stats[key] = ProviderStats()
+        return self._stats[key]
+
+    def record(self, provider: str, mode: str, latency: float, ok: bool):
+        """Record one finished call."""
+        with self._lock:
+            self._get(provider, mode).record(latency, ok)
+
+    def route(self, mode: str) -> list:
+        """Providers to try for this mode, best first."""
+        with self._lock:
+            def sort_key(provider):
+                stats = self._get(provider, mode)
+                warm = stats.samples >= ROUTER_MIN_SAMPLES
+                unhealthy = warm and stats.error_rate > ROUTER_MAX_ERROR_RATE
+                # Cold providers go first (in configured order) so every backend gets measured
+                p50 = stats.p50() if warm and stats.p50() is not None else 0.0
+                return (unhealthy, warm, p50)
+
+            ordered = sorted(self.providers, key=sort_key)
+            self.counters["routed"] += 1
+            if len(ordered) > 1 and random.random() < ROUTER_EXPLORE:
+                # Occasionally try another backend, unhealthy ones included, so their
+                # stats don't go stale and a recovered provider gets noticed
+                # (providers with an open circuit breaker are still put last by the caller)
+                probe = random.choice(ordered[1:])
+                ordered.remove(probe)
+                ordered.insert(0, probe)
+                self.counters["explored"] += 1
+            return ordered
+
+    def hedge_delay(self, provider: str, mode: str):
+        """Seconds to wait before hedging, or None if this mode isn't hedged or stats are cold."""
+        if mode not in HEDGED_MODES or len(self.providers) < 2:
+            return None
+        with self._lock:
+            stats = self._get(provider, mode)
+            if stats.samples < ROUTER_MIN_SAMPLES:
+                return None
+            return stats.p95()
+
+    def count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self) -> dict:
+        """Per provider/mode latency and error stats for /status."""
+        with self._lock:
+            table = {}
+            for (provider, mode), stats in self._stats.items():
+                p50, p95 = stats.p50(), stats.p95()
+                table.setdefault(provider, {"model": self.models.get(provider)})[mode] = {
+                    "samples": stats.samples,
+                    "p50_seconds": round(p50, 3) if p50 is not None else None,
+                    "p95_seconds": round(p95, 3) if p95 is not None else None,
+                    "error_rate": round(stats.error_rate, 3),
+                }
+            return {
+                "providers": self.providers,
+                "hedged_modes": sorted(HEDGED_MODES),
+                **self.counters,
+                "stats": table,
+            }
@@ -0,0 +1,52 @@
+"""
+DAG Scheduler - Runs dependent tasks concurrently on a bounded worker pool.
+"""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+def run_dag(keys: list, deps: dict, fn, max_workers: int = 4, poll_interval: float = None):
+    """
+    Run fn(key, finished) for every key once all of its dependencies are done.
+    `finished` maps each already completed key to its result.
+    Yields (key, result) in completion order. Independent keys run concurrently.
+    With poll_interval, also yields None whenever nothing finished for that long,
+    so the caller can service side channels (e.g. streamed output) meanwhile.
+    Tasks run in a copy of the caller's context (so they see its build context);
+    if the caller stops early, tasks that haven't started are dropped.
+    """
+    keys = list(keys)
+    remaining = {k: set(d for d in deps.get(k, []) if d in keys and d != k) for k in keys}
+    finished = {}
+    
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(keys) or 1)))
+    running = {}
+    
+    def submit_ready():
+        ready = [k for k, pending in remaining.items() if not pending]
+        if not ready and not running and remaining:
+            # Only cycles left (possibly from the start): run them with what we have
+            for pending in remaining.values():
+                pending.clear()
+            ready = list(remaining)
+        for key in ready:
+            del remaining[key]
+            context = {d: finished[d] for d in deps.get(key, []) if d in finished}
+            running[pool.submit(contextvars.copy_context().run, fn, key, context)] = key
+    
+    try:
+        submit_ready()
+        while running:
+            done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            if not done:
+                yield None
+                continue
+            for future in done:
+                key = running.pop(future)
+                finished[key] = future.result()
+                for pending in remaining.values():
+                    pending.discard(key)
+                yield key, finished[key]
+            submit_ready()
+    finally:
+        # Closed early (e.g. cancelled build): don't wait for tasks still in flight
+        pool.shutdown(wait=not running, cancel_futures=True)
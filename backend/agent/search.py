@@ -0,0 +1,180 @@
+"""
+Project Search - Persistent inverted index with BM25 ranking over past projects.
+Postings live in an append-only JSONL file (one line per project) that is
+followed incrementally, so lookups only touch projects sharing a query term.
+With NumPy installed, postings are growable arrays and a query is scored in
+one vectorized pass; otherwise a pure-Python loop does the same maths.
+"""
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .storage import append_jsonl, atomic_write_text, file_lock, iter_jsonl
+
+INDEX_FILE = Path("storage/memory_index.jsonl")
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))  # term-frequency saturation
+BM25_B = float(os.getenv("BM25_B", "0.75"))   # document-length normalization
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "build", "by", "can", "create", "for", "from", "i",
+    "in", "into", "is", "it", "make", "me", "my", "of", "on", "or", "please", "simple", "that",
+    "the", "this", "to", "using", "want", "we", "which", "will", "with", "write", "you",
+}
+
+def tokenize(text: str) -> list:
+    """Lowercase, strip punctuation and drop stopwords/one-letter tokens."""
+    # Join hyphenated/apostrophe words first so "to-do" and "todo" match
+    text = re.sub(r"(?<=\w)['-](?=\w)", "", (text or "").lower())
+    return [t for t in re.findall(r"[a-z0-9]+", text) if len(t) > 1 and t not in STOPWORDS]
+
+class _Column:
+    """Append-only array that grows by doubling (NumPy) or a plain list without it."""
+
+    def __init__(self, dtype):
+        self.size = 0
+        self.data = np.zeros(8, dtype=dtype) if np is not None else []
+
+    def append(self, value):
+        if np is None:
+            self.data.append(value)
+            self.size += 1
+            return
+        if self.size == len(self.data):
+            self.data = np.concatenate([self.data, np.zeros_like(self.data)])
+        self.data[self.size] = value
+        self.size += 1
+
+    def view(self):
+        return self.data[:self.size] if np is not None else self.data
+
+class InvertedIndex:
+    """token -> postings (document slot, term frequency), persisted as an append-only log."""
+
+    def __init__(self, path: Path = INDEX_FILE, k1: float = BM25_K1, b: float = BM25_B):
+        self.path = Path(path)
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.postings = {}               # term -> (_Column slots, _Column tfs)
+        self.doc_ids = []                # slot -> project id
+        self._slots = {}                 # project id -> slot
+        self._lengths = _Column("float64")
+        self._total_length = 0
+        self._read_to = 0
+        self._inode = None
+
+    def _apply(self, project_id, terms: dict):
+        if project_id in self._slots:
+            return
+        slot = len(self.doc_ids)
+        self._slots[project_id] = slot
+        self.doc_ids.append(project_id)
+        length = sum(terms.values())
+        self._lengths.append(length)
+        self._total_length += length
+        for term, tf in terms.items():
+            if term not in self.postings:
+                self.postings[term] = (_Column("int64"), _Column("float64"))
+            slots, tfs = self.postings[term]
+            slots.append(slot)
+            tfs.append(tf)
+
+    def _refresh(self):
+        """Pick up entries appended since the last call (by this or another process)."""
+        try:
+            stat = self.path.stat()
+        except OSError:
+            stat = None
+        if stat is None or stat.st_ino != self._inode or stat.st_size < self._read_to:
+            self._reset()
+            self._inode = stat.st_ino if stat else None
+        if stat is None or stat.st_size == self._read_to:
+            return
+        for _, end, entry in iter_jsonl(self.path, self._read_to):
+            self._read_to = end
+            if entry is not None:
+                self._apply(entry.get("id"), entry.get("terms", {}))
+
+    @staticmethod
+    def _terms(text: str) -> dict:
+        terms = {}
+        for token in tokenize(text):
+            terms[token] = terms.get(token, 0) + 1
+        return terms
+
+    def add(self, project_id: int, text: str):
+        """Index one project."""
+        # Derived data: no fsync, a lost tail is rebuilt from the store
+        append_jsonl(self.path, {"id": project_id, "terms": self._terms(text)}, fsync=False)
+        with self._lock:
+            self._refresh()
+
+    def rebuild(self, documents):
+        """Replace the index with (project_id, text) pairs."""
+        lines = "".join(json.dumps({"id": project_id, "terms": self._terms(text)}, ensure_ascii=False) + "\n"
+                        for project_id, text in documents)
+        with file_lock(self.path):
+            atomic_write_text(self.path, lines, fsync=False)
+        with self._lock:
+            self._refresh()
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self.doc_ids)
+
+    def _idf(self, df: int) -> float:
+        total = len(self.doc_ids)
+        return math.log(1 + (total - df + 0.5) / (df + 0.5))
+
+    def _top_numpy(self, terms: list, k: int) -> list:
+        lengths = self._lengths.view()
+        avg_length = self._total_length / len(self.doc_ids) or 1.0
+        slots = np.concatenate([self.postings[t][0].view() for t in terms])
+        tfs = np.concatenate([self.postings[t][1].view() for t in terms])
+        idf = np.repeat([self._idf(self.postings[t][0].size) for t in terms],
+                        [self.postings[t][0].size for t in terms])
+        norm = self.k1 * (1 - self.b + self.b * lengths[slots] / avg_length)
+        # One batched BM25 pass over every posting of every query term
+        scores = np.bincount(slots, weights=idf * tfs * (self.k1 + 1) / (tfs + norm), minlength=len(self.doc_ids))
+        k = min(k, int(np.count_nonzero(scores)))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        # Ties go to the newer project (higher slot)
+        top = sorted(top.tolist(), key=lambda i: (scores[i], i), reverse=True)
+        return [(self.doc_ids[i], float(scores[i])) for i in top]
+
+    def _top_python(self, terms: list, k: int) -> list:
+        lengths = self._lengths.view()
+        avg_length = self._total_length / len(self.doc_ids) or 1.0
+        scores = {}
+        for term in terms:
+            slots, tfs = self.postings[term]
+            idf = self._idf(slots.size)
+            for slot, tf in zip(slots.data, tfs.data):
+                norm = self.k1 * (1 - self.b + self.b * lengths[slot] / avg_length)
+                scores[slot] = scores.get(slot, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        top = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], item[0]))
+        return [(self.doc_ids[slot], score) for slot, score in top]
+
+    def search(self, query: str, k: int = 3) -> list:
+        """Top-k (project_id, BM25 score)."""
+        with self._lock:
+            self._refresh()
+            terms = [t for t in set(tokenize(query)) if t in self.postings]
+            if not terms:
+                return []
+            return self._top_numpy(terms, k) if np is not None else self._top_python(terms, k)
@@ -2,9 +2,10 @@
 Skill Tree System for Autogenesis AI.
 Tracks skills learned at each level.
 """
-import json
 from pathlib import Path
 
+from .storage import read_json, update_json
+
 SKILLS_FILE = Path("storage/skills.json")
 
 # Skill tree definition
@@ -114,20 +115,14 @@ def get_skill_tree_data(level: int) -> dict:
 
 def award_skill_badge(skill_id: str) -> bool:
     """Award a specific skill badge (for manual unlocks)."""
-    SKILLS_FILE.parent.mkdir(exist_ok=True)
-    
-    badges = []
-    if SKILLS_FILE.exists():
-        badges = json.loads(SKILLS_FILE.read_text())
-    
-    if skill_id not in badges:
+    def award(badges):
+        if skill_id in badges:
+            return badges, False
         badges.append(skill_id)
-        SKILLS_FILE.write_text(json.dumps(badges))
-        return True
-    return False
+        return badges, True
+
+    return update_json(SKILLS_FILE, [], award, indent=None)
 
 def get_badges() -> list:
     """Get all earned badges."""
-    if SKILLS_FILE.exists():
-        return json.loads(SKILLS_FILE.read_text())
-    return []
+    return read_json(SKILLS_FILE, [])
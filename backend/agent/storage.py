@@ -0,0 +1,225 @@
+"""
+Storage Layer - Cross-process safe access to files under storage/.
+Advisory file locks (fcntl on POSIX, msvcrt on Windows) guard read-modify-write,
+whole-file writes go through temp file + rename, and lock waits are measured
+for /status. Also holds the JSONL log helpers shared by memory and search.
+"""
+import copy
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+_stats_lock = threading.Lock()
+_lock_stats = {"acquired": 0, "contended": 0, "total_wait_seconds": 0.0, "max_wait_seconds": 0.0}
+
+def _thread_lock(path: Path) -> threading.Lock:
+    key = str(Path(path).resolve())
+    with _thread_locks_guard:
+        if key not in _thread_locks:
+            _thread_locks[key] = threading.Lock()
+        return _thread_locks[key]
+
+def _lock_fd(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    elif msvcrt is not None:
+        while True:
+            try:
+                # Locks one byte; LK_LOCK itself retries for ~10s before raising
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+def _unlock_fd(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def file_lock(path: Path):
+    """
+    Exclusive lock for path, held across threads and processes.
+    Uses a sidecar "<name>.lock" file so the data file itself can be replaced.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    start = time.monotonic()
+    thread_lock = _thread_lock(path)
+    thread_lock.acquire()
+    fd = None
+    try:
+        fd = os.open(path.with_name(path.name + ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        _lock_fd(fd)
+        waited = time.monotonic() - start
+        with _stats_lock:
+            _lock_stats["acquired"] += 1
+            _lock_stats["total_wait_seconds"] += waited
+            _lock_stats["max_wait_seconds"] = max(_lock_stats["max_wait_seconds"], waited)
+            if waited > 0.001:
+                _lock_stats["contended"] += 1
+        yield
+    finally:
+        if fd is not None:
+            try:
+                _unlock_fd(fd)
+            finally:
+                os.close(fd)
+        thread_lock.release()
+
+def get_lock_stats() -> dict:
+    """Lock acquisitions and wait times for /status."""
+    with _stats_lock:
+        acquired = _lock_stats["acquired"]
+        return {
+            **{k: round(v, 4) if isinstance(v, float) else v for k, v in _lock_stats.items()},
+            "avg_wait_seconds": round(_lock_stats["total_wait_seconds"] / acquired, 4) if acquired else 0.0,
+            "backend": "fcntl" if fcntl is not None else "msvcrt" if msvcrt is not None else "thread",
+        }
+
+def fsync_dir(path: Path):
+    """Persist a rename/create in the directory itself (no-op where unsupported)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def atomic_write_bytes(path: Path, data: bytes, fsync: bool = True):
+    """Replace path with data in one step: readers see the old or the new file, never half of one."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        raise
+    if fsync:
+        fsync_dir(path.parent)
+
+def atomic_write_text(path: Path, text: str, fsync: bool = True):
+    atomic_write_bytes(path, text.encode("utf-8"), fsync)
+
+def read_json(path: Path, default=None):
+    """Parsed JSON file, or a copy of default if it is missing or unreadable."""
+    try:
+        return json.loads(Path(path).read_text())
+    except (OSError, ValueError):
+        return copy.deepcopy(default)
+
+def update_json(path: Path, default, fn, indent=2):
+    """
+    Locked read-modify-write of a JSON file. fn gets the current data, may
+    mutate it in place and returns (new_data, result); new_data is written atomically.
+    fn starts from default only if the file is missing: a corrupt file is moved
+    aside to "<name>.<timestamp>.corrupt" first, so its data can still be recovered.
+    """
+    path = Path(path)
+    with file_lock(path):
+        try:
+            current = json.loads(path.read_text())
+        except FileNotFoundError:
+            current = copy.deepcopy(default)
+        except ValueError as e:
+            corrupt = path.with_name(f"{path.name}.{int(time.time())}.corrupt")
+            os.replace(path, corrupt)
+            print(f"⚠️ {path} is corrupt ({e}); moved it to {corrupt.name}")
+            current = copy.deepcopy(default)
+        data, result = fn(current)
+        atomic_write_text(path, json.dumps(data, indent=indent))
+        return result
+
+def iter_jsonl(path: Path, start: int = 0):
+    """Yield (offset, end, record) for every complete line from start; record is None if corrupt."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        offset = start
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # torn tail from an interrupted append
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield offset, offset + len(line), record if isinstance(record, dict) else None
+            offset += len(line)
+
+def last_line(f) -> bytes:
+    """Last complete line of an open binary log, read backwards from the end."""
+    f.seek(0, os.SEEK_END)
+    pos, data = f.tell(), b""
+    while pos > 0:
+        step = min(64 * 1024, pos)
+        pos -= step
+        f.seek(pos)
+        data = f.read(step) + data
+        # Need the newline that ends the previous line (or the start of the file)
+        if data.count(b"\n") >= 2:
+            break
+    lines = data.rstrip(b"\n").split(b"\n")
+    return lines[-1] if lines else b""
+
+def repair_tail(f):
+    """Cut off a torn (unterminated) last record so the next append starts on a clean line."""
+    f.seek(0, os.SEEK_END)
+    end = f.tell()
+    if end == 0:
+        return
+    f.seek(end - 1)
+    if f.read(1) == b"\n":
+        return
+    pos = end
+    while pos > 0:
+        step = min(64 * 1024, pos)
+        pos -= step
+        f.seek(pos)
+        idx = f.read(step).rfind(b"\n")
+        if idx != -1:
+            f.truncate(pos + idx + 1)
+            return
+    f.truncate(0)
+
+def append_jsonl(path: Path, record: dict, fsync: bool = True, lock: bool = True):
+    """Append one JSON line under the file lock (pass lock=False if already held), dropping any torn tail first."""
+    path = Path(path)
+    if lock:
+        with file_lock(path):
+            return append_jsonl(path, record, fsync, lock=False)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        repair_tail(f)
+        f.seek(0, os.SEEK_END)
+        f.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
@@ -9,3 +9,46 @@ from agent.agent import run_agent
 print("Running agent test...")
 result = run_agent("A simple todo list app")
 print("Result:", result)
+
+
+def test_run_agent_async_matches_sync():
+    import asyncio
+    from agent.agent import run_agent_async
+    from agent.planner import generate_plan, generate_plan_async
+
+    sync_plan = generate_plan("A simple todo list app")
+    async_plan = asyncio.run(generate_plan_async("A simple todo list app"))
+    assert async_plan["files"] == sync_plan["files"]
+
+    result = asyncio.run(run_agent_async("A simple todo list app", mode="optimize"))
+    assert "response" in result
+
+
+def test_failover_resets_streamed_text(tmp_path, monkeypatch):
+    from agent import agent
+    from agent.breaker import CircuitBreaker
+    from agent.cache import ResponseCache
+    from agent.router import Router
+
+    def dies_midway(idea, mode, on_delta=None):
+        on_delta(None)
+        on_delta("half a fi")
+        return {"error": "connection reset"}
+
+    def works(idea, mode, on_delta=None):
+        on_delta(None)
+        on_delta("whole file")
+        return {"code": "whole file"}
+
+    monkeypatch.setattr("agent.router.ROUTER_EXPLORE", 0.0)
+    monkeypatch.setattr(agent, "PROVIDERS", ["groq", "gemini"])
+    monkeypatch.setattr(agent, "router", Router(["groq", "gemini"]))
+    monkeypatch.setattr(agent, "breakers", {"groq": CircuitBreaker("groq"), "gemini": CircuitBreaker("gemini")})
+    monkeypatch.setattr(agent, "PROVIDER_CALLS", {"groq": dies_midway, "gemini": works})
+    monkeypatch.setattr(agent, "response_cache", ResponseCache(tmp_path / "cache"))
+
+    deltas = []
+    result = run_agent("FILE: app.js failover test", mode="code", on_delta=deltas.append)
+    assert result["code"] == "whole file"
+    # The first attempt's text is voided before the second one streams
+    assert deltas == ["half a fi", None, "whole file"]
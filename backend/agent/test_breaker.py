@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+import pytest
+
+from agent import agent
+from agent.breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from agent.cancellation import BuildCancelled
+from agent.router import Router
+
+
+def test_breaker_state_machine():
+    breaker = CircuitBreaker("groq", failure_threshold=2, recovery_timeout=0.1, half_open_max_calls=1)
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.12)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    time.sleep(0.12)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_open_circuit_fails_fast_and_reroutes(monkeypatch):
+    calls = []
+
+    def down(idea, mode, on_delta=None):
+        calls.append("groq")
+        return {"error": "connection timed out"}
+
+    def up(idea, mode, on_delta=None):
+        calls.append("gemini")
+        return {"response": "ok"}
+
+    monkeypatch.setattr(agent, "router", Router(["groq", "gemini"]))
+    monkeypatch.setattr(agent, "PROVIDER_CALLS", {"groq": down, "gemini": up})
+    monkeypatch.setattr(agent, "breakers", {
+        "groq": CircuitBreaker("groq", failure_threshold=1, recovery_timeout=60),
+        "gemini": CircuitBreaker("gemini"),
+    })
+
+    assert agent._routed_call(["groq", "gemini"], "idea", "code") == ("gemini", {"response": "ok"})
+    assert agent.breakers["groq"].state == OPEN
+    assert agent._route("code") == ["gemini", "groq"]
+
+    calls.clear()
+    agent._routed_call(["groq", "gemini"], "idea", "code")
+    assert calls == ["gemini"]  # groq is skipped without a network call
+
+
+def test_cancelled_probe_gives_its_slot_back(monkeypatch):
+    def cancelled(idea, mode, on_delta=None):
+        raise BuildCancelled("Build cancelled")
+
+    async def hangs(idea, mode):
+        await asyncio.sleep(10)
+
+    breaker = CircuitBreaker("groq", failure_threshold=1, recovery_timeout=0.01, half_open_max_calls=1)
+    monkeypatch.setattr(agent, "breakers", {"groq": breaker})
+    monkeypatch.setattr(agent, "PROVIDER_CALLS", {"groq": cancelled})
+    monkeypatch.setattr(agent, "PROVIDER_CALLS_ASYNC", {"groq": hangs})
+    breaker.record_failure()
+    time.sleep(0.02)
+
+    with pytest.raises(BuildCancelled):
+        agent._timed_call("groq", "idea", "code")
+    assert breaker.state == HALF_OPEN
+
+    async def cancel_probe():
+        task = asyncio.ensure_future(agent._timed_call_async("groq", "idea", "code"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_probe())
+    assert breaker.allow()
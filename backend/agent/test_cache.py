@@ -0,0 +1,42 @@
+import time
+
+from agent.cache import ResponseCache, cache_key
+
+
+def test_cache_key_covers_every_field():
+    base = cache_key("groq", "m", "code", "prompt", 0.7)
+    assert base == cache_key("groq", "m", "code", "prompt", 0.7)
+    assert base != cache_key("gemini", "m", "code", "prompt", 0.7)
+    assert base != cache_key("groq", "m", "plan", "prompt", 0.7)
+    assert base != cache_key("groq", "m", "code", "prompt", 0.2)
+
+
+def test_memory_lru_and_disk_tier(tmp_path):
+    cache = ResponseCache(directory=tmp_path, ttl=60, max_items=2, enabled=True)
+    for name in ("a", "b", "c"):
+        cache.set(name * 4, {"code": name})
+
+    # "aaaa" fell out of the LRU but is still on disk
+    assert len(cache._memory) == 2
+    assert cache.get("aaaa") == {"code": "a"}
+    assert cache.counters["disk_hits"] == 1
+    assert cache.get("cccc") == {"code": "c"}
+    assert cache.counters["memory_hits"] == 1
+
+    # Callers get copies they can mutate freely
+    cache.get("cccc")["code"] = "changed"
+    assert cache.get("cccc") == {"code": "c"}
+
+
+def test_ttl_and_disk_cap(tmp_path):
+    cache = ResponseCache(directory=tmp_path, ttl=0, enabled=True)
+    cache.set("dead", {"code": "x"})
+    time.sleep(0.01)
+    assert cache.get("dead") is None
+    assert cache.counters["misses"] == 1
+
+    small = ResponseCache(directory=tmp_path / "small", ttl=60, max_disk_bytes=300, enabled=True)
+    for i in range(10):
+        small.set(f"{i:04d}", {"code": "x" * 50})
+    assert small.stats()["disk_bytes"] <= 300
+    assert small.counters["disk_evictions"] > 0
@@ -0,0 +1,78 @@
+import json
+import time
+
+import pytest
+
+from agent import orchestrator, workspace
+from agent.agent import run_agent, run_agent_async
+from agent.cancellation import BuildCancelled, BuildContext, DeadlineExceeded, build_context, current_build
+from agent.jobs import JobManager, MemoryJobBackend
+from agent.scheduler import run_dag
+
+
+def test_context_reaches_workers_and_stops_run_agent():
+    context = BuildContext("job-1")
+    with build_context(context):
+        seen = dict(run_dag(["a", "b"], {}, lambda key, _: current_build()))
+        assert seen == {"a": context, "b": context}
+
+        context.cancel()
+        with pytest.raises(BuildCancelled):
+            run_agent("Build a calculator", mode="code")
+
+    with build_context(BuildContext(deadline=0.01)):
+        time.sleep(0.02)
+        with pytest.raises(DeadlineExceeded):
+            run_agent("Build a calculator", mode="code")
+    assert current_build() is None
+
+
+def test_async_agent_honours_the_deadline():
+    import asyncio
+
+    async def build():
+        with build_context(BuildContext(deadline=0.01)):
+            await asyncio.sleep(0.02)
+            await run_agent_async("Build a calculator", mode="code")
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(build())
+
+
+def test_cancelled_job_skips_remaining_phases(isolated_storage, monkeypatch):
+    calls = []
+
+    def slow_generate(prompt, path, on_delta=None):
+        calls.append(path)
+        time.sleep(0.2)
+        return f"// {path}"
+
+    monkeypatch.setattr(orchestrator, "generate_file", slow_generate)
+    backend = MemoryJobBackend()
+    manager = JobManager(backend, workers=1)
+    job = manager.submit("Build a landing web page")
+
+    deadline = time.monotonic() + 5
+    while not calls:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    manager.cancel(job["id"])
+    while manager.get(job["id"])["status"] == "running":
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+    done = manager.get(job["id"])
+    steps = [json.loads(e)["step"] for _, e in manager.events(job["id"])]
+    assert done["status"] == "cancelled"
+    assert steps[-1] == "cancelled"
+    assert "testing" not in steps and "complete" not in steps
+    assert workspace.latest_job_id() is None
+
+
+def test_cancel_queued_job():
+    backend = MemoryJobBackend()
+    manager = JobManager(backend)  # no workers started
+    job = backend.submit("idea")
+    assert manager.cancel(job["id"])["status"] == "cancelled"
+    assert backend.claim(0.01) is None
+    assert manager.cancel("missing") is None
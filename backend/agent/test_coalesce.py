@@ -0,0 +1,43 @@
+import asyncio
+import threading
+import time
+
+from agent.coalesce import SingleFlight
+
+
+def test_concurrent_threads_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    def upstream():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"code": "shared"}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", upstream))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [{"code": "shared"}] * 8
+    assert results[0] is not results[1]
+    assert flight.stats() == {"upstream_calls": 1, "coalesced": 7, "in_flight": 0}
+
+
+def test_concurrent_tasks_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"response": "shared"}
+
+    async def main():
+        return await asyncio.gather(*(flight.do_async("k", upstream) for _ in range(5)))
+
+    assert asyncio.run(main()) == [{"response": "shared"}] * 5
+    assert len(calls) == 1
@@ -0,0 +1,40 @@
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from agent import export
+from agent.export import iter_archive, memory_entries, workspace_entries
+
+
+def test_zip_streams_workspace_in_bounded_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_CHUNK_SIZE", 4096)
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "app.py").write_text("print('hi')\n")
+    big = os.urandom(100 * 1024)  # incompressible
+    (tmp_path / "data.bin").write_bytes(big)
+
+    chunks = list(iter_archive(workspace_entries(tmp_path), "zip", level=1))
+    # Sent as it is compressed, never as one archive-sized buffer
+    assert len(chunks) > 3
+    assert max(len(c) for c in chunks) < len(big) / 2
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.testzip() is None
+        assert sorted(archive.namelist()) == ["data.bin", "src/app.py"]
+        assert archive.read("data.bin") == big
+        assert archive.read("src/app.py") == b"print('hi')\n"
+
+
+def test_tar_gz_from_memory():
+    files = {"main.py": "print('hi')\n", "web/index.html": "<html></html>", "../evil.sh": "rm -rf /"}
+    data = b"".join(iter_archive(memory_entries(files), "tar.gz"))
+
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as archive:
+        assert sorted(archive.getnames()) == ["main.py", "web/index.html"]
+        assert archive.extractfile("web/index.html").read() == b"<html></html>"
+
+    with pytest.raises(ValueError):
+        iter_archive(memory_entries(files), "rar")
@@ -0,0 +1,59 @@
+import json
+import threading
+from datetime import date
+
+from agent.intelligence import IntelligenceLedger, _project_xp_event
+
+
+def _ledger(tmp_path, **kwargs):
+    return IntelligenceLedger(tmp_path / "events.jsonl", tmp_path / "snapshot.json", tmp_path / "intelligence.json", **kwargs)
+
+
+def _add_project(ledger, files=2, issues=0, languages=("Python",), project_id="b1"):
+    return ledger.record_with(lambda stats: _project_xp_event(stats, files, issues, list(languages), project_id))
+
+
+def test_concurrent_workers_share_the_event_log(tmp_path):
+    ours, theirs = _ledger(tmp_path), _ledger(tmp_path)
+
+    assert _add_project(ours)["xp_gained"] == 10 + 4 + 15 + 10
+    _add_project(theirs, languages=("HTML",), project_id="b2")
+
+    # Both awards are kept and either worker can replay them
+    stats = ours.get()
+    assert stats["total_projects"] == 2
+    assert sorted(stats["languages_used"]) == ["HTML", "Python"]
+    assert theirs.get() == stats
+    assert ours.xp_by_day() == {date.today().isoformat(): stats["xp"]}
+
+
+def test_new_language_bonus_is_awarded_once(tmp_path):
+    ledgers = [_ledger(tmp_path) for _ in range(4)]
+    results = []
+    threads = [threading.Thread(target=lambda l=l: results.append(_add_project(l, languages=("Rust",)))) for l in ledgers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Only the first build to reach the log gets the +10 for a new language
+    assert sorted(r["xp_gained"] for r in results) == [29, 29, 29, 39]
+    assert ledgers[0].get()["xp"] == 29 * 3 + 39
+
+
+def test_snapshot_plus_tail_and_legacy_migration(tmp_path):
+    (tmp_path / "intelligence.json").write_text(json.dumps({"total_projects": 4, "xp": 100, "languages_used": ["CSS"]}))
+    ledger = _ledger(tmp_path, snapshot_every=2)
+    assert ledger.get()["xp"] == 100
+    assert (tmp_path / "intelligence.json.migrated").exists()
+
+    _add_project(ledger)  # baseline + this event triggers a snapshot
+    _add_project(ledger, project_id="b2")
+    snapshot = json.loads((tmp_path / "snapshot.json").read_text())
+    assert snapshot["events"] == 2
+
+    # A fresh process starts from the snapshot and replays only the tail
+    fresh = _ledger(tmp_path)
+    assert fresh.get() == ledger.get()
+    assert fresh.get()["total_projects"] == 6
+    assert fresh.counters["replayed_events"] == 1
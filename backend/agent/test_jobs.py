@@ -0,0 +1,93 @@
+import json
+import time
+
+import pytest
+
+from agent.cancellation import check_cancelled
+from agent.jobs import JobManager, JobQueueFull, MemoryJobBackend, SqliteJobBackend, job_view
+
+
+def fake_build(job):
+    for step in ("start", "coding", "complete"):
+        yield json.dumps({"step": step, "message": step, "percent": 0, "data": {"job_id": job["id"]}})
+
+
+def failing_build(job):
+    yield json.dumps({"step": "start", "message": "start", "percent": 0, "data": {}})
+    raise RuntimeError("provider down")
+
+
+def wait_finished(manager, job_id):
+    deadline = time.monotonic() + 5
+    while manager.get(job_id)["status"] not in ("succeeded", "failed"):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    return manager.get(job_id)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return SqliteJobBackend(tmp_path / "jobs.db", max_queued=2)
+    return MemoryJobBackend(max_queued=2)
+
+
+def test_job_runs_in_background_and_replays_events(backend):
+    manager = JobManager(backend, workers=2, runner=fake_build)
+    job = manager.submit("Build a landing web page")
+    assert job["status"] == "queued"
+
+    done = wait_finished(manager, job["id"])
+    assert done["status"] == "succeeded"
+    assert done["result"] == {"job_id": job["id"]}
+    assert job_view(done)["progress"]["step"] == "complete"
+    # Replay from any offset
+    assert [json.loads(e)["step"] for _, e in manager.events(job["id"], 1)] == ["coding", "complete"]
+    assert [seq for seq, _ in manager.events(job["id"])] == [0, 1, 2]
+
+
+def test_failed_job_keeps_its_error(backend):
+    manager = JobManager(backend, runner=failing_build)
+    done = wait_finished(manager, manager.submit("idea")["id"])
+    assert done["status"] == "failed" and done["error"] == "provider down"
+    assert [json.loads(e)["step"] for _, e in manager.events(done["id"])] == ["start", "error"]
+
+
+def test_cancel_between_claim_and_run(backend):
+    def checked_build(job):
+        check_cancelled()
+        yield from fake_build(job)
+
+    manager = JobManager(backend, runner=checked_build)  # workers never started: we claim by hand
+    job = backend.submit("idea")
+    claimed = backend.claim(0.01)
+    manager.cancel(job["id"])  # running, but not registered with the manager yet
+    manager.run(claimed)
+
+    assert manager.get(job["id"])["status"] == "cancelled"
+    assert [json.loads(e)["step"] for _, e in manager.events(job["id"])] == ["cancelled"]
+
+
+def test_full_queue_rejects_submit(backend):
+    manager = JobManager(backend, runner=fake_build)  # workers never started: nothing drains
+    backend.submit("one")
+    backend.submit("two")
+    with pytest.raises(JobQueueFull):
+        manager.submit("three")
+    assert manager.counters["rejected"] == 1
+
+
+def test_ring_buffer_keeps_ids_monotonic(tmp_path):
+    from agent.jobs import parse_event_id
+
+    for backend in (MemoryJobBackend(buffer=3), SqliteJobBackend(tmp_path / "jobs.db", buffer=3)):
+        job = backend.submit("idea")
+        for i in range(5):
+            backend.append_event(job["id"], f"event {i}")
+        # Only the newest 3 are kept, under their original ids
+        assert backend.events(job["id"]) == [(2, "event 2"), (3, "event 3"), (4, "event 4")]
+        assert backend.events(job["id"], 4) == [(4, "event 4")]
+
+    assert parse_event_id("abc123:7") == ("abc123", 8)
+    assert parse_event_id("7") == (None, 8)
+    assert parse_event_id(None) == (None, 0)
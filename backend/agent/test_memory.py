@@ -0,0 +1,194 @@
+import json
+
+from agent.memory_store import JsonlMemoryStore, SqliteMemoryStore
+from agent.search import InvertedIndex
+
+
+def _project(idea, files=("main.py",), score=8):
+    return {"idea": idea, "code_files": list(files), "review": {"score": score},
+            "all_code": {f: "print(1)" for f in files}, "final_code": "print(1)"}
+
+
+def test_jsonl_append_assigns_ids_and_skips_torn_tail(tmp_path):
+    store = JsonlMemoryStore(tmp_path / "memory.jsonl", tmp_path / "memory.json")
+    assert store.append({"idea": "todo app"}) == 1
+    assert store.append({"idea": "calculator"}) == 2
+
+    # Simulate a crash halfway through writing a third record
+    with open(store.path, "ab") as f:
+        f.write(b'{"id": 3, "idea": "half wri')
+    assert [r["idea"] for r in store.iter_records()] == ["todo app", "calculator"]
+
+    # The next append drops the torn bytes and carries on from the last good id
+    assert store.append({"idea": "weather"}) == 3
+    records = list(store.iter_records())
+    assert [r["id"] for r in records] == [1, 2, 3]
+    assert all("timestamp" in r for r in records)
+    assert [h["id"] for h in store.history(limit=2)[0]] == [3, 2]
+    assert store.get(2)["idea"] == "calculator"
+
+
+def test_jsonl_migrates_legacy_json_and_compacts(tmp_path):
+    store = JsonlMemoryStore(tmp_path / "memory.jsonl", tmp_path / "memory.json")
+    store.legacy_path.write_text(json.dumps([{"idea": "old one"}, {"idea": "old two"}]))
+
+    assert [r["id"] for r in store.iter_records()] == [1, 2]
+    assert not store.legacy_path.exists()
+    assert (tmp_path / "memory.json.migrated").exists()
+
+    with open(store.path, "ab") as f:
+        f.write(b"not json\n")
+    stats = store.compact()
+    assert (stats["kept"], stats["dropped"]) == (2, 1)
+    assert store.append({"idea": "new"}) == 3
+    assert store.count() == 3
+
+
+def test_sqlite_store_pages_metadata_and_loads_code_on_demand(tmp_path):
+    jsonl = JsonlMemoryStore(tmp_path / "memory.jsonl", tmp_path / "memory.json")
+    jsonl.append(_project("imported todo app"))
+    store = SqliteMemoryStore(tmp_path / "memory.db", import_from=jsonl)
+
+    # The existing log is imported on first use
+    assert store.append(_project("weather dashboard", ("index.html", "app.js"), score=9)) == 2
+    assert store.append(_project("python cli")) == 3
+    assert store.count() == 3
+
+    page, cursor = store.history(limit=2)
+    assert [p["id"] for p in page] == [3, 2]
+    assert page[1]["languages"] == ["HTML", "JavaScript"]
+    assert page[1]["quality_score"] == 9
+    assert store.history(limit=2, cursor=cursor) == (store.history()[0][2:], None)
+
+    assert store.get(2)["all_code"] == {"index.html": "print(1)", "app.js": "print(1)"}
+    assert [text for _, text in store.documents()] == ["imported todo app", "weather dashboard", "python cli"]
+
+
+def test_save_memory_indexes_ideas_for_similar_lookup(tmp_path, monkeypatch):
+    from agent import memory
+
+    store = JsonlMemoryStore(tmp_path / "memory.jsonl", tmp_path / "memory.json")
+    store.append(_project("todo list app"))  # stored before the index existed
+    monkeypatch.setattr(memory, "_store", store)
+    monkeypatch.setattr(memory, "_index", None)
+    monkeypatch.setattr("agent.memory.InvertedIndex", lambda: InvertedIndex(tmp_path / "index.jsonl"))
+
+    memory.save_memory(_project("weather dashboard"))
+    assert memory.get_index().count() == 2
+    assert [p["idea"] for p in memory.get_similar_projects("a todo app", limit=1)] == ["todo list app"]
+    assert "weather dashboard" in memory.get_learning_context("weather forecast")
+
+
+def test_code_goes_to_deduplicated_blob_store(tmp_path, monkeypatch):
+    from agent import memory
+    from agent.blobs import BlobStore
+
+    blobs = BlobStore(tmp_path / "blobs")
+    monkeypatch.setattr(memory, "blob_store", blobs)
+    monkeypatch.setattr(memory, "_store", JsonlMemoryStore(tmp_path / "memory.jsonl", tmp_path / "memory.json"))
+    monkeypatch.setattr(memory, "_index", None)
+    monkeypatch.setattr("agent.memory.InvertedIndex", lambda: InvertedIndex(tmp_path / "index.jsonl"))
+
+    result = {"idea": "calculator", "code_files": ["main.py"], "all_code": {"main.py": "print(1)"}, "final_code": "x"}
+    first = memory.save_memory(result)
+    memory.save_memory(dict(result))
+    assert "all_code" in result  # the caller's result is left alone
+
+    stored = memory.read_memory()
+    assert "all_code" not in stored[0] and "final_code" not in stored[0]
+    assert stored[0]["code_refs"] == stored[1]["code_refs"]
+    assert blobs.counters == {**blobs.counters, "writes": 1, "dedup_hits": 1}
+
+    project = memory.get_project(first)
+    assert project["all_code"] == {"main.py": "print(1)"}
+    assert project["final_code"] == memory.build_final_code({"main.py": "print(1)"})
+
+
+def test_cursor_pages_and_filters_match_across_stores(tmp_path):
+    jsonl = JsonlMemoryStore(tmp_path / "memory.jsonl", tmp_path / "memory.json")
+    sqlite = SqliteMemoryStore(tmp_path / "memory.db")
+    for store in (jsonl, sqlite):
+        for i in range(7):
+            files = ("index.html", "app.js") if i % 2 else ("main.py",)
+            store.append(_project(f"project {i}", files, score=i + 3))
+
+    for store in (jsonl, sqlite):
+        seen, cursor = [], None
+        while True:
+            page, cursor = store.history(limit=3, cursor=cursor, language="javascript")
+            seen += [p["id"] for p in page]
+            if cursor is None:
+                break
+        assert seen == [6, 4, 2]
+        assert [p["id"] for p in store.history(min_score=8)[0]] == [7, 6]
+        today = jsonl.history(limit=1)[0][0]["timestamp"][:10]
+        assert len(store.history(since=today, until=today)[0]) == 7
+        assert store.history(until="2000-01-01")[0] == []
+
+
+def test_query_memory_projects_fields(tmp_path, monkeypatch):
+    import pytest
+    from agent import memory
+
+    store = JsonlMemoryStore(tmp_path / "memory.jsonl", tmp_path / "memory.json")
+    store.append(_project("todo app"))
+    monkeypatch.setattr(memory, "_store", store)
+
+    assert memory.query_memory(fields=["id", "idea"]) == ([{"id": 1, "idea": "todo app"}], None)
+    with pytest.raises(ValueError):
+        memory.query_memory(fields=["all_code"])
+
+
+def test_retention_moves_old_records_to_compressed_cold_segment(tmp_path):
+    store = JsonlMemoryStore(tmp_path / "memory.jsonl", tmp_path / "memory.json")
+    for i in range(4):
+        store.append({**_project(f"project {i}"), "code_refs": {"main.py": f"hash{i}"}})
+    store.append({**_project("project 3"), "code_refs": {"main.py": "hash3"}})  # identical rebuild
+
+    stats = store.compact(keep_full=2, keep_days=0, compression="gzip")
+    assert stats["deduplicated"] == 1 and stats["code_pruned"] == 2 and stats["moved_to_cold"] == 2
+    assert [p.name for p in (tmp_path / "memory_cold").iterdir()] == ["0000000001-0000000002.jsonl.gz"]
+
+    # Cold records are still listed and readable, just without code
+    fresh = JsonlMemoryStore(tmp_path / "memory.jsonl", tmp_path / "memory.json")
+    assert [p["id"] for p in fresh.history()[0]] == [5, 3, 2, 1]
+    assert fresh.get(1)["code_pruned"] and "code_refs" not in fresh.get(1)
+    assert fresh.get(5)["code_refs"] == {"main.py": "hash3"}
+    assert fresh.append({"idea": "next"}) == 6
+
+
+def test_sqlite_retention_and_blob_gc(tmp_path):
+    import os
+    from agent.blobs import BlobStore
+
+    blobs = BlobStore(tmp_path / "blobs")
+    store = SqliteMemoryStore(tmp_path / "memory.db")
+    for i in range(3):
+        store.append({"idea": f"p{i}", "code_refs": {"main.py": blobs.put(f"print({i})")}})
+
+    stats = store.compact(keep_full=1, keep_days=0)
+    assert stats["code_pruned"] == 2
+    assert "code_refs" not in store.get(1) and store.get(3)["code_refs"]
+
+    referenced = {d for r in store.iter_records() for d in (r.get("code_refs") or {}).values()}
+    assert blobs.gc(referenced)["removed"] == 0  # still inside the grace period
+    for path in (tmp_path / "blobs").glob("*/*"):
+        os.utime(path, (0, 0))
+    assert blobs.gc(referenced)["removed"] == 2
+    assert blobs.get(store.get(3)["code_refs"]["main.py"]) == "print(2)"
+
+
+def test_retention_deduplicates_real_build_records(isolated_storage):
+    from agent import memory, orchestrator
+    from agent.memory_store import apply_retention
+
+    for _ in range(3):
+        orchestrator.run_pipeline("Build a landing web page")
+    orchestrator.run_pipeline("Create a simple calculator")
+
+    # Same output, but each record has its own job id and running XP/intelligence totals
+    records = list(memory.get_store().iter_records())
+    assert len({r["job_id"] for r in records}) == 4 and "intelligence" in records[0]
+    kept, stats = apply_retention(records)
+    assert stats["deduplicated"] == 2
+    assert [r["id"] for r in kept] == [3, 4]
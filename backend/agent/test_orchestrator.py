@@ -1,15 +1,14 @@
 from agent.orchestrator import run_pipeline
 from agent.memory import read_memory
+import pytest
 import shutil
+import tempfile
 
-# Clean previous output
-try:
-    shutil.rmtree("output")
-except:
-    pass
+# Write into a throwaway directory, not the shared workspaces under output/
+output_dir = tempfile.mkdtemp(prefix="autogenesis-test-")
 
 print("Testing Orchestrator...")
-result = run_pipeline("Create a simple calculator")
+result = run_pipeline("Create a simple calculator", output_dir=output_dir)
 print("Pipeline Result Keys:", result.keys())
 
 memory = read_memory()
@@ -21,7 +20,179 @@ else:
     print("FAILURE: Pipeline structure missing keys. Got:", result.keys())
 
 import os
-if os.path.exists("output/main.py"):
+if os.path.exists(os.path.join(output_dir, "main.py")):
     print("SUCCESS: Output file created")
 else:
     print("FAILURE: Output file not created")
+shutil.rmtree(output_dir, ignore_errors=True)
+
+
+# Builds in these tests write their workspaces, memory and XP under tmp_path
+pytestmark = pytest.mark.usefixtures("isolated_storage")
+
+
+def test_parallel_file_generation(monkeypatch):
+    """Files are generated concurrently but kept in plan order."""
+    import json
+    import threading
+    from agent import orchestrator
+
+    # styles.css and main.js don't depend on each other: each waits here until the other is running too
+    both_running = threading.Barrier(2, timeout=5)
+    lock = threading.Lock()
+    in_flight, peak = [0], [0]
+
+    def generate(prompt, path, on_delta=None):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        if path != "index.html":
+            both_running.wait()
+        with lock:
+            in_flight[0] -= 1
+        return f"// {path}"
+
+    monkeypatch.setattr(orchestrator, "generate_file", generate)
+    updates = [json.loads(u) for u in orchestrator.run_pipeline_streaming("Build a landing web page")]
+
+    result = updates[-1]["data"]
+    planned = [f["path"] for f in result["plan"]["files"]]
+    assert result["code_files"][:len(planned)] == planned
+    assert peak[0] == 2
+
+
+def test_dependents_get_dependency_context(monkeypatch):
+    """Files only start once their dependencies exist, and see their code."""
+    from agent import orchestrator
+
+    prompts = {}
+
+    def record_generate(prompt, path, on_delta=None):
+        prompts[path] = prompt
+        return f"/* generated {path} */"
+
+    monkeypatch.setattr(orchestrator, "generate_file", record_generate)
+    list(orchestrator.run_pipeline_streaming("Build a landing web page"))
+
+    assert "/* generated styles.css */" in prompts["index.html"]
+    assert "/* generated main.js */" in prompts["index.html"]
+    assert "DEPENDENCIES" not in prompts["styles.css"]
+
+
+def test_post_coding_stages_match_sequential(monkeypatch):
+    """CI/CD and Dockerfile see the same file lists as the old sequential phases."""
+    from agent import orchestrator
+
+    seen = {}
+    real_cicd, real_docker = orchestrator.generate_cicd_pipeline, orchestrator.generate_dockerfile
+
+    def cicd(project_type, files):
+        seen["cicd"] = list(files)
+        return real_cicd(project_type, files)
+
+    def docker(project_type, files):
+        seen["docker"] = list(files)
+        return real_docker(project_type, files)
+
+    monkeypatch.setattr(orchestrator, "generate_cicd_pipeline", cicd)
+    monkeypatch.setattr(orchestrator, "generate_dockerfile", docker)
+    result = orchestrator.run_pipeline("Build a landing web page")
+
+    sources = [f["path"] for f in result["plan"]["files"]]
+    assert seen["cicd"] == sources + [result["extras"]["tests"]]
+    assert seen["docker"] == seen["cicd"] + [result["extras"]["cicd"]]
+    assert result["code_files"] == seen["docker"] + ["Dockerfile"]
+
+
+def test_code_streams_as_code_delta_events(monkeypatch):
+    """Streamed completions reach the client before the file is finished."""
+    import time
+    import json
+    from agent import orchestrator
+
+    def streaming_generate(prompt, path, on_delta=None):
+        for part in ("line 1\n", "line 2\n"):
+            on_delta(part)
+            time.sleep(0.15)
+        return "line 1\nline 2"
+
+    monkeypatch.setattr(orchestrator, "generate_file", streaming_generate)
+    updates = [json.loads(u) for u in orchestrator.run_pipeline_streaming("Build a landing web page")]
+
+    steps = [(u["step"], u["data"].get("file")) for u in updates]
+    streamed = "".join(u["data"]["delta"] for u in updates if u["step"] == "code_delta" and u["data"]["file"] == "styles.css")
+    assert streamed == "line 1\nline 2\n"
+    assert steps.index(("code_delta", "styles.css")) < steps.index(("coding", "styles.css"))
+
+
+def test_file_lists_have_no_duplicates(monkeypatch):
+    """A planned test or workflow file is listed once for CI/CD and Dockerfile."""
+    from agent import orchestrator
+
+    seen = {}
+    plan = {"files": [
+        {"path": "main.py", "description": "Main", "language": "Python"},
+        {"path": "test_main.py", "description": "Tests", "language": "Python"},
+        {"path": ".github/workflows/main.yml", "description": "CI", "language": "YAML"},
+    ], "tech_stack": ["Python"]}
+
+    def cicd(project_type, files):
+        seen["cicd"] = list(files)
+        return {"path": ".github/workflows/main.yml", "content": "ci"}
+
+    def docker(project_type, files):
+        seen["docker"] = list(files)
+        return {"path": "Dockerfile", "content": "docker"}
+
+    monkeypatch.setattr(orchestrator, "generate_plan", lambda idea: plan)
+    monkeypatch.setattr(orchestrator, "generate_cicd_pipeline", cicd)
+    monkeypatch.setattr(orchestrator, "generate_dockerfile", docker)
+    orchestrator.run_pipeline("Create a simple calculator")
+
+    assert seen["cicd"] == ["main.py", "test_main.py", ".github/workflows/main.yml"]
+    assert seen["docker"] == seen["cicd"]
+
+
+def test_empty_stage_does_not_reissue_calls(monkeypatch):
+    """Empty tests don't make CI/CD and Dockerfile run a second time."""
+    from agent import orchestrator
+
+    calls = []
+    real_cicd, real_docker = orchestrator.generate_cicd_pipeline, orchestrator.generate_dockerfile
+
+    def cicd(project_type, files):
+        calls.append("cicd")
+        return real_cicd(project_type, files)
+
+    def docker(project_type, files):
+        calls.append("docker")
+        return real_docker(project_type, files)
+
+    monkeypatch.setattr(orchestrator, "generate_unit_tests", lambda code, path: {"path": "test_main.py", "content": ""})
+    monkeypatch.setattr(orchestrator, "generate_cicd_pipeline", cicd)
+    monkeypatch.setattr(orchestrator, "generate_dockerfile", docker)
+    result = orchestrator.run_pipeline("Create a simple calculator")
+
+    assert sorted(calls) == ["cicd", "docker"]
+    assert "test_main.py" not in result["code_files"]
+
+
+def test_restarted_stream_sends_reset(monkeypatch):
+    """A retried stream tells the client to drop the text it already got."""
+    import json
+    from agent import orchestrator
+
+    def retried_generate(prompt, path, on_delta=None):
+        on_delta("stale")
+        on_delta(None)
+        on_delta("fresh")
+        return "fresh"
+
+    monkeypatch.setattr(orchestrator, "generate_file", retried_generate)
+    updates = [json.loads(u) for u in orchestrator.run_pipeline_streaming("Create a simple calculator")]
+
+    streamed = [u["data"] for u in updates if u["step"] == "code_delta"]
+    text = ""
+    for data in streamed:
+        text = ("" if data.get("reset") else text) + data["delta"]
+    assert text == "fresh"
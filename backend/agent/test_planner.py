@@ -14,3 +14,33 @@ if "phases" in plan:
     print("SUCCESS: Plan has 'phases'")
 else:
     print("FAILURE: Plan missing 'phases'")
+
+
+def test_infer_dependencies():
+    from agent.planner import infer_dependencies
+    files = infer_dependencies([
+        {"path": "index.html"}, {"path": "styles.css"}, {"path": "main.js"},
+        {"path": "app.py"}, {"path": "routes.py", "description": "API routes over the models"},
+        {"path": "models.py", "depends_on": ["app.py"]}, {"path": "utils.py"},
+        {"path": "config.py", "depends_on": []},
+    ])
+    deps = {f["path"]: f["depends_on"] for f in files}
+    assert deps["index.html"] == ["styles.css", "main.js"]
+    assert deps["styles.css"] == []
+    assert deps["app.py"] == ["routes.py", "models.py", "utils.py", "config.py"]
+    # Only what the description names, so unrelated modules stay parallel
+    assert deps["routes.py"] == ["models.py"]
+    assert deps["utils.py"] == []
+    # models.py -> app.py would close a cycle, so it is dropped
+    assert deps["models.py"] == []
+
+
+def test_declared_empty_dependencies_are_kept():
+    from agent.planner import infer_dependencies
+    files = infer_dependencies([
+        {"path": "main.py", "depends_on": []},
+        {"path": "api.py", "description": "Endpoints"},
+        {"path": "db.py", "description": "Database access"},
+    ])
+    deps = {f["path"]: f["depends_on"] for f in files}
+    assert deps == {"main.py": [], "api.py": [], "db.py": []}
@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from agent.cancellation import BuildCancelled, BuildContext, DeadlineExceeded, build_context
+from agent.ratelimit import ProviderLimiter, parse_retry_after, is_rate_limit_error
+
+
+class FakeResponse:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, message, headers=None):
+        super().__init__(message)
+        self.response = FakeResponse(headers or {})
+
+
+def test_parse_retry_after_hints():
+    assert parse_retry_after(FakeRateLimitError("slow down", {"retry-after": "3"})) == 3.0
+    assert parse_retry_after(FakeRateLimitError("Please try again in 1m2.5s.")) == 62.5
+    assert parse_retry_after(FakeRateLimitError("Please try again in 250ms")) == 0.25
+    assert parse_retry_after(Exception("429 retry_delay { seconds: 30 }")) == 30.0
+    assert parse_retry_after(Exception("boom")) is None
+    assert is_rate_limit_error(FakeRateLimitError("x"))
+    assert not is_rate_limit_error(Exception("connection reset"))
+
+
+def test_requests_queue_instead_of_failing():
+    limiter = ProviderLimiter("test", rpm=600, tpm=1_000_000)
+    limiter._requests = 1  # one request left in the bucket
+
+    assert limiter.acquire(10) == 0.0
+    waited = limiter.acquire(10)  # refills at 10 req/s
+    assert 0.05 < waited < 0.5
+    assert limiter.stats()["queued"] == 1
+    assert limiter.stats()["queue_depth"] == 0
+
+
+def test_retry_after_blocks_calls():
+    limiter = ProviderLimiter("test", rpm=6000, tpm=1_000_000)
+    limiter.penalize(0.2)
+    start = time.monotonic()
+    limiter.acquire(10)
+    assert time.monotonic() - start >= 0.15
+    assert limiter.stats()["retry_after_hits"] == 1
+
+
+def test_queued_call_stops_on_cancel_and_deadline():
+    limiter = ProviderLimiter("test", rpm=6000, tpm=1_000_000)
+    limiter.penalize(30)
+
+    context = BuildContext("job-1")
+    threading.Timer(0.1, context.cancel).start()
+    start = time.monotonic()
+    with build_context(context), pytest.raises(BuildCancelled):
+        limiter.acquire(10)
+    assert time.monotonic() - start < 1
+
+    start = time.monotonic()
+    with build_context(BuildContext(deadline=0.1)), pytest.raises(DeadlineExceeded):
+        limiter.acquire(10)
+    assert time.monotonic() - start < 1
+    assert limiter.stats()["queue_depth"] == 0
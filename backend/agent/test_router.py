@@ -0,0 +1,68 @@
+import time
+
+from agent import agent
+from agent.router import Router, ROUTER_MIN_SAMPLES
+
+
+def test_routes_to_fastest_healthy_provider(monkeypatch):
+    monkeypatch.setattr("agent.router.ROUTER_EXPLORE", 0.0)
+    router = Router(["groq", "gemini"])
+    for _ in range(ROUTER_MIN_SAMPLES):
+        router.record("groq", "code", 2.0, True)
+        router.record("gemini", "code", 0.5, True)
+        router.record("groq", "plan", 0.3, True)
+        router.record("gemini", "plan", 0.1, False)
+
+    assert router.route("code")[0] == "gemini"
+    # gemini is faster at planning but failing, so it goes last
+    assert router.route("plan") == ["groq", "gemini"]
+
+
+def test_unhealthy_provider_recovers(monkeypatch):
+    monkeypatch.setattr("agent.router.ROUTER_EXPLORE", 0.0)
+    monkeypatch.setattr("agent.router.ROUTER_SAMPLE_TTL", 0.1)
+    router = Router(["gemini", "groq"])
+    for _ in range(ROUTER_MIN_SAMPLES):
+        router.record("gemini", "code", 0.1, False)
+        router.record("groq", "code", 1.0, True)
+    assert router.route("code") == ["groq", "gemini"]
+
+    # Its failures age out, so it's cold again and gets measured first
+    time.sleep(0.15)
+    for _ in range(ROUTER_MIN_SAMPLES):
+        router.record("groq", "code", 1.0, True)
+    assert router.route("code")[0] == "gemini"
+    for _ in range(ROUTER_MIN_SAMPLES):
+        router.record("gemini", "code", 0.1, True)
+    assert router.route("code") == ["gemini", "groq"]
+
+
+def test_exploration_probes_unhealthy_providers(monkeypatch):
+    monkeypatch.setattr("agent.router.ROUTER_EXPLORE", 1.0)
+    router = Router(["groq", "gemini"])
+    for _ in range(ROUTER_MIN_SAMPLES):
+        router.record("gemini", "code", 0.1, False)
+        router.record("groq", "code", 1.0, True)
+    assert router.route("code") == ["gemini", "groq"]
+    assert router.counters["explored"] == 1
+
+
+def test_hedged_request_returns_first_good_answer(monkeypatch):
+    def slow(idea, mode, on_delta=None):
+        time.sleep(0.5)
+        return {"response": "slow"}
+
+    def fast(idea, mode, on_delta=None):
+        return {"response": "fast"}
+
+    router = Router(["groq", "gemini"])
+    for _ in range(ROUTER_MIN_SAMPLES):
+        router.record("groq", "optimize", 0.05, True)
+    monkeypatch.setattr(agent, "router", router)
+    monkeypatch.setattr(agent, "PROVIDER_CALLS", {"groq": slow, "gemini": fast})
+
+    start = time.monotonic()
+    provider, result = agent._routed_call(["groq", "gemini"], "idea", "optimize")
+    assert (provider, result) == ("gemini", {"response": "fast"})
+    assert time.monotonic() - start < 0.4
+    assert router.counters["hedge_wins"] == 1
@@ -0,0 +1,16 @@
+from agent.scheduler import run_dag
+
+
+def test_dependencies_finish_first_and_see_results():
+    order = [key for key, _ in run_dag(["app", "lib", "util"], {"app": ["lib"], "lib": ["util"]},
+                                       lambda key, done: sorted(done), max_workers=3)]
+    assert order == ["util", "lib", "app"]
+
+
+def test_graph_that_is_all_cycle_still_runs():
+    results = dict(run_dag(["a", "b"], {"a": ["b"], "b": ["a"]}, lambda key, done: key))
+    assert results == {"a": "a", "b": "b"}
+
+    # A cycle behind a normal dependency runs once the dependency is done
+    results = dict(run_dag(["base", "x", "y"], {"x": ["base", "y"], "y": ["x"]}, lambda key, done: sorted(done)))
+    assert results["base"] == [] and set(results) == {"base", "x", "y"}
@@ -0,0 +1,40 @@
+from agent.search import InvertedIndex, tokenize
+
+
+def test_tokenize_normalizes_and_drops_stopwords():
+    assert tokenize("Build a To-Do app, with React!") == ["todo", "app", "react"]
+
+
+def test_index_ranks_rare_terms_and_survives_reload(tmp_path):
+    index = InvertedIndex(tmp_path / "index.jsonl")
+    index.add(1, "todo app with local storage")
+    index.add(2, "weather app")
+    index.add(3, "markdown editor app")
+
+    # "app" is everywhere, so the rare "todo" decides the ranking
+    assert index.search("build a todo app", k=2)[0][0] == 1
+    assert index.search("the a of", k=3) == []
+
+    # Another instance (e.g. another worker) reads the same postings
+    other = InvertedIndex(tmp_path / "index.jsonl")
+    assert other.count() == 3
+    index.add(4, "weather station dashboard")
+    assert [pid for pid, _ in other.search("weather dashboard", k=2)] == [4, 2]
+
+
+def test_bm25_numpy_and_python_paths_agree(tmp_path, monkeypatch):
+    from agent import search
+
+    ideas = ["todo app", "todo app with todo reminders and todo sharing", "weather app",
+             "chat server", "markdown todo notes editor with preview and export"]
+
+    def ranked():
+        index = InvertedIndex(tmp_path / "index.jsonl")
+        return [(pid, round(score, 6)) for pid, score in index.search("todo editor", k=5)]
+
+    InvertedIndex(tmp_path / "index.jsonl").rebuild(enumerate(ideas, start=1))
+    vectorized = ranked()
+    monkeypatch.setattr(search, "np", None)
+    assert ranked() == vectorized
+    # Matching both terms beats repeating one
+    assert vectorized[0][0] == 5
@@ -0,0 +1,42 @@
+import multiprocessing
+import threading
+
+from agent.storage import append_jsonl, get_lock_stats, iter_jsonl, read_json, update_json
+
+
+def _bump(path, times):
+    for _ in range(times):
+        update_json(path, {"count": 0}, lambda data: ({"count": data["count"] + 1}, None))
+
+
+def test_update_json_loses_no_writes_across_processes_and_threads(tmp_path):
+    path = tmp_path / "counter.json"
+    workers = [multiprocessing.Process(target=_bump, args=(path, 25)) for _ in range(3)]
+    workers += [threading.Thread(target=_bump, args=(path, 25)) for _ in range(3)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    assert read_json(path) == {"count": 150}
+    assert get_lock_stats()["acquired"] >= 75
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_append_jsonl_repairs_torn_tail(tmp_path):
+    path = tmp_path / "log.jsonl"
+    append_jsonl(path, {"n": 1})
+    with open(path, "ab") as f:
+        f.write(b'{"n": ')
+    append_jsonl(path, {"n": 2})
+    assert [r for _, _, r in iter_jsonl(path)] == [{"n": 1}, {"n": 2}]
+
+
+def test_update_json_keeps_a_corrupt_file(tmp_path):
+    path = tmp_path / "skills.json"
+    path.write_text('[{"name": "flask"}, {"na')
+
+    assert update_json(path, [], lambda data: (data + ["new"], len(data))) == 0
+    assert read_json(path) == ["new"]
+    corrupt = list(tmp_path.glob("skills.json.*.corrupt"))
+    assert len(corrupt) == 1 and corrupt[0].read_text() == '[{"name": "flask"}, {"na'
@@ -0,0 +1,52 @@
+import json
+import os
+import time
+
+import pytest
+
+from agent import orchestrator, workspace
+
+
+@pytest.fixture
+def root(isolated_storage):
+    workspace.WORKSPACE_ROOT.mkdir()
+    return workspace.WORKSPACE_ROOT
+
+
+def _age(path, seconds):
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+
+def test_concurrent_builds_get_separate_workspaces(root):
+    first = orchestrator.run_pipeline_streaming("Build a landing web page", job_id="job-a")
+    updates = [json.loads(next(first))]
+    # A second build starting mid-way must not touch the first one's files
+    second = orchestrator.run_pipeline("Build a landing web page", job_id="job-b")
+    updates += [json.loads(u) for u in first]
+
+    assert updates[0]["data"]["job_id"] == "job-a"
+    assert updates[-1]["data"]["job_id"] == "job-a"
+    assert second["job_id"] == "job-b"
+    for job_id, files in (("job-a", updates[-1]["data"]["code_files"]), ("job-b", second["code_files"])):
+        assert all((root / job_id / f).exists() for f in files)
+    assert workspace.latest_job_id() == "job-a"
+
+
+def test_cleanup_by_ttl_and_size(root):
+    for job_id, size, age in (("old", 10, 7200), ("big", 600, 1200), ("new", 600, 0)):
+        (root / job_id).mkdir()
+        (root / job_id / "main.py").write_bytes(b"x" * size)
+        _age(root / job_id, age)
+    workspace.open_workspace("running")
+    (root / "running" / "main.py").write_bytes(b"x" * 600)
+
+    stats = workspace.cleanup_workspaces(ttl=3600, max_bytes=1000)
+    # Expired first, then oldest over the cap; the running build and recent ones stay
+    assert sorted(stats["removed"]) == ["big", "old"]
+    assert (root / "new").exists() and (root / "running").exists()
+
+    workspace.close_workspace("running")
+    assert workspace.latest_job_id() == "running"
+    with pytest.raises(ValueError):
+        workspace.workspace_path("../storage")
@@ -0,0 +1,152 @@
+"""
+Workspaces - One output directory per build job.
+Each build writes to output/<job_id>/ instead of a shared output/ that the
+next build wipes, so concurrent builds can't clobber each other. Old
+workspaces expire after WORKSPACE_TTL and the oldest are evicted once the
+total passes WORKSPACE_MAX_MB.
+"""
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from .storage import atomic_write_text
+
+WORKSPACE_ROOT = Path(os.getenv("WORKSPACE_ROOT", "output"))
+WORKSPACE_TTL = float(os.getenv("WORKSPACE_TTL", "86400"))  # seconds since last write
+WORKSPACE_MAX_MB = float(os.getenv("WORKSPACE_MAX_MB", "500"))
+# Never evicted for size before this age, so other workers' running builds survive
+WORKSPACE_MIN_AGE = float(os.getenv("WORKSPACE_MIN_AGE", "600"))
+
+LATEST_FILE = "LATEST"
+_JOB_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+_active = set()
+_active_lock = threading.Lock()
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+def workspace_path(job_id: str) -> Path:
+    """Directory for a job; raises ValueError for ids that could escape the root."""
+    if not isinstance(job_id, str) or not _JOB_ID.match(job_id):
+        raise ValueError(f"Invalid job id: {job_id!r}")
+    return WORKSPACE_ROOT / job_id
+
+def open_workspace(job_id: str) -> Path:
+    """Create a fresh workspace for a starting build (and expire old ones)."""
+    path = workspace_path(job_id)
+    with _active_lock:
+        _active.add(job_id)
+    try:
+        cleanup_workspaces()
+    except Exception as e:
+        print(f"⚠️ Workspace cleanup failed: {e}")
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def close_workspace(job_id: str, completed: bool = True):
+    """Build finished: the workspace becomes eligible for cleanup, and /export's default if it completed."""
+    with _active_lock:
+        _active.discard(job_id)
+    path = workspace_path(job_id)
+    if not path.is_dir():
+        return
+    os.utime(path)
+    if completed:
+        atomic_write_text(WORKSPACE_ROOT / LATEST_FILE, job_id, fsync=False)
+
+def is_active(job_id: str) -> bool:
+    with _active_lock:
+        return job_id in _active
+
+def latest_job_id():
+    """Most recently completed job that still has a workspace, or None."""
+    try:
+        job_id = (WORKSPACE_ROOT / LATEST_FILE).read_text().strip()
+        return job_id if workspace_path(job_id).is_dir() else None
+    except (OSError, ValueError):
+        return None
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def _workspaces():
+    """(job_id, path, mtime, size) for every workspace that isn't building in this process."""
+    try:
+        entries = list(os.scandir(WORKSPACE_ROOT))
+    except OSError:
+        return []
+    with _active_lock:
+        active = set(_active)
+    found = []
+    for entry in entries:
+        if not entry.is_dir(follow_symlinks=False) or entry.name in active or not _JOB_ID.match(entry.name):
+            continue
+        try:
+            mtime = entry.stat().st_mtime
+        except OSError:
+            continue
+        found.append((entry.name, Path(entry.path), mtime, _dir_size(entry.path)))
+    return found
+
+def cleanup_workspaces(ttl: float = None, max_bytes: int = None) -> dict:
+    """Remove expired workspaces, then the oldest ones until the total fits max_bytes."""
+    ttl = WORKSPACE_TTL if ttl is None else ttl
+    max_bytes = int(WORKSPACE_MAX_MB * 1024 * 1024) if max_bytes is None else max_bytes
+    now = time.time()
+    workspaces = sorted(_workspaces(), key=lambda w: w[2])
+    removed, freed = [], 0
+
+    def remove(job_id, path, size):
+        nonlocal freed
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(job_id)
+        freed += size
+
+    kept = []
+    for job_id, path, mtime, size in workspaces:
+        if now - mtime > ttl:
+            remove(job_id, path, size)
+        else:
+            kept.append((job_id, path, mtime, size))
+    total = sum(w[3] for w in kept)
+    for job_id, path, mtime, size in kept:
+        if total <= max_bytes:
+            break
+        if now - mtime < WORKSPACE_MIN_AGE:
+            continue
+        remove(job_id, path, size)
+        total -= size
+    return {"removed": removed, "bytes_freed": freed}
+
+def reset_workspaces() -> list:
+    """Delete every workspace not currently building here (for /reset)."""
+    removed = cleanup_workspaces(ttl=-1)["removed"]
+    try:
+        (WORKSPACE_ROOT / LATEST_FILE).unlink()
+    except OSError:
+        pass
+    return removed
+
+def workspace_stats() -> dict:
+    workspaces = _workspaces()
+    with _active_lock:
+        active = len(_active)
+    return {
+        "workspaces": len(workspaces) + active,
+        "building": active,
+        "bytes": sum(w[3] for w in workspaces),
+        "max_bytes": int(WORKSPACE_MAX_MB * 1024 * 1024),
+        "ttl_seconds": WORKSPACE_TTL,
+    }
@@ -1,11 +1,14 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from agent.orchestrator import run_pipeline, run_pipeline_streaming
+from agent.orchestrator import run_pipeline
 
+import asyncio
 import shutil
 import os
+import time
 
 # -------------------------------
 # MODELS
@@ -28,6 +31,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -37,8 +41,8 @@ class OptimizeRequest(BaseModel):
 @app.post("/optimize")
 async def optimize_prompt(req: OptimizeRequest):
     """Optimize the user's prompt using AI."""
-    from agent.agent import run_agent
-    result = run_agent(req.idea, mode="optimize")
+    from agent.agent import run_agent_async
+    result = await run_agent_async(req.idea, mode="optimize")
     return {"optimized_prompt": result.get("response", req.idea)}
 
 @app.on_event("startup")
@@ -56,13 +60,33 @@ async def startup_event():
     print(f"⚠️ MOCK_MODE: {mock}")
     print("="*50 + "\n")
 
+    from agent.memory import MEMORY_COMPACT_INTERVAL
+    if MEMORY_COMPACT_INTERVAL > 0:
+        asyncio.create_task(memory_compaction_loop(MEMORY_COMPACT_INTERVAL))
+
+async def memory_compaction_loop(interval: float):
+    """Periodically apply the memory retention policy in the background."""
+    from agent.memory import compact_memory
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            stats = await run_in_threadpool(compact_memory)
+            print(f"🧹 Memory compaction: {stats}")
+        except Exception as e:
+            print(f"⚠️ Memory compaction failed: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    from agent.intelligence import flush_stats
+    flush_stats()
+
 # -------------------------------
 # ROUTES
 # -------------------------------
 
 @app.get("/")
 async def root():
-    return {"status": "Autogenesis Backend Running", "endpoints": ["/run", "/run-stream", "/export", "/templates", "/ping"]}
+    return {"status": "Autogenesis Backend Running", "endpoints": ["/run", "/run-stream", "/jobs", "/export", "/export/{job_id}", "/templates", "/ping"]}
 
 @app.get("/templates")
 async def get_templates():
@@ -71,47 +95,224 @@ async def get_templates():
     return get_templates()
 
 @app.get("/memory")
-async def get_memory():
-    """Get project history for Memory View."""
-    from agent.memory import get_memory_history
-    return get_memory_history()
+async def get_memory(response: Response, limit: int = 20, cursor: int = None, language: str = None,
+                     since: str = None, until: str = None, min_score: int = None, fields: str = None):
+    """
+    Get one page of project history for Memory View (newest first).
+    Pass the X-Next-Cursor response header back as ?cursor= for the next page.
+    """
+    from agent.memory import query_memory
+    try:
+        rows, next_cursor = await run_in_threadpool(
+            query_memory, max(1, min(limit, 100)), cursor, language, since, until, min_score,
+            [f.strip() for f in fields.split(",") if f.strip()] if fields else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return rows
+
+@app.get("/memory/{project_id}")
+async def get_memory_project(project_id: int):
+    """Get one stored project including its generated code."""
+    from agent.memory import get_project
+    project = await run_in_threadpool(get_project, project_id)
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project
+
+@app.get("/memory/{project_id}/export")
+async def export_memory_project(project_id: int, format: str = "zip"):
+    """Streams a stored project's code as an archive, e.g. after its workspace expired."""
+    from agent.memory import get_project
+    from agent.export import memory_entries
+    project = await run_in_threadpool(get_project, project_id)
+    if project is None or not project.get("all_code"):
+        raise HTTPException(status_code=404, detail="Project not found")
+    return archive_response(memory_entries(project["all_code"]), format, f"autogenesis_project_{project_id}")
+
+async def cancel_on_disconnect(request: Request, context):
+    """Cancel context's build as soon as the client of request goes away."""
+    from agent.jobs import JOB_POLL_INTERVAL
+    while not context.cancelled:
+        if await request.is_disconnected():
+            context.cancel("Client disconnected")
+            return
+        await asyncio.sleep(JOB_POLL_INTERVAL)
 
 @app.post("/run")
-async def run(prompt: Prompt):
-    """Standard endpoint - returns final result only."""
-    result = run_pipeline(prompt.idea, improve_mode=prompt.improve)
+async def run(prompt: Prompt, request: Request):
+    """
+    Standard endpoint - returns final result only.
+    A client that disconnects cancels the build, so no more provider calls are paid for.
+    """
+    from agent.cancellation import BuildCancelled, BuildContext, DeadlineExceeded, build_context
+
+    context = BuildContext()
+
+    def build():
+        with build_context(context):
+            return run_pipeline(prompt.idea, improve_mode=prompt.improve)
+
+    watcher = asyncio.create_task(cancel_on_disconnect(request, context))
+    # The pipeline fans out over its own worker threads; keep it off the event loop
+    try:
+        result = await run_in_threadpool(build)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=408, detail=str(e))
+    except BuildCancelled as e:
+        raise HTTPException(status_code=499, detail=str(e) or "Build cancelled")
+    finally:
+        watcher.cancel()
     return {"result": result}
 
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no"
+}
+
+_background_tasks = set()
+
+async def cancel_when_abandoned(job_id: str):
+    """Cancel a streamed build if its client hasn't come back within the grace period."""
+    from agent.jobs import job_manager, JOB_DISCONNECT_GRACE
+    await asyncio.sleep(JOB_DISCONNECT_GRACE)
+    if await run_in_threadpool(job_manager.cancel_if_abandoned, job_id):
+        print(f"⚠️ Cancelled job {job_id}: client disconnected")
+
+async def job_event_stream(job_id: str, next_seq: int, cancel_on_disconnect: bool = False):
+    """
+    SSE frames for a job's events from next_seq on, with heartbeats, until the job finishes.
+    With cancel_on_disconnect, a client leaving early cancels the job unless it reattaches in time.
+    """
+    from agent.jobs import job_manager, event_id, FINISHED, JOB_POLL_INTERVAL, JOB_HEARTBEAT
+    job_manager.attach(job_id)
+    ended = False
+    try:
+        last_sent = time.monotonic()
+        while True:
+            events = await run_in_threadpool(job_manager.events, job_id, next_seq)
+            for seq, event in events:
+                yield f"id: {event_id(job_id, seq)}\ndata: {event}\n\n"
+                next_seq = seq + 1
+            if events:
+                last_sent = time.monotonic()
+                continue
+            job = await run_in_threadpool(job_manager.get, job_id)
+            if job is None or (job["status"] in FINISHED and next_seq >= job["events"]):
+                ended = True
+                return
+            if time.monotonic() - last_sent >= JOB_HEARTBEAT:
+                # Comment line: keeps proxies from closing an idle stream, ignored by clients
+                yield ": heartbeat\n\n"
+                last_sent = time.monotonic()
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+    finally:
+        if job_manager.detach(job_id) == 0 and cancel_on_disconnect and not ended:
+            task = asyncio.get_running_loop().create_task(cancel_when_abandoned(job_id))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+
 @app.post("/run-stream")
-async def run_stream(prompt: Prompt):
-    """SSE streaming endpoint - yields progress updates."""
-    def generate():
-        for update in run_pipeline_streaming(prompt.idea, improve_mode=prompt.improve):
-            yield f"data: {update}\n\n"
-    
+async def run_stream(prompt: Prompt, last_event_id: str = Header(None)):
+    """
+    SSE streaming endpoint - yields progress updates.
+    The build runs as a background job, so a dropped connection doesn't stop it:
+    send the last seen event id back as Last-Event-ID to resume instead of rebuilding.
+    If nobody reattaches within JOB_DISCONNECT_GRACE seconds, the build is cancelled.
+    """
+    from agent.jobs import job_manager, parse_event_id, JobQueueFull
+    job_id, next_seq = parse_event_id(last_event_id)
+    if job_id is not None:
+        if await run_in_threadpool(job_manager.get, job_id) is None:
+            raise HTTPException(status_code=404, detail="Job not found or expired")
+    else:
+        try:
+            job = await run_in_threadpool(job_manager.submit, prompt.idea, prompt.improve)
+        except JobQueueFull:
+            raise HTTPException(status_code=503, detail="Build queue is full, try again shortly",
+                                headers={"Retry-After": "30"})
+        job_id, next_seq = job["id"], 0
+
+    return StreamingResponse(job_event_stream(job_id, next_seq, cancel_on_disconnect=True),
+                             media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/jobs", status_code=202)
+async def submit_job(prompt: Prompt):
+    """Queue a build and return its job id immediately."""
+    from agent.jobs import job_manager, job_view, JobQueueFull
+    try:
+        job = await run_in_threadpool(job_manager.submit, prompt.idea, prompt.improve)
+    except JobQueueFull:
+        raise HTTPException(status_code=503, detail="Build queue is full, try again shortly",
+                            headers={"Retry-After": "30"})
+    return job_view(job)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Poll a job's status, progress and (once done) result."""
+    from agent.jobs import job_manager, job_view
+    job = await run_in_threadpool(job_manager.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_view(job)
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running build; in-flight provider calls stop at their next check."""
+    from agent.jobs import job_manager, job_view
+    job = await run_in_threadpool(job_manager.cancel, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_view(job)
+
+@app.get("/jobs/{job_id}/events")
+async def get_job_events(job_id: str, offset: int = 0, last_event_id: str = Header(None)):
+    """SSE replay of a job's progress events from ?offset= (or after Last-Event-ID), following until the job finishes."""
+    from agent.jobs import job_manager, parse_event_id
+    if await run_in_threadpool(job_manager.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if last_event_id:
+        offset = parse_event_id(last_event_id)[1]
+    return StreamingResponse(job_event_stream(job_id, max(offset, 0)), media_type="text/event-stream", headers=SSE_HEADERS)
+
+def archive_response(entries, fmt: str, name: str):
+    """Stream an archive of entries; the sync generator runs in the threadpool, off the event loop."""
+    from agent.export import iter_archive, FORMATS
+    try:
+        chunks = iter_archive(entries, fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return StreamingResponse(
-        generate(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
+        chunks,
+        media_type=FORMATS[fmt]["media_type"],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{FORMATS[fmt]["extension"]}"'}
     )
 
 @app.get("/export")
-async def export_project():
-    """Zips the output directory and returns it."""
-    output_dir = "output"
-    if not os.path.exists(output_dir):
+async def export_project(format: str = "zip"):
+    """Archives the most recently completed build (?format=zip or tar.gz)."""
+    from agent.workspace import latest_job_id
+    job_id = latest_job_id()
+    if job_id is None:
         return {"error": "No project generated yet."}
-
-    shutil.make_archive("project", 'zip', output_dir)
-    return FileResponse(
-        "project.zip",
-        media_type="application/zip",
-        filename="autogenesis_project.zip"
-    )
+    return await export_job(job_id, format)
+
+@app.get("/export/{job_id}")
+async def export_job(job_id: str, format: str = "zip"):
+    """Streams one build's workspace as an archive (?format=zip or tar.gz)."""
+    from agent.workspace import workspace_path, is_active
+    from agent.export import workspace_entries
+    try:
+        path = workspace_path(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not path.is_dir():
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    if is_active(job_id):
+        raise HTTPException(status_code=409, detail="Job is still building")
+    return archive_response(workspace_entries(path), format, f"autogenesis_{job_id}")
 
 @app.get("/ping")
 async def ping():
@@ -123,6 +324,12 @@ async def get_intel():
     from agent.intelligence import get_intelligence
     return get_intelligence()
 
+@app.get("/intelligence/history")
+async def get_intel_history(days: int = 30):
+    """XP earned per day, oldest first."""
+    from agent.intelligence import get_xp_by_day
+    return get_xp_by_day(max(1, min(days, 365)))
+
 @app.get("/skills")
 async def get_skills():
     """Get skill tree data."""
@@ -138,16 +345,32 @@ class FixRequest(BaseModel):
 @app.post("/fix")
 async def auto_fix(req: FixRequest):
     """Auto-fix code based on error."""
-    from agent.capabilities import auto_fix_code
-    result = auto_fix_code(req.code, req.error)
+    from agent.capabilities import auto_fix_code_async
+    result = await auto_fix_code_async(req.code, req.error)
     return result
 
 @app.get("/status")
 async def get_status():
     """Get API status including rate limit state."""
-    from agent.agent import is_rate_limited, USE_GROQ, USE_GEMINI, MOCK_MODE
+    from agent.agent import is_rate_limited, get_circuit_states, USE_GROQ, USE_GEMINI, MOCK_MODE, router
+    from agent.cache import response_cache
+    from agent.coalesce import single_flight
+    from agent.ratelimit import get_rate_limit_stats
+    from agent.blobs import blob_store
+    from agent.storage import get_lock_stats
+    from agent.workspace import workspace_stats
+    from agent.jobs import job_manager
     return {
         "rate_limited": is_rate_limited(),
+        "circuits": get_circuit_states(),
+        "cache": response_cache.stats(),
+        "coalescing": single_flight.stats(),
+        "rate_limits": get_rate_limit_stats(),
+        "routing": router.stats(),
+        "blobs": blob_store.stats(),
+        "storage_locks": get_lock_stats(),
+        "workspaces": workspace_stats(),
+        "jobs": job_manager.stats(),
         "provider": "groq" if USE_GROQ else "gemini" if USE_GEMINI else "mock",
         "mock_mode": MOCK_MODE,
         "env_check": {
@@ -174,7 +397,7 @@ class ExplainRequest(BaseModel):
 @app.post("/explain")
 async def explain_code(req: ExplainRequest):
     """Get AI explanation of code."""
-    from agent.agent import run_agent
+    from agent.agent import run_agent_async
     prompt = f"""Explain this {req.language} code line by line in simple terms.
 Be concise. Format as a list of explanations.
 
@@ -183,7 +406,7 @@ CODE:
 
 Return JSON: {{"explanations": [{{"line": 1, "code": "...", "explanation": "..."}}]}}"""
     
-    result = run_agent(prompt, mode="review")
+    result = await run_agent_async(prompt, mode="review")
     
     # Parse or fallback
     if "explanations" in result:
@@ -213,21 +436,37 @@ async def reset_demo():
     # Files to delete
     params = [
         "storage/memory.json",
-        "storage/intelligence.json"
+        "storage/memory.jsonl",
+        "storage/memory.db",
+        "storage/memory.db-wal",
+        "storage/memory.db-shm",
+        "storage/memory_index.jsonl",
+        "storage/blobs",
+        "storage/memory_cold",
+        "storage/intelligence.json",
+        "storage/intelligence_events.jsonl",
+        "storage/intelligence_snapshot.json"
     ]
     
     for p in params:
         try:
-            if os.path.exists(p):
+            if os.path.isdir(p):
+                shutil.rmtree(p)
+                deleted.append(p + "/")
+            elif os.path.exists(p):
                 os.remove(p)
                 deleted.append(p)
         except Exception as e:
             return {"error": f"Failed to delete {p}: {str(e)}"}
             
-    # Also clear output folder
-    if os.path.exists("output"):
-        shutil.rmtree("output")
-        deleted.append("output/")
+    from agent.memory import reset_store
+    from agent.intelligence import ledger
+    reset_store()
+    ledger.discard()
+
+    # Also clear finished build workspaces (running builds keep theirs)
+    from agent.workspace import reset_workspaces, WORKSPACE_ROOT
+    deleted.extend(f"{WORKSPACE_ROOT}/{job_id}/" for job_id in reset_workspaces())
 
     return {
         "success": True, 
@@ -13,6 +13,8 @@ import json
 import os
 from pathlib import Path
 
+from agent.storage import update_json
+
 # Storage paths
 FEEDBACK_FILE = Path("storage/feedback.json")
 CHECKPOINTS_DIR = Path("storage/oumi_checkpoints")
@@ -22,22 +24,18 @@ def collect_feedback(code: str, rating: int, idea: str):
     Collect user feedback on generated code.
     Rating: 1-5 stars
     """
-    FEEDBACK_FILE.parent.mkdir(exist_ok=True)
-    
-    feedback = []
-    if FEEDBACK_FILE.exists():
-        feedback = json.loads(FEEDBACK_FILE.read_text())
-    
-    feedback.append({
-        "idea": idea,
-        "code": code[:1000],  # Truncate for storage
-        "rating": rating,
-        "is_positive": rating >= 4
-    })
-    
-    FEEDBACK_FILE.write_text(json.dumps(feedback, indent=2))
+    def append(feedback):
+        feedback.append({
+            "idea": idea,
+            "code": code[:1000],  # Truncate for storage
+            "rating": rating,
+            "is_positive": rating >= 4
+        })
+        return feedback, len(feedback)
+
+    count = update_json(FEEDBACK_FILE, [], append)
     print(f"✅ Feedback collected: {rating}/5 stars")
-    return len(feedback)
+    return count
 
 def prepare_rl_dataset():
     """
@@ -45,7 +45,7 @@ def main():
         
         try:
             from agent.orchestrator import run_pipeline
-            result = run_pipeline(args.idea)
+            result = run_pipeline(args.idea, output_dir=args.output)
             
             print(f"\n✅ Generated {len(result['code_files'])} files:")
             for f in result['code_files']:
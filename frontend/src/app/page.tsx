@@ -69,6 +69,7 @@ interface AgentResult {
   intelligence?: Intelligence;
   learned_from: boolean;
   extras?: { tests: string; cicd: string; dockerfile: string };
+  job_id?: string;
 }
 
 interface Template {
@@ -91,10 +92,18 @@ interface MemoryProject {
   timestamp: string;
 }
 
+// POST /run-stream answered 503: the build queue is full
+class QueueFullError extends Error {
+  constructor(public retryAfter: number) { super("Build queue is full"); }
+}
+
 export default function Home() {
   const [idea, setIdea] = useState("");
   const [loading, setLoading] = useState(false);
   const [progress, setProgress] = useState<ProgressUpdate | null>(null);
+  const [busy, setBusy] = useState("");
+  const [streamingCode, setStreamingCode] = useState<Record<string, string>>({});
+  const [streamingFile, setStreamingFile] = useState("");
   const [result, setResult] = useState<AgentResult | null>(null);
   const [selectedFile, setSelectedFile] = useState<string>("");
   const [intelligence, setIntelligence] = useState<Intelligence | null>(null);
@@ -112,6 +121,7 @@ export default function Home() {
   const [isFullScreen, setIsFullScreen] = useState(false);
   const [explanations, setExplanations] = useState<{ line: number; code: string; explanation: string }[]>([]);
   const abortRef = useRef<AbortController | null>(null);
+  const jobIdRef = useRef("");
 
   const API_URL = process.env.NODE_ENV === "production"
     ? "https://autogenesis-ui7w.onrender.com"
@@ -211,36 +221,80 @@ export default function Home() {
   const run = async (improve: boolean = false) => {
     const targetIdea = improve && result?.idea ? result.idea : idea;
     if (!targetIdea.trim()) return;
-    setLoading(true); setProgress(null); setResult(null); setSelectedFile("");
+    setLoading(true); setProgress(null); setResult(null); setSelectedFile(""); setBusy("");
+    setStreamingCode({}); setStreamingFile("");
     abortRef.current = new AbortController();
+    jobIdRef.current = "";
+    const signal = abortRef.current.signal;
+    let lastEventId = "";
+    let finished = false;
+    const handle = (u: ProgressUpdate) => {
+      if (u.step === "code_delta") {
+        // Code streams in token by token; show it as it arrives (reset: a retry restarted the file)
+        setStreamingCode(prev => ({ ...prev, [u.data.file]: (u.data.reset ? "" : prev[u.data.file] || "") + u.data.delta }));
+        setStreamingFile(u.data.file);
+        return;
+      }
+      if (u.step === "coding" && typeof u.data?.code === "string") {
+        setStreamingCode(prev => ({ ...prev, [u.data.file]: u.data.code }));
+      }
+      setProgress(u);
+      if (u.data?.intelligence) setIntelligence(u.data.intelligence);
+      if (u.step === "error" || u.step === "cancelled") finished = true;
+      if (u.step === "complete" && u.data) {
+        const d = u.data as AgentResult;
+        finished = true;
+        setResult(d);
+        if (d.code_files?.length) setSelectedFile(d.code_files[0]);
+        if (d.intelligence) setIntelligence(d.intelligence);
+        refreshData();
+      }
+    };
     try {
-      const res = await fetch(`${API_URL}/run-stream`, {
-        method: "POST", headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ idea: targetIdea, improve }), signal: abortRef.current.signal,
-      });
-      const reader = res.body?.getReader();
-      const dec = new TextDecoder();
-      while (reader) {
-        const { done, value } = await reader.read();
-        if (done) break;
-        for (const line of dec.decode(value).split("\n")) {
-          if (line.startsWith("data: ")) {
-            try {
-              const u: ProgressUpdate = JSON.parse(line.slice(6));
-              setProgress(u);
-              if (u.data?.intelligence) setIntelligence(u.data.intelligence);
-              if (u.step === "complete" && u.data) {
-                const d = u.data as AgentResult;
-                setResult(d);
-                if (d.code_files?.length) setSelectedFile(d.code_files[0]);
-                if (d.intelligence) setIntelligence(d.intelligence);
-                refreshData();
+      // The build runs server-side as a job: after a dropped connection, resume it from the last event id
+      for (let attempt = 0; !finished && attempt <= 5; attempt++) {
+        if (attempt > 0) await new Promise(r => setTimeout(r, 1000 * attempt));
+        try {
+          const res = await fetch(`${API_URL}/run-stream`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json", ...(lastEventId ? { "Last-Event-ID": lastEventId } : {}) },
+            body: JSON.stringify({ idea: targetIdea, improve }), signal,
+          });
+          if (res.status === 404) lastEventId = "";  // job expired, nothing to resume
+          if (res.status === 503) throw new QueueFullError(Number(res.headers.get("Retry-After")) || 30);
+          if (!res.ok) throw new Error(`HTTP ${res.status}`);
+          const reader = res.body?.getReader();
+          const dec = new TextDecoder();
+          let buffer = "";
+          while (reader) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += dec.decode(value, { stream: true });
+            const lines = buffer.split("\n");
+            buffer = lines.pop() || "";
+            for (const line of lines) {
+              if (line.startsWith("id: ")) {
+                lastEventId = line.slice(4);
+                jobIdRef.current = lastEventId.split(":")[0];
               }
-            } catch { }
+              else if (line.startsWith("data: ")) {
+                try { handle(JSON.parse(line.slice(6))); } catch { }
+              }
+            }
           }
+          if (!finished && !lastEventId) throw new Error("Stream ended before the build started");
+        } catch (e) {
+          if (signal.aborted || !lastEventId) throw e;
+          console.warn("Stream dropped, resuming build:", e);
         }
       }
     } catch (e) {
+      if (signal.aborted) return;  // stopped by the user
+      if (e instanceof QueueFullError) {
+        // Don't go around the queue via /run: that would turn overload into more concurrent builds
+        setBusy(`The server is busy with other builds. Try again in about ${e.retryAfter} seconds.`);
+        return;
+      }
       console.error("Streaming failed, falling back to standard request:", e);
       try {
         const res = await fetch(`${API_URL}/run`, {
@@ -260,6 +314,12 @@ export default function Home() {
     } finally { setLoading(false); }
   };
 
+  const stop = () => {
+    abortRef.current?.abort();
+    // Cancel server-side too, so the remaining LLM calls aren't made
+    if (jobIdRef.current) fetch(`${API_URL}/jobs/${jobIdRef.current}`, { method: "DELETE" }).catch(() => { });
+  };
+
   const hasWeb = result?.code_files?.some(f => f.endsWith(".html"));
 
   // Check for Escape key to exit full screen
@@ -297,7 +357,7 @@ export default function Home() {
               </div>
             </div>
           )}
-          <a href={`${API_URL}/export`} className="text-xs text-[#525252] hover:text-white transition">Export</a>
+          <a href={result?.job_id ? `${API_URL}/export/${result.job_id}` : `${API_URL}/export`} className="text-xs text-[#525252] hover:text-white transition">Export</a>
         </div>
       </nav>
 
@@ -497,7 +557,7 @@ export default function Home() {
               {optimizing ? "Optimizing..." : "✨ Optimize"}
             </button>
             <button
-              onClick={loading ? () => abortRef.current?.abort() : () => run(false)}
+              onClick={loading ? stop : () => run(false)}
               disabled={!idea.trim() && !loading}
               className="text-xs font-medium px-4 py-1.5 rounded bg-white text-black hover:bg-[#e5e5e5] disabled:opacity-30 transition"
             >
@@ -506,6 +566,10 @@ export default function Home() {
           </div>
         </div>
 
+        {busy && !loading && (
+          <div className="mb-6 text-xs text-amber-400">{busy}</div>
+        )}
+
         {/* Progress */}
         {loading && progress && (
           <div className="mb-6">
@@ -516,6 +580,14 @@ export default function Home() {
             <div className="h-0.5 bg-[#1a1a1a] rounded-full overflow-hidden">
               <div className="h-full bg-[#7c3aed] transition-all" style={{ width: `${progress.percent}%` }} />
             </div>
+            {streamingFile && streamingCode[streamingFile] && (
+              <div className="mt-3 rounded border border-[#1a1a1a] bg-[#0a0a0a]">
+                <div className="px-3 py-1.5 text-xs text-[#525252] border-b border-[#1a1a1a] font-mono">{streamingFile}</div>
+                <pre className="px-3 py-2 text-xs text-[#a3a3a3] font-mono max-h-48 overflow-hidden whitespace-pre-wrap">
+                  {streamingCode[streamingFile].split("\n").slice(-12).join("\n")}
+                </pre>
+              </div>
+            )}
           </div>
         )}
 